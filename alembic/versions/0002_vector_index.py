@@ -0,0 +1,45 @@
+import math
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+# DDL is inlined rather than taken from app.search.ann so that replaying this
+# revision always builds the index it built when it was written
+
+
+def _index_options(index_type: str, rows: int) -> str:
+    if index_type == "hnsw":
+        m = settings.hnsw_m or (16 if rows <= 1_000_000 else 32)
+        ef_construction = settings.hnsw_ef_construction or max(64, 4 * m)
+        return f"m = {m}, ef_construction = {ef_construction}"
+    lists = settings.ivfflat_lists or (max(1, rows // 1000) if rows <= 1_000_000 else int(math.sqrt(rows)))
+    return f"lists = {lists}"
+
+
+def upgrade() -> None:
+    # --- Replace the hand-tuned IVFFlat index ---
+    # Index type comes from VECTOR_INDEX_TYPE (ivfflat or hnsw); build parameters
+    # are derived from the number of embedded shots unless overridden in settings
+    index_type = settings.vector_index_type
+    rows = op.get_bind().execute(
+        sa.text("SELECT count(*) FROM shots WHERE embedding IS NOT NULL")
+    ).scalar() or 0
+    op.execute("DROP INDEX IF EXISTS shot_embedding_ivfflat")
+    op.execute(
+        f"CREATE INDEX shot_embedding_ann ON shots "
+        f"USING {index_type} (embedding vector_cosine_ops) "
+        f"WITH ({_index_options(index_type, rows)})"
+    )
+
+
+def downgrade() -> None:
+    # --- Restore the original fixed IVFFlat index ---
+    op.execute("DROP INDEX IF EXISTS shot_embedding_ann")
+    op.execute("CREATE INDEX shot_embedding_ivfflat ON shots USING ivfflat (embedding vector_cosine_ops) WITH (lists = 150)")
@@ -0,0 +1,50 @@
+import math
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+OPERATOR_CLASSES = {
+    "cosine": "vector_cosine_ops",
+    "l2": "vector_l2_ops",
+    "ip": "vector_ip_ops",
+}
+
+
+def _index_options(index_type: str, rows: int) -> str:
+    if index_type == "hnsw":
+        m = settings.hnsw_m or (16 if rows <= 1_000_000 else 32)
+        ef_construction = settings.hnsw_ef_construction or max(64, 4 * m)
+        return f"m = {m}, ef_construction = {ef_construction}"
+    lists = settings.ivfflat_lists or (max(1, rows // 1000) if rows <= 1_000_000 else int(math.sqrt(rows)))
+    return f"lists = {lists}"
+
+
+def _rebuild(metric: str) -> None:
+    index_type = settings.vector_index_type
+    rows = op.get_bind().execute(
+        sa.text("SELECT count(*) FROM shots WHERE embedding IS NOT NULL")
+    ).scalar() or 0
+    op.execute("DROP INDEX IF EXISTS shot_embedding_ann")
+    op.execute(
+        f"CREATE INDEX shot_embedding_ann ON shots "
+        f"USING {index_type} (embedding {OPERATOR_CLASSES[metric]}) "
+        f"WITH ({_index_options(index_type, rows)})"
+    )
+
+
+def upgrade() -> None:
+    # --- Rebuild the ANN index with the operator class of VECTOR_METRIC ---
+    # Search queries order by the matching operator, so the planner can use it
+    _rebuild(settings.vector_metric)
+
+
+def downgrade() -> None:
+    # --- Back to the cosine operator class built by 0002 ---
+    _rebuild("cosine")
@@ -0,0 +1,72 @@
+import math
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+OPERATOR_CLASSES = {
+    "cosine": "vector_cosine_ops",
+    "l2": "vector_l2_ops",
+    "ip": "vector_ip_ops",
+}
+HALFVEC_OPCLASSES = {
+    "cosine": "halfvec_cosine_ops",
+    "l2": "halfvec_l2_ops",
+    "ip": "halfvec_ip_ops",
+}
+
+
+def _index_options(index_type: str, rows: int) -> str:
+    if index_type == "hnsw":
+        m = settings.hnsw_m or (16 if rows <= 1_000_000 else 32)
+        ef_construction = settings.hnsw_ef_construction or max(64, 4 * m)
+        return f"m = {m}, ef_construction = {ef_construction}"
+    lists = settings.ivfflat_lists or (max(1, rows // 1000) if rows <= 1_000_000 else int(math.sqrt(rows)))
+    return f"lists = {lists}"
+
+
+def _rows() -> int:
+    return op.get_bind().execute(
+        sa.text("SELECT count(*) FROM shots WHERE embedding IS NOT NULL")
+    ).scalar() or 0
+
+
+def upgrade() -> None:
+    # --- Optional quantized expression index ---
+    # With VECTOR_QUANTIZATION=halfvec or binary, searches take candidates from an
+    # index over the compact form and re-rank them on the full-precision column
+    quantization = settings.vector_quantization
+    if quantization == "none":
+        return
+    index_type = settings.vector_index_type
+    dim = settings.embedding_dim
+    if quantization == "binary":
+        expression = f"CAST(binary_quantize(CAST(embedding AS vector)) AS bit({dim}))"
+        opclass = "bit_hamming_ops"
+    else:
+        expression = f"CAST(embedding AS halfvec({dim}))"
+        opclass = HALFVEC_OPCLASSES[settings.vector_metric]
+    op.execute(
+        f"CREATE INDEX shot_embedding_quantized ON shots "
+        f"USING {index_type} (({expression}) {opclass}) "
+        f"WITH ({_index_options(index_type, _rows())})"
+    )
+    if not settings.vector_full_index:
+        op.execute("DROP INDEX IF EXISTS shot_embedding_ann")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS shot_embedding_quantized")
+    # 0003 always left a full-precision index
+    index_type = settings.vector_index_type
+    op.execute(
+        f"CREATE INDEX IF NOT EXISTS shot_embedding_ann ON shots "
+        f"USING {index_type} (embedding {OPERATOR_CLASSES[settings.vector_metric]}) "
+        f"WITH ({_index_options(index_type, _rows())})"
+    )
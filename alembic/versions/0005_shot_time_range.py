@@ -0,0 +1,20 @@
+from alembic import op
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # --- Interval index for timeline queries ---
+    # btree_gist lets video_id share a GiST index with the shot's time range, so
+    # "shots of this video overlapping [from, to)" is a single index scan
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    op.execute("""
+        CREATE INDEX shot_time_range ON shots
+        USING gist (video_id, int4range(t_start_ms, t_end_ms))
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS shot_time_range")
@@ -0,0 +1,26 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # --- Shot_duplicates table ---
+    # Near-duplicate clusters written by scripts/find_duplicates.py
+    op.create_table(
+        'shot_duplicates',
+        sa.Column('shot_id', sa.BigInteger(), nullable=False),       # Member shot
+        sa.Column('canonical_id', sa.BigInteger(), nullable=False),  # Lowest shot id in the cluster
+        sa.Column('distance', sa.Float(), nullable=False, server_default='0'),  # Distance to canonical
+        sa.ForeignKeyConstraint(['shot_id'], ['shots.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['canonical_id'], ['shots.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('shot_id')
+    )
+    op.create_index('ix_shot_duplicates_canonical_id', 'shot_duplicates', ['canonical_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_shot_duplicates_canonical_id', table_name='shot_duplicates')
+    op.drop_table('shot_duplicates')
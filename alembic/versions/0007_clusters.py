@@ -0,0 +1,39 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # --- Clusters table ---
+    # K-means centroids written by scripts/cluster_shots.py
+    op.create_table(
+        'clusters',
+        sa.Column('id', sa.BigInteger(), nullable=False),       # Primary key
+        sa.Column('size', sa.Integer(), nullable=False),        # Number of shots assigned
+        sa.Column('centroid', sa.Text(), nullable=False),       # Centroid vector literal
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),  # Creation timestamp
+        sa.PrimaryKeyConstraint('id')
+    )
+    
+    # --- Shot_clusters table ---
+    # Cluster assignment of each embedded shot
+    op.create_table(
+        'shot_clusters',
+        sa.Column('shot_id', sa.BigInteger(), nullable=False),     # FK to shots
+        sa.Column('cluster_id', sa.BigInteger(), nullable=False),  # FK to clusters
+        sa.Column('distance', sa.Float(), nullable=False),         # Distance to centroid
+        sa.ForeignKeyConstraint(['shot_id'], ['shots.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['cluster_id'], ['clusters.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('shot_id')
+    )
+    # Browsing a cluster lists its most typical shots first
+    op.create_index('idx_shot_clusters_cluster', 'shot_clusters', ['cluster_id', 'distance'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_shot_clusters_cluster', table_name='shot_clusters')
+    op.drop_table('shot_clusters')
+    op.drop_table('clusters')
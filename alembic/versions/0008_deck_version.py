@@ -0,0 +1,16 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # --- Deck version ---
+    # Bumped on every membership change so cached deck centroids can be keyed on it
+    op.add_column('decks', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    op.drop_column('decks', 'version')
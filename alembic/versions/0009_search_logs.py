@@ -0,0 +1,32 @@
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # --- Search_logs table ---
+    # Append-only record of shot searches for research data collection
+    op.create_table(
+        'search_logs',
+        sa.Column('id', sa.BigInteger(), nullable=False),                          # Primary key
+        sa.Column('query', sa.Text(), nullable=True),                              # Text query
+        sa.Column('filters', postgresql.JSONB(), nullable=False),                  # Filters and parameters
+        sa.Column('latency_ms', sa.Float(), nullable=False),                       # Endpoint latency
+        sa.Column('result_count', sa.Integer(), nullable=False),                   # Total matches
+        sa.Column('result_ids', postgresql.ARRAY(sa.BigInteger()), nullable=False),  # Returned page
+        sa.Column('stats', postgresql.JSONB(), nullable=False),                    # Embed/search stats
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),  # Creation timestamp
+        sa.PrimaryKeyConstraint('id')
+    )
+    # Rows arrive in time order and are exported by time range; a BRIN index stays
+    # tiny and costs next to nothing on insert
+    op.execute("CREATE INDEX idx_search_logs_created_at ON search_logs USING brin (created_at)")
+
+
+def downgrade() -> None:
+    op.drop_index('idx_search_logs_created_at', table_name='search_logs')
+    op.drop_table('search_logs')
@@ -0,0 +1,22 @@
+from alembic import op
+
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # --- Full-text search over video titles ---
+    # A stored generated column keeps the tsvector in step with the title without
+    # triggers, and the GIN index serves title_tsv @@ tsquery filters. Queries must
+    # parse with the same configuration (app.search.fulltext.TITLE_TS_CONFIG)
+    op.execute("""
+        ALTER TABLE videos ADD COLUMN title_tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', coalesce(title, ''))) STORED
+    """)
+    op.execute("CREATE INDEX idx_videos_title_tsv ON videos USING gin (title_tsv)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_videos_title_tsv")
+    op.drop_column('videos', 'title_tsv')
@@ -0,0 +1,81 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+# Columns (shot_id, tag_id, video_id) each audited table contributes to a change row,
+# as of this revision
+AUDITED_TABLES = {
+    "shots": ("shot", "id, NULL::bigint, video_id"),
+    "tags": ("tag", "NULL::bigint, id, NULL::bigint"),
+    "shot_tags": ("shot_tag", "shot_id, tag_id, NULL::bigint"),
+}
+EVENTS = (
+    ("insert", "NEW TABLE AS new_rows"),
+    ("update", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+    ("delete", "OLD TABLE AS old_rows"),
+)
+
+def upgrade() -> None:
+    # --- Change_log table ---
+    # Transactional outbox of shot, tag and shot tag changes, tailed by every worker
+    op.create_table(
+        'change_log',
+        sa.Column('id', sa.BigInteger(), nullable=False),                  # Primary key
+        sa.Column('entity', sa.Text(), nullable=False),                    # shot, tag or shot_tag
+        sa.Column('op', sa.Text(), nullable=False),                        # insert, update or delete
+        sa.Column('shot_id', sa.BigInteger(), nullable=True),              # Changed shot
+        sa.Column('tag_id', sa.BigInteger(), nullable=True),               # Changed tag
+        sa.Column('video_id', sa.BigInteger(), nullable=True),             # Video of the changed shot
+        sa.Column('tx_id', sa.BigInteger(), server_default=sa.text('txid_current()'), nullable=False),  # Writing transaction
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),  # Creation timestamp
+        sa.PrimaryKeyConstraint('id')
+    )
+    # Consumers read in (transaction, id) order past their last position
+    op.create_index('idx_change_log_position', 'change_log', ['tx_id', 'id'])
+    
+    # --- Triggers ---
+    # Rows are written by the same statement, and so the same transaction, as the change.
+    # Transition tables give one INSERT ... SELECT per statement rather than one per row
+    for table, (entity, columns) in AUDITED_TABLES.items():
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION change_log_{table}() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    INSERT INTO change_log (entity, op, shot_id, tag_id, video_id)
+                    SELECT '{entity}', 'insert', {columns} FROM new_rows;
+                ELSIF TG_OP = 'UPDATE' THEN
+                    -- Old keys as well, so a shot moved to another video invalidates both
+                    INSERT INTO change_log (entity, op, shot_id, tag_id, video_id)
+                    SELECT '{entity}', 'update', changed.* FROM (
+                        SELECT {columns} FROM new_rows UNION SELECT {columns} FROM old_rows
+                    ) changed;
+                ELSE
+                    INSERT INTO change_log (entity, op, shot_id, tag_id, video_id)
+                    SELECT '{entity}', 'delete', {columns} FROM old_rows;
+                END IF;
+                RETURN NULL;
+            END
+            $$
+        """)
+        for event, referencing in EVENTS:
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_change_log_{event} ON {table}")
+            op.execute(f"""
+                CREATE TRIGGER {table}_change_log_{event}
+                AFTER {event.upper()} ON {table}
+                REFERENCING {referencing}
+                FOR EACH STATEMENT EXECUTE FUNCTION change_log_{table}()
+            """)
+
+
+def downgrade() -> None:
+    for table in AUDITED_TABLES:
+        for event, _ in EVENTS:
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_change_log_{event} ON {table}")
+        op.execute(f"DROP FUNCTION IF EXISTS change_log_{table}()")
+    op.drop_index('idx_change_log_position', table_name='change_log')
+    op.drop_table('change_log')
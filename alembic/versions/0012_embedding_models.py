@@ -0,0 +1,44 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # --- Embedding_models table ---
+    # Models other than the default one in shots.embedding, each with its own dimension
+    op.create_table(
+        'embedding_models',
+        sa.Column('id', sa.BigInteger(), nullable=False),                      # Primary key
+        sa.Column('name', sa.Text(), nullable=False),                          # Name used by GET /shots?model=
+        sa.Column('dim', sa.Integer(), nullable=False),                        # Vector dimension
+        sa.Column('status', sa.Text(), server_default='filling', nullable=False),  # filling or ready
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),  # Creation timestamp
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+    
+    # --- Shot_embeddings table ---
+    # One row per (model, shot). The column has no fixed dimension; each model gets a
+    # partial ANN index over its rows cast to its dimension once it has been filled
+    op.create_table(
+        'shot_embeddings',
+        sa.Column('model_id', sa.BigInteger(), nullable=False),  # FK to embedding_models
+        sa.Column('shot_id', sa.BigInteger(), nullable=False),   # FK to shots
+        sa.Column('embedding', sa.Text(), nullable=False),       # Embedding vector
+        sa.ForeignKeyConstraint(['model_id'], ['embedding_models.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['shot_id'], ['shots.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('model_id', 'shot_id')
+    )
+    op.execute("ALTER TABLE shot_embeddings ALTER COLUMN embedding TYPE vector USING embedding::vector")
+    # Deleting a shot removes its rows under every model
+    op.create_index('idx_shot_embeddings_shot', 'shot_embeddings', ['shot_id'])
+
+
+def downgrade() -> None:
+    # Per-model ANN indexes are dropped along with the table
+    op.drop_index('idx_shot_embeddings_shot', table_name='shot_embeddings')
+    op.drop_table('shot_embeddings')
+    op.drop_table('embedding_models')
@@ -0,0 +1,19 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0013'
+down_revision = '0012'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # --- PCA-reduced embedding models ---
+    # scripts/reduce_embeddings.py stores reduced vectors as a model of their own; the
+    # projection is kept so query vectors can be projected the same way
+    op.add_column('embedding_models', sa.Column('source', sa.Text(), nullable=True))            # Model projected from
+    op.add_column('embedding_models', sa.Column('projection', sa.LargeBinary(), nullable=True))  # Mean and components, float32
+
+
+def downgrade() -> None:
+    op.drop_column('embedding_models', 'projection')
+    op.drop_column('embedding_models', 'source')
@@ -0,0 +1,16 @@
+from alembic import op
+
+revision = '0014'
+down_revision = '0013'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # --- Shots must not end before they start ---
+    # The shot_time_range index (0005) builds int4range(t_start_ms, t_end_ms), which
+    # raises on inverted bounds, so such a row would fail inside the index instead
+    op.create_check_constraint('shots_time_order', 'shots', 't_end_ms >= t_start_ms')
+
+
+def downgrade() -> None:
+    op.drop_constraint('shots_time_order', 'shots', type_='check')
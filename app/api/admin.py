@@ -0,0 +1,73 @@
+import asyncio
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.core.admission import search_admission
+from app.core.config import settings
+from app.core.deps import require_admin
+from app.core.invalidation import invalidation
+from app.core.outbox import change_consumer
+from app.core.profiling import SamplingProfiler, release_sampler, try_acquire_sampler
+from app.core.replica import replica_router
+from app.core.warmup import warmup_state
+from app.search.embedding_models import embedding_models
+from app.search.recommend import centroid_cache
+from app.search.search_log import search_log
+from app.search.singleflight import search_flights
+from app.search.snapshot import snapshot_store
+from app.search.tag_counts import tag_counts
+from app.search.timeline import timeline_cache
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile_worker(
+    seconds: float = Query(10.0, gt=0.0, description="How long to sample"),
+    interval_ms: float = Query(5.0, ge=1.0, le=100.0, description="Sampling interval")
+):
+    """Sample every thread of this worker for a while and return collapsed stacks"""
+    if seconds > settings.profile_max_seconds:
+        raise HTTPException(
+            status_code=400,
+            detail=f"seconds must be at most {settings.profile_max_seconds}"
+        )
+    if not try_acquire_sampler():
+        raise HTTPException(status_code=409, detail="A profiling session is already running")
+
+    profiler = SamplingProfiler(interval_ms / 1000.0)
+    profiler.start()
+    try:
+        # Keep serving traffic on this worker while the sampler thread watches it
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop()
+        release_sampler()
+
+    filename = f"worker-{os.getpid()}.collapsed"
+    return PlainTextResponse(
+        profiler.collapsed(),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/stats")
+async def worker_stats():
+    """Counters describing this worker's search machinery"""
+    return {
+        "pid": os.getpid(),
+        "search_coalescing": search_flights.stats(),
+        "search_admission": search_admission.stats(),
+        "vector_snapshot": snapshot_store.stats(),
+        "read_replica": replica_router.stats(),
+        "warmup": warmup_state.stats(),
+        "timeline_cache": timeline_cache.stats(),
+        "deck_centroids": centroid_cache.stats(),
+        "search_log": search_log.stats(),
+        "tag_counts": tag_counts.stats(),
+        "invalidation": invalidation.stats(),
+        "change_log": change_consumer.stats(),
+        "embedding_models": embedding_models.stats(),
+    }
@@ -0,0 +1,119 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.api.shots import ShotResponse, build_shot_responses
+from app.core.deps import get_read_db
+from app.core.pagination import PaginatedResponse, get_offset, get_total_pages
+from app.core.profiling import ProfiledRoute, profile_phase
+from app.models.cluster import Cluster, ShotCluster
+from app.models.shot import Shot
+from app.models.video import Video
+from app.search.queries import SHOT_LIST_COLUMNS
+from pydantic import BaseModel
+
+
+# Data models for cluster browsing
+class ClusterResponse(BaseModel):
+    id: int
+    size: int
+    sample_shots: List[ShotResponse]
+
+    class Config:
+        from_attributes = True
+
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+def _typical_shot_rows(db: Session, cluster_id: int, offset: int, limit: int):
+    # Shots closest to the centroid first; served by idx_shot_clusters_cluster
+    return db.query(*SHOT_LIST_COLUMNS).join(
+        ShotCluster, ShotCluster.shot_id == Shot.id
+    ).outerjoin(Video).filter(
+        ShotCluster.cluster_id == cluster_id
+    ).order_by(ShotCluster.distance, Shot.id).offset(offset).limit(limit).all()
+
+
+def _sample_shot_rows(db: Session, cluster_ids: List[int], samples: int):
+    """The most typical shots of many clusters in one query, keyed by cluster id"""
+    samples_by_cluster = {cluster_id: [] for cluster_id in cluster_ids}
+    if not cluster_ids or not samples:
+        return samples_by_cluster
+    ranked = db.query(
+        ShotCluster.shot_id,
+        ShotCluster.cluster_id,
+        func.row_number().over(
+            partition_by=ShotCluster.cluster_id,
+            order_by=(ShotCluster.distance, ShotCluster.shot_id)
+        ).label("rank")
+    ).filter(ShotCluster.cluster_id.in_(cluster_ids)).subquery()
+    rows = db.query(*SHOT_LIST_COLUMNS, ranked.c.cluster_id).join(
+        ranked, ranked.c.shot_id == Shot.id
+    ).outerjoin(Video, Video.id == Shot.video_id).filter(
+        ranked.c.rank <= samples
+    ).order_by(ranked.c.cluster_id, ranked.c.rank)
+    for row in rows:
+        samples_by_cluster[row.cluster_id].append(row)
+    return samples_by_cluster
+
+
+@router.get("/", response_model=PaginatedResponse[ClusterResponse])
+async def list_clusters(
+    samples: int = Query(4, ge=0, le=12, description="Most typical shots shown per cluster"),
+    page: int = Query(1, ge=1, description="Page number"),
+    page_size: int = Query(24, ge=1, le=60, description="Items per page"),
+    db: Session = Depends(get_read_db)
+):
+    """List visual-theme clusters, largest first, with their most typical shots"""
+    cluster_query = db.query(Cluster.id, Cluster.size)
+    total = cluster_query.count()
+    clusters = cluster_query.order_by(Cluster.size.desc(), Cluster.id).offset(
+        get_offset(page, page_size)
+    ).limit(page_size).all()
+    
+    with profile_phase("hydrate"):
+        rows = _sample_shot_rows(db, [cluster.id for cluster in clusters], samples)
+        responses = build_shot_responses(db, [row for cluster_rows in rows.values() for row in cluster_rows])
+        by_id = {response.id: response for response in responses}
+    
+    return PaginatedResponse(
+        items=[
+            ClusterResponse(
+                id=cluster.id,
+                size=cluster.size,
+                sample_shots=[by_id[row.id] for row in rows[cluster.id]]
+            )
+            for cluster in clusters
+        ],
+        total=total,
+        page=page,
+        page_size=page_size,
+        pages=get_total_pages(total, page_size)
+    )
+
+
+@router.get("/{cluster_id}/shots", response_model=PaginatedResponse[ShotResponse])
+async def list_cluster_shots(
+    cluster_id: int,
+    page: int = Query(1, ge=1, description="Page number"),
+    page_size: int = Query(24, ge=1, le=60, description="Items per page"),
+    db: Session = Depends(get_read_db)
+):
+    """Shots of one cluster, most typical first"""
+    cluster = db.query(Cluster.id, Cluster.size).filter(Cluster.id == cluster_id).first()
+    if not cluster:
+        raise HTTPException(status_code=404, detail="Cluster not found")
+    
+    rows = _typical_shot_rows(db, cluster_id, get_offset(page, page_size), page_size)
+    with profile_phase("hydrate"):
+        items = build_shot_responses(db, rows)
+    
+    return PaginatedResponse(
+        items=items,
+        total=cluster.size,
+        page=page,
+        page_size=page_size,
+        pages=get_total_pages(cluster.size, page_size)
+    )
@@ -1,13 +1,18 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
-from app.core.deps import get_db
+from app.api.shots import ShotResponse, build_shot_responses, search_deadline
+from app.core.admission import SearchBudget, search_admission, search_budget
+from app.core.deps import get_db, get_read_db
+from app.core.profiling import ProfiledRoute, profile_phase
 from app.models.deck import Deck, DeckItem
 from app.models.shot import Shot
 from app.models.video import Video
-from app.models.tag import Tag, ShotTag
+from app.search.queries import fetch_shot_rows, get_tag_names
+from app.search.recommend import recommend_shots
 from pydantic import BaseModel
 
 
@@ -56,11 +61,18 @@ class ReorderRequest(BaseModel):
     items: List[dict]
 
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+
+def _bump_version(db: Session, deck_id: int) -> None:
+    # Done in SQL so concurrent edits each get their own version
+    db.query(Deck).filter(Deck.id == deck_id).update(
+        {Deck.version: Deck.version + 1}, synchronize_session=False
+    )
 
 
 @router.get("/", response_model=List[DeckResponse])
-async def list_decks(user_id: int, db: Session = Depends(get_db)):
+async def list_decks(user_id: int, db: Session = Depends(get_read_db)):
     """Get all decks for a specific user"""
     decks = db.query(Deck).filter(Deck.user_id == user_id).all()
     return [DeckResponse.from_orm(deck) for deck in decks]
@@ -78,30 +90,33 @@ async def create_deck(deck: DeckCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/{deck_id}", response_model=DeckDetailResponse)
-async def get_deck(deck_id: int, db: Session = Depends(get_db)):
+async def get_deck(deck_id: int, db: Session = Depends(get_read_db)):
     """Get detailed information about a specific deck including all its shots"""
     deck = db.query(Deck).filter(Deck.id == deck_id).first()
     if not deck:
         raise HTTPException(status_code=404, detail="Deck not found")
     
-    # Get all deck items ordered by sort order
-    items = db.query(DeckItem).filter(DeckItem.deck_id == deck_id).order_by(DeckItem.sort_order).all()
+    # Get all deck items ordered by sort order, with just the shot columns the response needs
+    items = db.query(
+        DeckItem.shot_id, DeckItem.sort_order, Shot.t_start_ms, Shot.t_end_ms,
+        Video.title.label("video_title")
+    ).join(Shot, Shot.id == DeckItem.shot_id).outerjoin(Video, Video.id == Shot.video_id).filter(
+        DeckItem.deck_id == deck_id
+    ).order_by(DeckItem.sort_order).all()
     
     # Build detailed responses for each deck item
-    item_responses = []
-    for item in items:
-        shot = db.query(Shot).filter(Shot.id == item.shot_id).first()
-        if shot:
-            video = db.query(Video).filter(Video.id == shot.video_id).first()
-            tags = db.query(Tag).join(ShotTag).filter(ShotTag.shot_id == shot.id).all()
-            
-            item_responses.append(DeckItemResponse(
+    with profile_phase("hydrate"):
+        tag_names = get_tag_names(db, [item.shot_id for item in items])
+        item_responses = [
+            DeckItemResponse(
                 shot_id=item.shot_id,
                 sort_order=item.sort_order,
-                shot_title=f"{shot.t_start_ms}ms - {shot.t_end_ms}ms",
-                video_title=video.title if video else "",
-                tags=[tag.name for tag in tags]
-            ))
+                shot_title=f"{item.t_start_ms}ms - {item.t_end_ms}ms",
+                video_title=item.video_title or "",
+                tags=tag_names.get(item.shot_id, [])
+            )
+            for item in items
+        ]
     
     return DeckDetailResponse(
         id=deck.id,
@@ -111,6 +126,30 @@ async def get_deck(deck_id: int, db: Session = Depends(get_db)):
     )
 
 
+@router.get("/{deck_id}/recommendations", response_model=List[ShotResponse])
+async def get_deck_recommendations(
+    deck_id: int,
+    top_k: int = Query(24, ge=1, le=100, description="Number of shots to recommend"),
+    centroids: int = Query(1, ge=1, le=5, description="Themes to search for; use more for diverse decks"),
+    budget: SearchBudget = Depends(search_budget),
+    db: Session = Depends(get_read_db)
+):
+    """Shots similar to a deck as a whole, excluding the shots already in it"""
+    deck = db.query(Deck.id, Deck.version).filter(Deck.id == deck_id).first()
+    if not deck:
+        raise HTTPException(status_code=404, detail="Deck not found")
+    
+    def search() -> List[int]:
+        with profile_phase("search"), search_deadline(db, budget):
+            return recommend_shots(db, deck_id, deck.version, top_k, centroids)
+    
+    async with search_admission.admit(budget):
+        shot_ids = await run_in_threadpool(search)
+    
+    with profile_phase("hydrate"):
+        return build_shot_responses(db, fetch_shot_rows(db, shot_ids))
+
+
 @router.post("/{deck_id}/items", response_model=DeckItemResponse)
 async def add_deck_item(deck_id: int, item: DeckItemCreate, db: Session = Depends(get_db)):
     """Add a shot to a deck"""
@@ -118,7 +157,9 @@ async def add_deck_item(deck_id: int, item: DeckItemCreate, db: Session = Depend
     if not deck:
         raise HTTPException(status_code=404, detail="Deck not found")
     
-    shot = db.query(Shot).filter(Shot.id == item.shot_id).first()
+    shot = db.query(Shot.id, Shot.t_start_ms, Shot.t_end_ms, Video.title.label("video_title")).outerjoin(
+        Video, Video.id == Shot.video_id
+    ).filter(Shot.id == item.shot_id).first()
     if not shot:
         raise HTTPException(status_code=404, detail="Shot not found")
     
@@ -138,18 +179,16 @@ async def add_deck_item(deck_id: int, item: DeckItemCreate, db: Session = Depend
     
     db_item = DeckItem(deck_id=deck_id, shot_id=item.shot_id, sort_order=item.sort_order)
     db.add(db_item)
+    _bump_version(db, deck_id)
     db.commit()
     
     # Return the created item with full details
-    video = db.query(Video).filter(Video.id == shot.video_id).first()
-    tags = db.query(Tag).join(ShotTag).filter(ShotTag.shot_id == shot.id).all()
-    
     return DeckItemResponse(
         shot_id=item.shot_id,
         sort_order=item.sort_order,
         shot_title=f"{shot.t_start_ms}ms - {shot.t_end_ms}ms",
-        video_title=video.title if video else "",
-        tags=[tag.name for tag in tags]
+        video_title=shot.video_title or "",
+        tags=get_tag_names(db, [shot.id]).get(shot.id, [])
     )
 
 
@@ -164,6 +203,7 @@ async def remove_deck_item(deck_id: int, shot_id: int, db: Session = Depends(get
         raise HTTPException(status_code=404, detail="Deck item not found")
     
     db.delete(item)
+    _bump_version(db, deck_id)
     db.commit()
     
     return {"ok": True}
@@ -1,4 +1,8 @@
 from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+from app.core.warmup import retry_required, warmup_state
 
 router = APIRouter()
 
@@ -6,3 +10,20 @@ router = APIRouter()
 @router.get("/health")
 async def health_check():
     return {"ok": True}
+
+
+@router.get("/health/live")
+async def liveness():
+    """The process is up and serving; says nothing about whether it is warm"""
+    return {"ok": True}
+
+
+@router.get("/health/ready")
+async def readiness():
+    """Ready for traffic once warm-up has finished; load balancers should probe this"""
+    if warmup_state.finished and not warmup_state.ready:
+        # The database was unreachable during warm-up; check whether it is back
+        await run_in_threadpool(retry_required)
+    if not warmup_state.ready:
+        return JSONResponse(status_code=503, content={"ok": False, **warmup_state.stats()})
+    return {"ok": True, **warmup_state.stats()}
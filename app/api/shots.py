@@ -1,15 +1,33 @@
+import time
+from contextlib import contextmanager
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import bindparam, select
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
 
-from app.core.deps import get_db
+from app.core.admission import (
+    AdmissionRejected, SearchBudget, apply_statement_timeout, batch_search_budget, is_statement_timeout,
+    reset_statement_timeout, search_admission, search_budget
+)
+from app.core.config import settings
+from app.core.deps import detached_session, get_read_db
+from app.core.profiling import ProfiledRoute, profile_phase
 from app.core.pagination import PaginationParams, PaginatedResponse, get_offset, get_total_pages
 from app.models.shot import Shot
 from app.models.video import Video
-from app.models.tag import Tag, ShotTag
+from app.search.ann import apply_search_params
+from app.search.dedup import collapse_duplicate_ids
 from app.search.embedder import get_embedder
-from app.search.queries import build_shot_query, build_vector_query, get_similar_shots
-from pydantic import BaseModel
+from app.search.embedding_models import embedder_for, embedding_models
+from app.search.search_log import log_phase, search_log, search_log_entry
+from app.search.singleflight import normalize_query, search_flights, search_key
+from app.search.queries import (
+    SHOT_LIST_COLUMNS, build_batch_vector_query, build_fusion_query, build_shot_query, build_vector_query,
+    fetch_shot_rows, get_similar_shots, get_tag_names
+)
+from pydantic import BaseModel, Field
 
 
 # Data models for shot responses
@@ -41,7 +59,74 @@ class ShotDetailResponse(BaseModel):
         from_attributes = True
 
 
-router = APIRouter()
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=1000)
+    top_k: int = Field(50, ge=1, le=1000)
+    tag_slugs: Optional[List[str]] = None
+    tag_query: Optional[str] = None
+    threshold: float = Field(0.2, ge=0.0, le=1.0)
+    hybrid: bool = True
+    probes: Optional[int] = Field(None, ge=1, le=1000)
+    ef_search: Optional[int] = Field(None, ge=1, le=1000)
+
+
+class BatchSearchResult(BaseModel):
+    query: str
+    ids: List[int]
+    distances: List[float]
+
+
+class BatchSearchResponse(BaseModel):
+    results: List[BatchSearchResult]
+
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+# Built once; each request only binds the shot id. Only asks whether an embedding
+# exists, the vector itself stays in the database
+SHOT_DETAIL = (
+    select(
+        *SHOT_LIST_COLUMNS,
+        Video.src_url.label("video_src_url"),
+        Shot.embedding.isnot(None).label("has_embedding")
+    )
+    .outerjoin(Video, Video.id == Shot.video_id)
+    .where(Shot.id == bindparam("shot_id"))
+)
+
+
+@contextmanager
+def search_deadline(db: Session, budget: SearchBudget):
+    """Bound the search SQL by the client's remaining budget and report cancellation as 503"""
+    apply_statement_timeout(db, budget)
+    try:
+        yield
+    except OperationalError as exc:
+        if not is_statement_timeout(exc):
+            raise
+        # The cancel aborted the transaction; rolling back also drops the timeout
+        db.rollback()
+        raise AdmissionRejected(503, "Search deadline exceeded")
+    # Hydration and other queries later in the transaction are not bound by the budget
+    reset_statement_timeout(db)
+
+
+def build_shot_responses(db: Session, rows) -> List[ShotResponse]:
+    """Turn shot listing rows into responses, loading all their tags in one query"""
+    tag_names = get_tag_names(db, [row.id for row in rows])
+    return [
+        ShotResponse(
+            id=row.id,
+            video_id=row.video_id,
+            t_start_ms=row.t_start_ms,
+            t_end_ms=row.t_end_ms,
+            thumb_url=row.thumb_url,
+            video_title=row.video_title or "",
+            tags=tag_names.get(row.id, [])
+        )
+        for row in rows
+    ]
 
 
 @router.get("/", response_model=PaginatedResponse[ShotResponse])
@@ -52,60 +137,116 @@ async def list_shots(
     tag_query: Optional[str] = Query(None, description="Fuzzy tag search"),
     threshold: float = Query(0.2, ge=0.0, le=1.0, description="Tag similarity threshold"),
     hybrid: bool = Query(True, description="Intersect vector and tag results"),
+    fusion: Optional[str] = Query(None, pattern="^(rrf|weighted)$", description="Rank-fuse tag_query and q candidates instead of intersecting"),
+    rrf_k: int = Query(60, ge=1, le=1000, description="Reciprocal-rank fusion constant"),
+    tag_weight: float = Query(1.0, ge=0.0, description="Weight of the tag ranking in fusion"),
+    vector_weight: float = Query(1.0, ge=0.0, description="Weight of the vector ranking in fusion"),
+    probes: Optional[int] = Query(None, ge=1, le=1000, description="IVFFlat lists to probe (recall vs latency)"),
+    ef_search: Optional[int] = Query(None, ge=1, le=1000, description="HNSW candidate list size (recall vs latency)"),
+    collapse_duplicates: bool = Query(False, description="Return one shot per near-duplicate cluster"),
+    video_query: Optional[str] = Query(None, description="Full-text search over video titles"),
+    model: Optional[str] = Query(None, description="Embedding model to search (defaults to EMBEDDING_MODEL)"),
     page: int = Query(1, ge=1, description="Page number"),
-    page_size: int = Query(24, ge=1, le=60, description="Items per page")
+    page_size: int = Query(24, ge=1, le=60, description="Items per page"),
+    budget: SearchBudget = Depends(search_budget),
+    db: Session = Depends(get_read_db)
 ):
     """List shots with optional vector search, tag filtering, and pagination"""
-    db = next(get_db())
-    
+    started = time.perf_counter()
+    search_stats = {"priority": budget.priority}
     if q:
+        model_name = model or settings.embedding_model
+        embedding_model = embedding_models.get(db, model_name)
+        if embedding_model is None:
+            raise HTTPException(status_code=400, detail=f"Unknown embedding model: {model_name}")
+        if embedding_model.status != "ready":
+            # A model still being filled would silently return partial results
+            raise HTTPException(
+                status_code=409,
+                detail=f"Embedding model {model_name} is not ready ({embedding_model.status})"
+            )
+        
+        # Every request sharing a flight embeds the same normalized text
+        query_text = normalize_query(q)
+        
         # Perform vector search when text query is provided
-        embedder = get_embedder()
-        query_vector = embedder.embed(q)
+        def search() -> List[int]:
+            # Query vectors must come from the model whose shot embeddings are searched
+            embedder = embedder_for(embedding_model)
+            with profile_phase("embed"), log_phase(search_stats, "embed"):
+                query_vector = embedder.embed(query_text)
+            if not query_vector:
+                return []
+            
+            # The flight outlives the leader if it disconnects, so it runs on its own
+            # session (on the primary or replica the leader was routed to)
+            with detached_session(db) as search_db, profile_phase("search"), \
+                    log_phase(search_stats, "search"), search_deadline(search_db, budget):
+                apply_search_params(search_db, probes, ef_search)
+                if fusion and tag_query:
+                    # Tag and vector searches each produce top_k candidates, merged by score
+                    return build_fusion_query(
+                        search_db, query_vector, tag_query, top_k, tag_slugs, threshold,
+                        fusion, rrf_k, tag_weight, vector_weight, video_query, embedding_model
+                    )
+                return build_vector_query(
+                    search_db, query_vector, top_k, tag_slugs, tag_query, threshold, hybrid, video_query,
+                    embedding_model
+                )
         
-        if query_vector:
-            shot_ids = build_vector_query(
-                db, query_vector, top_k, tag_slugs, tag_query, threshold, hybrid
-            )
+        async def admitted_search() -> List[int]:
+            queued = time.perf_counter()
+            async with search_admission.admit(budget):
+                search_stats["queue_ms"] = round((time.perf_counter() - queued) * 1000, 3)
+                return await run_in_threadpool(search)
+        
+        # Identical concurrent searches (e.g. a whole class running the same query)
+        # share one embed call and ANN scan; each request still paginates on its own
+        key = search_key(
+            q, tag_slugs, tag_query, threshold, hybrid, top_k, probes, ef_search,
+            fusion, rrf_k, tag_weight, vector_weight, video_query, embedding_model.name
+        )
+        shot_ids = await search_flights.do(key, admitted_search)
+        # Only the request that ran the search has its timings; the others shared its result
+        search_stats["coalesced"] = "embed_ms" not in search_stats
+        if collapse_duplicates:
+            shot_ids = collapse_duplicate_ids(db, shot_ids)
+        
+        if shot_ids:
+            # Apply pagination to vector search results
+            start_idx = (page - 1) * page_size
+            end_idx = start_idx + page_size
+            paginated_ids = shot_ids[start_idx:end_idx]
             
-            if shot_ids:
-                # Apply pagination to vector search results
-                start_idx = (page - 1) * page_size
-                end_idx = start_idx + page_size
-                paginated_ids = shot_ids[start_idx:end_idx]
-                
-                shots = db.query(Shot).filter(Shot.id.in_(paginated_ids)).all()
-                # Reorder by original order from vector search
-                shot_dict = {s.id: s for s in shots}
-                shots = [shot_dict[sid] for sid in paginated_ids if sid in shot_dict]
-                total = len(shot_ids)  # Total available from vector search
-            else:
-                shots = []
-                total = 0
+            # Rows come back in the original order from vector search
+            rows = fetch_shot_rows(db, paginated_ids)
+            total = len(shot_ids)  # Total available from vector search
         else:
-            shots = []
+            rows = []
             total = 0
     else:
         # Use traditional database query when no vector search
         query, total = build_shot_query(
-            db, tag_slugs, tag_query, threshold, page, page_size
+            db, tag_slugs, tag_query, threshold, page, page_size, collapse_duplicates, video_query
         )
-        shots = query.all()
+        rows = db.execute(query).all()
     
     # Build response objects with video and tag information
-    shot_responses = []
-    for shot in shots:
-        video = db.query(Video).filter(Video.id == shot.video_id).first()
-        tags = db.query(Tag).join(ShotTag).filter(ShotTag.shot_id == shot.id).all()
-        
-        shot_responses.append(ShotResponse(
-            id=shot.id,
-            video_id=shot.video_id,
-            t_start_ms=shot.t_start_ms,
-            t_end_ms=shot.t_end_ms,
-            thumb_url=shot.thumb_url,
-            video_title=video.title if video else "",
-            tags=[tag.name for tag in tags]
+    with profile_phase("hydrate"):
+        shot_responses = build_shot_responses(db, rows)
+    
+    if settings.search_log_enabled:
+        # Buffered in memory and written by a background task; never waits on the database
+        search_log.record(search_log_entry(
+            q,
+            {
+                "top_k": top_k if q else None, "tag_slugs": tag_slugs, "tag_query": tag_query,
+                "threshold": threshold, "hybrid": hybrid, "fusion": fusion,
+                "probes": probes, "ef_search": ef_search,
+                "collapse_duplicates": collapse_duplicates, "video_query": video_query,
+                "model": model, "page": page, "page_size": page_size,
+            },
+            started, total, [row.id for row in rows], search_stats
         ))
     
     return PaginatedResponse(
@@ -117,34 +258,65 @@ async def list_shots(
     )
 
 
+@router.post("/search:batch", response_model=BatchSearchResponse)
+async def batch_search_shots(
+    request: BatchSearchRequest,
+    budget: SearchBudget = Depends(batch_search_budget),
+    db: Session = Depends(get_read_db)
+):
+    """Run many text queries with shared filters in one embed call and one SQL round trip"""
+    def search():
+        embedder = get_embedder()
+        with profile_phase("embed"):
+            query_vectors = embedder.embed_batch(request.queries)
+        
+        with profile_phase("search"), search_deadline(db, budget):
+            apply_search_params(db, request.probes, request.ef_search)
+            return build_batch_vector_query(
+                db, query_vectors, request.top_k, request.tag_slugs,
+                request.tag_query, request.threshold, request.hybrid
+            )
+    
+    # Exports queue behind interactive searches and have their own concurrency cap
+    async with search_admission.admit(budget):
+        neighbors = await run_in_threadpool(search)
+    
+    return BatchSearchResponse(results=[
+        BatchSearchResult(
+            query=query,
+            ids=[shot_id for shot_id, _ in ranked],
+            distances=[distance for _, distance in ranked]
+        )
+        for query, ranked in zip(request.queries, neighbors)
+    ])
+
+
 @router.get("/{shot_id}", response_model=ShotDetailResponse)
-async def get_shot(shot_id: int, db: Session = Depends(get_db)):
+async def get_shot(
+    shot_id: int,
+    collapse_duplicates: bool = Query(False, description="Skip near-duplicates among similar shots"),
+    db: Session = Depends(get_read_db)
+):
     """Get detailed information about a specific shot including similar shots"""
-    shot = db.query(Shot).filter(Shot.id == shot_id).first()
+    shot = db.execute(SHOT_DETAIL, {"shot_id": shot_id}).first()
     if not shot:
         raise HTTPException(status_code=404, detail="Shot not found")
     
-    # Get video and tag information for the shot
-    video = db.query(Video).filter(Video.id == shot.video_id).first()
-    tags = db.query(Tag).join(ShotTag).filter(ShotTag.shot_id == shot.id).all()
+    # Get tag information for the shot
+    tags = get_tag_names(db, [shot.id]).get(shot.id, [])
     
     # Find similar shots using vector similarity if embedding exists
     similar_shots = []
-    if shot.embedding:
-        similar_shots_data = get_similar_shots(db, shot_id, 5)
-        for similar_shot in similar_shots_data:
-            similar_video = db.query(Video).filter(Video.id == similar_shot.video_id).first()
-            similar_tags = db.query(Tag).join(ShotTag).filter(ShotTag.shot_id == similar_shot.id).all()
-            
-            similar_shots.append(ShotResponse(
-                id=similar_shot.id,
-                video_id=similar_shot.video_id,
-                t_start_ms=similar_shot.t_start_ms,
-                t_end_ms=similar_shot.t_end_ms,
-                thumb_url=similar_shot.thumb_url,
-                video_title=similar_video.title if similar_video else "",
-                tags=[tag.name for tag in similar_tags]
-            ))
+    if shot.has_embedding:
+        with profile_phase("search"):
+            if collapse_duplicates:
+                # Over-fetch so re-uploads of this shot and of each other don't crowd the list
+                similar_ids = get_similar_shots(db, shot_id, 20)
+                similar_ids = collapse_duplicate_ids(db, similar_ids, exclude_cluster_of=shot_id)[:5]
+            else:
+                similar_ids = get_similar_shots(db, shot_id, 5)
+        with profile_phase("hydrate"):
+            similar_shots = build_shot_responses(db, fetch_shot_rows(db, similar_ids))
     
     return ShotDetailResponse(
         id=shot.id,
@@ -152,8 +324,8 @@ async def get_shot(shot_id: int, db: Session = Depends(get_db)):
         t_start_ms=shot.t_start_ms,
         t_end_ms=shot.t_end_ms,
         thumb_url=shot.thumb_url,
-        video_title=video.title if video else "",
-        video_src_url=video.src_url if video else "",
-        tags=[tag.name for tag in tags],
+        video_title=shot.video_title or "",
+        video_src_url=shot.video_src_url or "",
+        tags=tags,
         similar_shots=similar_shots
     )
@@ -1,12 +1,19 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import BigInteger, any_, func, literal, select
 
-from app.core.deps import get_db
+from app.core.config import settings
+from app.core.deps import get_db, get_read_db
+from app.core.invalidation import invalidation
+from app.core.profiling import ProfiledRoute
 from app.core.pagination import PaginationParams, PaginatedResponse, get_offset, get_total_pages
-from app.models.tag import Tag
-from pydantic import BaseModel
+from app.models.shot import Shot
+from app.models.tag import Tag, ShotTag
+from app.search.tag_counts import tag_counts
+from pydantic import BaseModel, Field
 
 
 # Data models for tag operations
@@ -29,7 +36,65 @@ class TagResponse(BaseModel):
         from_attributes = True
 
 
-router = APIRouter()
+class TagDetailResponse(TagResponse):
+    shot_count: int
+
+
+class BulkShotsRequest(BaseModel):
+    shot_ids: List[int] = Field(..., min_length=1)
+
+
+class BulkTagResponse(BaseModel):
+    tag_id: int
+    requested: int
+    changed: int  # Shot tags actually added or removed
+    shot_count: int
+
+
+class TagMergeRequest(BaseModel):
+    source_ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+
+class TagMergeResponse(BaseModel):
+    tag: TagDetailResponse
+    merged_ids: List[int]
+    moved: int  # Shots that gained the tag from a merged one
+
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+def _id_in(db: Session, column, ids: List[int]):
+    """column IN ids, sent to PostgreSQL as one array parameter instead of one per id"""
+    if db.get_bind().dialect.name == "postgresql":
+        return column == any_(literal(ids, ARRAY(BigInteger)))
+    return column.in_(ids)
+
+
+def _insert_shot_tags_ignoring_existing(db: Session, rows):
+    """INSERT INTO shot_tags ... SELECT ... ON CONFLICT DO NOTHING; returns the rows added"""
+    insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    statement = insert(ShotTag).from_select(["shot_id", "tag_id"], rows).on_conflict_do_nothing()
+    return db.execute(statement).rowcount
+
+
+def _bulk_shot_ids(request: BulkShotsRequest) -> List[int]:
+    if len(request.shot_ids) > settings.tag_bulk_max_shots:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.tag_bulk_max_shots} shots per request"
+        )
+    # Sorted so concurrent bulk edits take row locks in the same order
+    return sorted(set(request.shot_ids))
+
+
+def _tag_detail(db: Session, tag: Tag) -> TagDetailResponse:
+    return TagDetailResponse(
+        id=tag.id,
+        slug=tag.slug,
+        name=tag.name,
+        shot_count=tag_counts.counts(db, [tag.id])[tag.id]
+    )
 
 
 @router.get("/", response_model=PaginatedResponse[TagResponse])
@@ -37,11 +102,10 @@ async def list_tags(
     query: Optional[str] = Query(None, description="Fuzzy search query"),
     threshold: float = Query(0.2, ge=0.0, le=1.0, description="Similarity threshold"),
     page: int = Query(1, ge=1, description="Page number"),
-    page_size: int = Query(24, ge=1, le=60, description="Items per page")
+    page_size: int = Query(24, ge=1, le=60, description="Items per page"),
+    db: Session = Depends(get_read_db)
 ):
     """List tags with optional fuzzy search and pagination"""
-    db = next(get_db())
-    
     tag_query = db.query(Tag)
     
     if query:
@@ -100,3 +164,89 @@ async def update_tag(tag_id: int, tag_update: TagUpdate, db: Session = Depends(g
     db.refresh(db_tag)
     
     return TagResponse.from_orm(db_tag)
+
+
+@router.get("/{tag_id}", response_model=TagDetailResponse)
+async def get_tag(tag_id: int, db: Session = Depends(get_read_db)):
+    """Get a tag and the number of shots carrying it"""
+    db_tag = db.query(Tag).filter(Tag.id == tag_id).first()
+    if not db_tag:
+        raise HTTPException(status_code=404, detail="Tag not found")
+    return _tag_detail(db, db_tag)
+
+
+@router.post("/{tag_id}/shots:bulk", response_model=BulkTagResponse)
+async def bulk_tag_shots(tag_id: int, request: BulkShotsRequest, db: Session = Depends(get_db)):
+    """Apply a tag to many shots in one statement; shots already tagged are left alone"""
+    if not db.query(Tag.id).filter(Tag.id == tag_id).first():
+        raise HTTPException(status_code=404, detail="Tag not found")
+    shot_ids = _bulk_shot_ids(request)
+    
+    # Selecting from shots skips unknown ids instead of failing the whole batch on the FK
+    added = _insert_shot_tags_ignoring_existing(
+        db, select(Shot.id, literal(tag_id, BigInteger)).where(_id_in(db, Shot.id, shot_ids))
+    )
+    db.commit()
+    invalidation.publish("tags", [tag_id])
+    
+    return BulkTagResponse(
+        tag_id=tag_id,
+        requested=len(shot_ids),
+        changed=added,
+        shot_count=tag_counts.counts(db, [tag_id])[tag_id]
+    )
+
+
+@router.delete("/{tag_id}/shots:bulk", response_model=BulkTagResponse)
+async def bulk_untag_shots(tag_id: int, request: BulkShotsRequest, db: Session = Depends(get_db)):
+    """Remove a tag from many shots in one statement"""
+    if not db.query(Tag.id).filter(Tag.id == tag_id).first():
+        raise HTTPException(status_code=404, detail="Tag not found")
+    shot_ids = _bulk_shot_ids(request)
+    
+    removed = db.query(ShotTag).filter(
+        ShotTag.tag_id == tag_id, _id_in(db, ShotTag.shot_id, shot_ids)
+    ).delete(synchronize_session=False)
+    db.commit()
+    invalidation.publish("tags", [tag_id])
+    
+    return BulkTagResponse(
+        tag_id=tag_id,
+        requested=len(shot_ids),
+        changed=removed,
+        shot_count=tag_counts.counts(db, [tag_id])[tag_id]
+    )
+
+
+@router.post("/{tag_id}/merge", response_model=TagMergeResponse)
+async def merge_tags(tag_id: int, request: TagMergeRequest, db: Session = Depends(get_db)):
+    """Fold duplicate tags into this one: their shots gain this tag and the duplicates are deleted"""
+    source_ids = sorted(set(request.source_ids))
+    if tag_id in source_ids:
+        raise HTTPException(status_code=400, detail="A tag cannot be merged into itself")
+    
+    # Lock every tag involved, in id order, so concurrent merges neither deadlock nor
+    # tag shots with a tag that is about to disappear
+    tags = db.query(Tag).filter(_id_in(db, Tag.id, [tag_id, *source_ids])) \
+        .order_by(Tag.id).with_for_update().all()
+    found = {tag.id for tag in tags}
+    if tag_id not in found:
+        raise HTTPException(status_code=404, detail="Tag not found")
+    missing = [source_id for source_id in source_ids if source_id not in found]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Tags not found: {missing}")
+    
+    # Three set-wise statements in one transaction, however many shots are affected
+    moved = _insert_shot_tags_ignoring_existing(
+        db,
+        select(ShotTag.shot_id, literal(tag_id, BigInteger))
+        .where(_id_in(db, ShotTag.tag_id, source_ids))
+        .distinct()
+    )
+    db.query(ShotTag).filter(_id_in(db, ShotTag.tag_id, source_ids)).delete(synchronize_session=False)
+    db.query(Tag).filter(_id_in(db, Tag.id, source_ids)).delete(synchronize_session=False)
+    db.commit()
+    invalidation.publish("tags", [tag_id, *source_ids])
+    
+    target = db.query(Tag).filter(Tag.id == tag_id).one()
+    return TagMergeResponse(tag=_tag_detail(db, target), merged_ids=source_ids, moved=moved)
@@ -1,10 +1,15 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from sqlalchemy import func
 
-from app.core.deps import get_db
+from app.core.deps import get_db, get_read_db
+from app.core.profiling import ProfiledRoute
+from app.core.pagination import PaginatedResponse, get_offset, get_total_pages
 from app.models.video import Video
 from app.models.shot import Shot
+from app.search.fulltext import video_title_match, video_title_rank
+from app.search.timeline import decode_cursor, encode_cursor, overlapping_shots_query, timeline_cache
 from pydantic import BaseModel
 
 
@@ -24,7 +29,64 @@ class VideoResponse(BaseModel):
         from_attributes = True
 
 
-router = APIRouter()
+class TimelineShot(BaseModel):
+    id: int
+    t_start_ms: int
+    t_end_ms: int
+    thumb_url: Optional[str]
+
+
+class TimelineResponse(BaseModel):
+    items: List[TimelineShot]
+    next_cursor: Optional[str]
+
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+@router.get("/", response_model=PaginatedResponse[VideoResponse])
+async def list_videos(
+    query: Optional[str] = Query(None, description="Full-text search over titles"),
+    page: int = Query(1, ge=1, description="Page number"),
+    page_size: int = Query(24, ge=1, le=60, description="Items per page"),
+    db: Session = Depends(get_read_db)
+):
+    """List videos, or search their titles ranked by relevance, with pagination"""
+    video_query = db.query(Video)
+    
+    if query:
+        # Served by the GIN index on the generated title_tsv column
+        video_query = video_query.filter(video_title_match(db, query)) \
+            .order_by(video_title_rank(db, query).desc(), Video.id)
+    else:
+        video_query = video_query.order_by(Video.id)
+    
+    total = video_query.count()
+    videos = video_query.offset(get_offset(page, page_size)).limit(page_size).all()
+    
+    # Shot counts for the whole page in one grouped query
+    shot_counts = dict(
+        db.query(Shot.video_id, func.count(Shot.id))
+        .filter(Shot.video_id.in_([video.id for video in videos]))
+        .group_by(Shot.video_id)
+        .all()
+    ) if videos else {}
+    
+    return PaginatedResponse(
+        items=[
+            VideoResponse(
+                id=video.id,
+                title=video.title,
+                src_url=video.src_url,
+                shot_count=shot_counts.get(video.id, 0)
+            )
+            for video in videos
+        ],
+        total=total,
+        page=page,
+        page_size=page_size,
+        pages=get_total_pages(total, page_size)
+    )
 
 
 @router.post("/", response_model=VideoResponse)
@@ -47,7 +109,7 @@ async def create_video(video: VideoCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/{video_id}", response_model=VideoResponse)
-async def get_video(video_id: int, db: Session = Depends(get_db)):
+async def get_video(video_id: int, db: Session = Depends(get_read_db)):
     """Get video details including shot count"""
     video = db.query(Video).filter(Video.id == video_id).first()
     if not video:
@@ -62,3 +124,41 @@ async def get_video(video_id: int, db: Session = Depends(get_db)):
         src_url=video.src_url,
         shot_count=shot_count
     )
+
+
+@router.get("/{video_id}/shots", response_model=TimelineResponse)
+async def list_video_shots(
+    video_id: int,
+    # Bounded to int4 so the window fits the int4range the GiST index is built on
+    from_ms: int = Query(0, ge=0, le=2**31 - 2, description="Window start (inclusive)"),
+    to_ms: int = Query(2**31 - 1, ge=1, le=2**31 - 1, description="Window end (exclusive)"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum shots returned"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    db: Session = Depends(get_read_db)
+):
+    """Shots of a video overlapping a time window, in time order with keyset continuation"""
+    if to_ms <= from_ms:
+        raise HTTPException(status_code=400, detail="to_ms must be greater than from_ms")
+    try:
+        after = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    # Hot videos are answered from memory; the rest use the interval index
+    timeline = timeline_cache.get(db, video_id)
+    if timeline is not None:
+        rows = timeline.overlapping(from_ms, to_ms, after, limit)
+    else:
+        rows = overlapping_shots_query(db, video_id, from_ms, to_ms, after, limit).all()
+    
+    if not rows and not db.query(Video.id).filter(Video.id == video_id).first():
+        raise HTTPException(status_code=404, detail="Video not found")
+    
+    items = [
+        TimelineShot(id=shot_id, t_start_ms=t_start_ms, t_end_ms=t_end_ms, thumb_url=thumb_url)
+        for shot_id, t_start_ms, t_end_ms, thumb_url in rows
+    ]
+    next_cursor = None
+    if len(items) == limit:
+        next_cursor = encode_cursor(items[-1].t_start_ms, items[-1].id)
+    return TimelineResponse(items=items, next_cursor=next_cursor)
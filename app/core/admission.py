@@ -0,0 +1,179 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional
+
+from fastapi import Header, HTTPException
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+
+PRIORITIES = ("interactive", "batch")
+
+
+class AdmissionRejected(HTTPException):
+    """Raised when a request is shed; the client is told when to retry"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[float] = None):
+        retry_after = retry_after or settings.search_retry_after_s
+        super().__init__(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(max(1, round(retry_after)))}
+        )
+
+
+@dataclass
+class SearchBudget:
+    priority: str
+    deadline: float  # time.monotonic() value after which the request is abandoned
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+
+def search_budget(
+    x_request_class: Optional[str] = Header(None),
+    x_request_timeout_ms: Optional[int] = Header(None, ge=1)
+) -> SearchBudget:
+    """Priority class and deadline for a search, taken from request headers"""
+    priority = x_request_class if x_request_class in PRIORITIES else "interactive"
+    return SearchBudget(priority, _deadline(x_request_timeout_ms))
+
+
+def batch_search_budget(x_request_timeout_ms: Optional[int] = Header(None, ge=1)) -> SearchBudget:
+    """Batch endpoints always queue behind interactive traffic"""
+    return SearchBudget("batch", _deadline(x_request_timeout_ms))
+
+
+def _deadline(timeout_ms: Optional[int]) -> float:
+    # Clients may ask for a tighter budget than the server default, never a looser one
+    timeout_ms = min(timeout_ms or settings.search_timeout_ms, settings.search_timeout_ms)
+    return time.monotonic() + timeout_ms / 1000.0
+
+
+class AdmissionController:
+    """Bounded concurrency for an expensive stage, with a bounded priority wait queue"""
+
+    def __init__(self, max_concurrency: int, max_queue: int, batch_max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.batch_max_concurrency = batch_max_concurrency
+        self._active: Dict[str, int] = {priority: 0 for priority in PRIORITIES}
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {priority: deque() for priority in PRIORITIES}
+        self.admitted = 0
+        self.shed = 0
+        self.expired = 0
+
+    def _has_capacity(self, priority: str) -> bool:
+        if sum(self._active.values()) >= self.max_concurrency:
+            return False
+        return priority != "batch" or self._active["batch"] < self.batch_max_concurrency
+
+    def _queued(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    def _grant(self) -> None:
+        # Interactive waiters go first; batch waiters only while under their own cap
+        for priority in PRIORITIES:
+            waiters = self._waiters[priority]
+            while waiters and self._has_capacity(priority):
+                future = waiters.popleft()
+                if not future.done():
+                    self._active[priority] += 1
+                    future.set_result(None)
+
+    async def _acquire(self, budget: SearchBudget) -> None:
+        priority = budget.priority
+        # Don't overtake anyone already waiting at the same or a higher priority
+        ahead = PRIORITIES[:PRIORITIES.index(priority) + 1]
+        if self._has_capacity(priority) and not any(self._waiters[p] for p in ahead):
+            self._active[priority] += 1
+            return
+
+        if self._queued() >= self.max_queue:
+            self.shed += 1
+            # Batch callers are asked to slow down; interactive callers see an overloaded server
+            status_code = 429 if priority == "batch" else 503
+            raise AdmissionRejected(status_code, "Search capacity exhausted")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(future)
+        try:
+            await asyncio.wait_for(future, timeout=max(budget.remaining(), 0))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            # Abandoned waiters leave the queue at once so they stop counting toward max_queue
+            try:
+                self._waiters[priority].remove(future)
+            except ValueError:
+                pass
+            if future.done() and not future.cancelled():
+                # The slot was granted as we gave up; hand it on
+                self._release(priority)
+            if isinstance(exc, asyncio.TimeoutError):
+                self.expired += 1
+                raise AdmissionRejected(503, "Search deadline exceeded while queued")
+            raise
+
+    def _release(self, priority: str) -> None:
+        self._active[priority] -= 1
+        self._grant()
+
+    @asynccontextmanager
+    async def admit(self, budget: SearchBudget):
+        await self._acquire(budget)
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self._release(budget.priority)
+
+    def stats(self) -> dict:
+        return {
+            "active": dict(self._active),
+            "queued": {priority: len(waiters) for priority, waiters in self._waiters.items()},
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "expired": self.expired,
+        }
+
+
+SET_STATEMENT_TIMEOUT = text("SELECT set_config('statement_timeout', :value, true)")
+
+
+def apply_statement_timeout(db: Session, budget: SearchBudget) -> None:
+    """Let PostgreSQL cancel the search's statements once the client budget is spent"""
+    remaining_ms = int(budget.remaining() * 1000)
+    if remaining_ms <= 0:
+        raise AdmissionRejected(503, "Search deadline exceeded")
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    db.execute(SET_STATEMENT_TIMEOUT, {"value": str(remaining_ms)})
+
+
+RESET_STATEMENT_TIMEOUT = text("SET LOCAL statement_timeout TO DEFAULT")
+
+
+def reset_statement_timeout(db: Session) -> None:
+    """Lift the search budget so the rest of the transaction runs under the default timeout"""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    db.execute(RESET_STATEMENT_TIMEOUT)
+
+
+def is_statement_timeout(exc: OperationalError) -> bool:
+    # SQLSTATE 57014 is query_canceled, raised when statement_timeout fires
+    return getattr(exc.orig, "sqlstate", None) == "57014"
+
+
+# Guards the embedding and vector search stages of this worker
+search_admission = AdmissionController(
+    settings.search_max_concurrency,
+    settings.search_max_queue,
+    settings.search_batch_max_concurrency
+)
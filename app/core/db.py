@@ -1,19 +1,61 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from app.core.config import settings
 
+
+def _engine_options(url: str) -> dict:
+    # SQLite (local development and tests) shares one connection; PostgreSQL gets a
+    # real pool because searches run concurrently in the threadpool
+    if url.startswith("sqlite"):
+        return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_pre_ping": True,
+    }
+
+
+def _configure_prepared_statements(bind) -> None:
+    # Hot statements keep one SQL text per request shape, so psycopg's server-side
+    # prepared statements skip parsing and planning once a text has been seen
+    if bind.dialect.name == "postgresql" and bind.dialect.driver == "psycopg":
+        @event.listens_for(bind, "connect")
+        def set_prepare_options(dbapi_connection, connection_record):
+            # None disables preparing altogether
+            dbapi_connection.prepare_threshold = (
+                settings.db_prepare_threshold if settings.db_prepared_statements else None
+            )
+            dbapi_connection.prepared_max = settings.db_prepared_max
+
+
 engine = create_engine(
     settings.database_url,
-    poolclass=StaticPool,
     echo=False,
+    **_engine_options(settings.database_url)
 )
+_configure_prepared_statements(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Optional read replica for read-only endpoints; sessions are tagged so commits on
+# them are never mistaken for writes
+replica_engine = None
+ReplicaSessionLocal = None
+if settings.database_replica_url:
+    replica_engine = create_engine(
+        settings.database_replica_url,
+        echo=False,
+        **_engine_options(settings.database_replica_url)
+    )
+    _configure_prepared_statements(replica_engine)
+    ReplicaSessionLocal = sessionmaker(
+        autocommit=False, autoflush=False, bind=replica_engine, info={"replica": True}
+    )
+
 
 def get_db():
     db = SessionLocal()
@@ -1,6 +1,55 @@
-from typing import Generator
+import hmac
+from contextlib import contextmanager
+from typing import Generator, Iterator, Optional
+from fastapi import Depends, Header, HTTPException, Request
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.core.db import get_db
+from app.core.replica import replica_router
 
-__all__ = ["get_db"]
+__all__ = ["get_db", "get_read_db", "detached_session", "is_admin_token", "require_admin"]
+
+
+def get_read_db(request: Request, primary: Session = Depends(get_db)) -> Generator[Session, None, None]:
+    """Session for read-only endpoints: the replica when it is fresh enough for this client"""
+    # The primary session only connects if it is actually used, so routing away is free
+    if not replica_router.use_replica(request):
+        replica_router.primary_reads += 1
+        yield primary
+        return
+    replica_router.replica_reads += 1
+    db = replica_router.session_factory()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@contextmanager
+def detached_session(db: Session) -> Iterator[Session]:
+    """A new session on the engine db is bound to, for work that may outlive the request
+
+    Request sessions are closed when the response is sent and are not thread-safe,
+    so work shared with other requests must never borrow one.
+    """
+    session = Session(bind=db.get_bind(), info=dict(db.info), autoflush=False)
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """Check a caller-supplied token against the configured admin token"""
+    if not settings.admin_token or not token:
+        return False
+    return hmac.compare_digest(token, settings.admin_token)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Guard admin-only endpoints; they do not exist unless an admin token is configured"""
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
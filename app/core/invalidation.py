@@ -0,0 +1,42 @@
+import threading
+from collections import Counter
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional
+
+
+# Callbacks receive the affected ids, or None when everything under the topic changed
+Callback = Callable[[Optional[FrozenSet[int]]], None]
+
+
+class InvalidationRegistry:
+    """Fan out "these rows changed" notifications to the in-process caches that hold them
+
+    Writers publish once per operation with every affected id, so a bulk edit of
+    thousands of rows costs each cache one invalidation rather than one per row.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, List[Callback]] = {}
+        self.published: Counter = Counter()
+
+    def subscribe(self, topic: str, callback: Callback) -> None:
+        with self._lock:
+            self._subscribers.setdefault(topic, []).append(callback)
+
+    def publish(self, topic: str, ids: Optional[Iterable[int]] = None) -> None:
+        """Invalidate ids under topic in every subscribed cache; call after the commit"""
+        keys = None if ids is None else frozenset(ids)
+        with self._lock:
+            callbacks = list(self._subscribers.get(topic, ()))
+            self.published[topic] += 1
+        for callback in callbacks:
+            callback(keys)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": {topic: len(callbacks) for topic, callbacks in self._subscribers.items()},
+            "published": dict(self.published),
+        }
+
+
+invalidation = InvalidationRegistry()
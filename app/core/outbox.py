@@ -0,0 +1,154 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.core.invalidation import InvalidationRegistry, invalidation
+from app.models.change_log import ChangeLog
+
+
+# (tx_id, id) of the last change applied
+Position = Tuple[int, int]
+
+
+class ChangeLogConsumer:
+    """Tail change_log and publish each batch of changes to the in-process caches
+
+    On PostgreSQL, ids are handed out when rows are inserted, not when their
+    transaction commits, so tailing by id alone would skip a slow transaction's
+    rows once a later one had been read. Changes are therefore read in
+    (transaction id, id) order and only from transactions older than every one
+    still running, which can no longer gain rows.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        registry: InvalidationRegistry = invalidation,
+        poll_interval_s: float = 1.0,
+        batch_size: int = 1000,
+        retention_s: float = 86400.0,
+    ):
+        self.session_factory = session_factory
+        self.registry = registry
+        self.poll_interval_s = poll_interval_s
+        self.batch_size = batch_size
+        self.retention_s = retention_s
+        self.position: Optional[Position] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pruned_at = time.monotonic()
+        self.applied = 0
+        self.batches = 0
+        self.pruned = 0
+        self.last_error: Optional[str] = None
+
+    def _start_position(self, db: Session) -> Position:
+        # Caches are built from the current state, so only changes from now on matter
+        if db.get_bind().dialect.name == "postgresql":
+            xmin = db.execute(text("SELECT txid_snapshot_xmin(txid_current_snapshot())")).scalar()
+            return int(xmin), 0
+        return 0, int(db.execute(text("SELECT coalesce(max(id), 0) FROM change_log")).scalar())
+
+    def _read(self, db: Session) -> List:
+        if db.get_bind().dialect.name == "postgresql":
+            return db.execute(text("""
+                SELECT id, entity, shot_id, tag_id, video_id, tx_id FROM change_log
+                WHERE (tx_id, id) > (:tx_id, :id)
+                  AND tx_id < txid_snapshot_xmin(txid_current_snapshot())
+                ORDER BY tx_id, id
+                LIMIT :limit
+            """), {"tx_id": self.position[0], "id": self.position[1], "limit": self.batch_size}).all()
+        # SQLite has a single writer, so ids already follow commit order
+        return db.execute(text("""
+            SELECT id, entity, shot_id, tag_id, video_id, 0 AS tx_id FROM change_log
+            WHERE id > :id ORDER BY id LIMIT :limit
+        """), {"id": self.position[1], "limit": self.batch_size}).all()
+
+    def poll(self) -> int:
+        """Apply one batch of new changes; returns how many were applied"""
+        db = self.session_factory()
+        try:
+            if self.position is None:
+                self.position = self._start_position(db)
+                return 0
+            rows = self._read(db)
+            if time.monotonic() - self._pruned_at > 3600:
+                self._prune(db)
+        finally:
+            db.close()
+        if rows:
+            self.apply(rows)
+            self.position = (int(rows[-1].tx_id), int(rows[-1].id))
+        return len(rows)
+
+    def apply(self, rows) -> None:
+        """Publish the ids touched by a batch, once per topic however many rows it holds"""
+        shots, videos, tags = set(), set(), set()
+        for row in rows:
+            if row.entity == "shot":
+                shots.add(row.shot_id)
+                if row.video_id is not None:
+                    videos.add(row.video_id)
+            else:
+                # Tag rows and shot tags both change a tag's shots or count
+                tags.add(row.tag_id)
+        for topic, ids in (("shots", shots), ("videos", videos), ("tags", tags)):
+            if ids:
+                self.registry.publish(topic, ids)
+        self.applied += len(rows)
+        self.batches += 1
+
+    def _prune(self, db: Session) -> None:
+        # Each worker tails within seconds, so rows a day old are read by everyone
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.retention_s)
+        self.pruned += db.query(ChangeLog).filter(ChangeLog.created_at < cutoff).delete(
+            synchronize_session=False
+        )
+        db.commit()
+        self._pruned_at = time.monotonic()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                # Drain a backlog in consecutive batches before going back to sleep
+                while await run_in_threadpool(self.poll) == self.batch_size:
+                    pass
+                self.last_error = None
+            except Exception as exc:
+                self.last_error = f"{type(exc).__name__}: {exc}"
+            await asyncio.sleep(self.poll_interval_s)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "position": list(self.position) if self.position else None,
+            "applied": self.applied,
+            "batches": self.batches,
+            "pruned": self.pruned,
+            "last_error": self.last_error,
+        }
+
+
+change_consumer = ChangeLogConsumer(
+    poll_interval_s=settings.change_log_poll_s,
+    batch_size=settings.change_log_batch_size,
+    retention_s=settings.change_log_retention_s,
+)
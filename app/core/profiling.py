@@ -0,0 +1,186 @@
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.deps import is_admin_token
+
+
+# Only one sampling session may run per worker at a time
+_sampler_lock = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename.replace(os.sep, "/").split("/")
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame, thread_name: str) -> str:
+    """Render a frame chain root-first in the collapsed format used by flamegraph tools"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ";".join(reversed(labels))
+
+
+class SamplingProfiler:
+    """Background thread that periodically samples the Python stack of every other thread"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                self.samples[collapse_stack(frame, names.get(thread_id, str(thread_id)))] += 1
+
+    def collapsed(self) -> str:
+        """One `stack count` line per distinct stack, ready for flamegraph.pl or speedscope"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def try_acquire_sampler() -> bool:
+    return _sampler_lock.acquire(blocking=False)
+
+
+def release_sampler() -> None:
+    _sampler_lock.release()
+
+
+# Per-request profiling: phase timings collected while a request opted in via X-Profile
+class RequestProfile:
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.sql_statements = 0
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        """Format the collected phases as a Server-Timing header value (milliseconds)"""
+        phases = dict(self.phases)
+        # Whatever the route spent outside the endpoint body is request validation
+        # plus response-model validation and serialization
+        if "route" in phases and "endpoint" in phases:
+            phases["serialize"] = max(phases.pop("route") - phases["endpoint"], 0.0)
+        entries = []
+        for name, seconds in phases.items():
+            entry = f"{name};dur={seconds * 1000:.2f}"
+            if name == "sql":
+                entry += f';desc="{self.sql_statements} statements"'
+            entries.append(entry)
+        return ", ".join(entries)
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+
+def current_profile() -> Optional[RequestProfile]:
+    return _current_profile.get()
+
+
+@contextmanager
+def profile_phase(name: str):
+    """Time a block of request handling; a no-op unless the request is being profiled"""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - start)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    starts = conn.info.get("profile_query_start")
+    if profile is not None and starts:
+        profile.add("sql", time.perf_counter() - starts.pop())
+        profile.sql_statements += 1
+
+
+def _timed_endpoint(endpoint):
+    # FastAPI reads the endpoint signature through __wrapped__, so dependencies still resolve
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def timed(*args, **kwargs):
+            with profile_phase("endpoint"):
+                return await endpoint(*args, **kwargs)
+    else:
+        @functools.wraps(endpoint)
+        def timed(*args, **kwargs):
+            with profile_phase("endpoint"):
+                return endpoint(*args, **kwargs)
+    return timed
+
+
+class ProfiledRoute(APIRoute):
+    """Route class that splits a profiled request into endpoint time and serialization time"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def profiled_handler(request: Request):
+            with profile_phase("route"):
+                return await handler(request)
+
+        return profiled_handler
+
+
+async def profiling_middleware(request: Request, call_next):
+    """Attach a Server-Timing breakdown when an admin sends the X-Profile header"""
+    if "x-profile" not in request.headers or not is_admin_token(request.headers.get("x-admin-token")):
+        return await call_next(request)
+
+    profile = RequestProfile()
+    token = _current_profile.set(profile)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _current_profile.reset(token)
+    profile.add("total", time.perf_counter() - start)
+    response.headers["Server-Timing"] = profile.server_timing()
+    return response
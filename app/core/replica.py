@@ -0,0 +1,115 @@
+import math
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, List, Optional
+
+from fastapi import Request
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.db import ReplicaSessionLocal
+
+
+# Clients that wrote recently carry this cookie (a unix time) and read from the primary
+STICKY_COOKIE = "cvlr_primary_until"
+
+# Replication delay as seen by a standby; zero once it has replayed everything received
+LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+# Set by the middleware for each request; commits on primary sessions are recorded in it
+_request_writes: ContextVar[Optional[List[bool]]] = ContextVar("request_writes", default=None)
+
+
+@event.listens_for(Session, "after_commit")
+def _record_write(session):
+    writes = _request_writes.get()
+    if writes is not None and not session.info.get("replica"):
+        writes.append(True)
+
+
+class ReplicaRouter:
+    """Decides per request whether reads may go to the replica"""
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None):
+        self.session_factory = session_factory
+        self._lock = threading.Lock()
+        self._lag: Optional[float] = None
+        self._checked_at = -math.inf
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.session_factory is not None
+
+    def _measure_lag(self) -> Optional[float]:
+        db = self.session_factory()
+        try:
+            if db.get_bind().dialect.name != "postgresql":
+                return 0.0
+            return float(db.execute(text(LAG_SQL)).scalar() or 0)
+        except Exception:
+            # An unreachable replica is treated like one that is too far behind
+            return None
+        finally:
+            db.close()
+
+    def lag_seconds(self) -> Optional[float]:
+        """Replica lag, re-measured at most every replica_lag_check_s; None if unreachable"""
+        with self._lock:
+            if time.monotonic() - self._checked_at >= settings.replica_lag_check_s:
+                self._lag = self._measure_lag()
+                self._checked_at = time.monotonic()
+            return self._lag
+
+    def use_replica(self, request: Request) -> bool:
+        if not self.enabled:
+            return False
+        sticky_until = request.cookies.get(STICKY_COOKIE)
+        try:
+            if sticky_until and float(sticky_until) > time.time():
+                return False
+        except ValueError:
+            pass
+        lag = self.lag_seconds()
+        return lag is not None and lag <= settings.replica_max_lag_s
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "lag_seconds": self._lag,
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+        }
+
+
+replica_router = ReplicaRouter(ReplicaSessionLocal)
+
+
+async def read_your_writes_middleware(request: Request, call_next):
+    """Pin a client to the primary for a while after a request of theirs committed a write"""
+    if not replica_router.enabled:
+        return await call_next(request)
+
+    writes: List[bool] = []
+    token = _request_writes.set(writes)
+    try:
+        response = await call_next(request)
+    finally:
+        _request_writes.reset(token)
+    if writes:
+        response.set_cookie(
+            STICKY_COOKIE,
+            f"{time.time() + settings.read_your_writes_s:.3f}",
+            max_age=math.ceil(settings.read_your_writes_s),
+            httponly=True,
+            samesite="lax"
+        )
+    return response
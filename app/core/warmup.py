@@ -0,0 +1,158 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session, configure_mappers
+
+from app.core.config import settings
+from app.core.db import SessionLocal, engine, replica_engine
+from app.models.tag import Tag
+from app.search.ann import INDEX_NAME, QUANTIZED_INDEX_NAME, apply_search_params
+from app.search.embedder import get_embedder
+from app.search.queries import build_shot_query, build_vector_query, get_tag_names
+from app.search.snapshot import snapshot_store
+
+
+# Without these the worker cannot serve a request, so their failure keeps it not ready
+REQUIRED_PHASES = ("pool", "queries")
+
+
+class WarmupState:
+    """Progress of this worker's warm-up; readiness waits for it to finish"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._retry_lock = threading.Lock()
+        self.started = False
+        self.finished = False
+        self.phases: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.finished and not any(phase in self.errors for phase in REQUIRED_PHASES)
+
+    def record(self, phase: str, seconds: float, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self.phases[phase] = round(seconds * 1000, 1)
+            if error is not None:
+                self.errors[phase] = f"{type(error).__name__}: {error}"
+            else:
+                self.errors.pop(phase, None)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "phases_ms": dict(self.phases),
+            "errors": dict(self.errors),
+        }
+
+
+warmup_state = WarmupState()
+
+
+def _warm_embedder() -> None:
+    embedder = get_embedder()
+    # One call loads weights and triggers any lazy initialisation of the model
+    embedder.embed("warm-up")
+
+
+def _warm_pool() -> None:
+    # Open connections up front so the first requests don't pay for TCP + auth
+    engines = [engine] + ([replica_engine] if replica_engine is not None else [])
+    for bind in engines:
+        connections = []
+        try:
+            for _ in range(max(1, settings.warmup_connections)):
+                connection = bind.connect()
+                connection.execute(text("SELECT 1"))
+                connections.append(connection)
+        finally:
+            for connection in connections:
+                connection.close()
+
+
+def _warm_queries() -> None:
+    # Running the hot statements once fills SQLAlchemy's compiled statement cache
+    # and pulls the pages they touch into shared buffers
+    db: Session = SessionLocal()
+    try:
+        query, _ = build_shot_query(db, page=1, page_size=24)
+        rows = db.execute(query).all()
+        get_tag_names(db, [row.id for row in rows])
+        db.query(Tag).order_by(Tag.name).limit(24).all()
+
+        query_vector = get_embedder().embed("warm-up")
+        if query_vector and db.get_bind().dialect.name == "postgresql":
+            apply_search_params(db)
+            build_vector_query(db, query_vector, 50, hybrid=False)
+    finally:
+        db.rollback()
+        db.close()
+
+
+def _warm_caches() -> None:
+    if settings.vector_backend == "snapshot":
+        snapshot = snapshot_store.current()
+        if snapshot is not None and snapshot.count:
+            # Touch every page of the mapping; after the first worker this is a page cache hit
+            float(snapshot.matrix.sum())
+
+    if not settings.warmup_prewarm or engine.dialect.name != "postgresql":
+        return
+    with engine.connect() as connection:
+        installed = connection.execute(
+            text("SELECT 1 FROM pg_extension WHERE extname = 'pg_prewarm'")
+        ).scalar()
+        if not installed:
+            return
+        for relation in ("shots", INDEX_NAME, QUANTIZED_INDEX_NAME, "tags", "shot_tags"):
+            connection.execute(
+                text("SELECT pg_prewarm(to_regclass(:name)) WHERE to_regclass(:name) IS NOT NULL"),
+                {"name": relation}
+            )
+
+
+PHASES: List[Tuple[str, Callable[[], None]]] = [
+    ("embedder", _warm_embedder),
+    ("mappers", configure_mappers),
+    ("pool", _warm_pool),
+    ("queries", _warm_queries),
+    ("caches", _warm_caches),
+]
+
+
+def _run_phase(state: WarmupState, name: str, phase: Callable[[], None]) -> None:
+    start = time.perf_counter()
+    try:
+        phase()
+    except Exception as exc:
+        state.record(name, time.perf_counter() - start, exc)
+    else:
+        state.record(name, time.perf_counter() - start)
+
+
+def run_warmup(state: WarmupState = warmup_state, phases=None) -> WarmupState:
+    """Run each warm-up phase, timing it; a failing phase is recorded and the rest still run"""
+    state.started = True
+    total_start = time.perf_counter()
+    for name, phase in phases or PHASES:
+        _run_phase(state, name, phase)
+    state.record("total", time.perf_counter() - total_start)
+    state.finished = True
+    return state
+
+
+def retry_required(state: WarmupState = warmup_state, phases=None) -> WarmupState:
+    """Re-run required phases that failed, so a worker started during an outage becomes ready"""
+    # Readiness probes call this; one retry at a time is enough
+    if not state.finished or not state._retry_lock.acquire(blocking=False):
+        return state
+    try:
+        for name, phase in phases or PHASES:
+            if name in REQUIRED_PHASES and name in state.errors:
+                _run_phase(state, name, phase)
+    finally:
+        state._retry_lock.release()
+    return state
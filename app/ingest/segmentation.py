@@ -0,0 +1,229 @@
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.shot import Shot
+
+
+# Frames are analysed at this size: colour histograms and coarse frame differences
+# don't need full resolution, and small frames keep decoding and memory cheap
+ANALYSIS_WIDTH = 160
+ANALYSIS_HEIGHT = 90
+
+# (start_ms, end_ms) of one detected shot
+Segment = Tuple[int, int]
+
+
+def decode_ffmpeg(path: str, fps: float) -> Iterator[np.ndarray]:
+    """RGB frames sampled at fps and scaled to the analysis size, piped from ffmpeg"""
+    frame_bytes = ANALYSIS_WIDTH * ANALYSIS_HEIGHT * 3
+    # stderr goes to a file: a pipe nobody reads could fill up and stall the decode
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(
+            [
+                "ffmpeg", "-loglevel", "error", "-i", path,
+                "-vf", f"fps={fps},scale={ANALYSIS_WIDTH}:{ANALYSIS_HEIGHT}",
+                "-f", "rawvideo", "-pix_fmt", "rgb24", "-",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=stderr,
+        )
+        try:
+            while True:
+                data = process.stdout.read(frame_bytes)
+                if len(data) < frame_bytes:
+                    break
+                yield np.frombuffer(data, dtype=np.uint8).reshape(ANALYSIS_HEIGHT, ANALYSIS_WIDTH, 3)
+            # An unreadable source produces no frames; it must not pass for an empty video
+            if process.wait() != 0:
+                stderr.seek(0)
+                message = stderr.read().decode(errors="replace").strip()
+                raise RuntimeError(f"ffmpeg exited with status {process.returncode} for {path}: {message[-500:]}")
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+
+
+def decode_opencv(path: str, fps: float) -> Iterator[np.ndarray]:
+    """RGB frames sampled at fps via OpenCV, for hosts without an ffmpeg binary"""
+    try:
+        import cv2
+    except ImportError:
+        raise RuntimeError("The opencv decoder needs opencv-python installed")
+    capture = cv2.VideoCapture(path)
+    try:
+        source_fps = capture.get(cv2.CAP_PROP_FPS) or fps
+        step = max(source_fps / fps, 1.0)
+        index, next_frame = 0, 0.0
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            if index >= next_frame:
+                next_frame += step
+                frame = cv2.resize(frame, (ANALYSIS_WIDTH, ANALYSIS_HEIGHT), interpolation=cv2.INTER_AREA)
+                yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            index += 1
+    finally:
+        capture.release()
+
+
+def decode_numpy(path: str, fps: float) -> Iterator[np.ndarray]:
+    """Frames from a (frames, height, width, 3) uint8 .npy file, already sampled at fps"""
+    # Memory-mapped, so only the frames being analysed are paged in
+    frames = np.load(path, mmap_mode="r")
+    for frame in frames:
+        yield frame
+
+
+# Decoders by name; each yields RGB uint8 frames sampled at the requested rate
+DECODERS: Dict[str, Callable[[str, float], Iterator[np.ndarray]]] = {
+    "ffmpeg": decode_ffmpeg,
+    "opencv": decode_opencv,
+    "numpy": decode_numpy,
+}
+
+
+def colour_histograms(frames: np.ndarray, bins: int = 16) -> np.ndarray:
+    """Per-channel colour histograms of a (n, h, w, 3) batch, each channel summing to 1"""
+    count = len(frames)
+    pixels = frames.shape[1] * frames.shape[2]
+    # Bin index of every channel value, offset so all channels and frames share one bincount
+    binned = (frames.astype(np.uint16) * bins) >> 8
+    binned += np.arange(3, dtype=np.uint16) * bins
+    offsets = np.arange(count, dtype=np.int64)[:, None] * 3 * bins
+    index = binned.reshape(count, -1) + offsets
+    histograms = np.bincount(index.ravel(), minlength=count * 3 * bins).reshape(count, 3 * bins)
+    return histograms.astype(np.float32) / pixels
+
+
+def coarse_luma(frames: np.ndarray, step: int = 4) -> np.ndarray:
+    """Subsampled luma of a batch, scaled to [0, 1], for frame-difference scores"""
+    sampled = frames[:, ::step, ::step].astype(np.float32)
+    return (sampled @ np.array([0.299, 0.587, 0.114], dtype=np.float32)) / 255.0
+
+
+def frame_features(
+    frames: Iterable[np.ndarray], batch_size: int = 64, bins: int = 16
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """(histogram, luma) per frame, computed a batch at a time so memory stays bounded"""
+    frames = iter(frames)
+    while True:
+        batch = list(islice(frames, batch_size))
+        if not batch:
+            return
+        stacked = np.stack(batch)
+        yield from zip(colour_histograms(stacked, bins), coarse_luma(stacked))
+
+
+def cut_scores(features: Iterable[Tuple[np.ndarray, np.ndarray]], histogram_weight: float = 0.7) -> Iterator[float]:
+    """Change score in [0, 1] between each frame and the one before it (0 for the first frame)"""
+    previous = None
+    for histogram, luma in features:
+        if previous is None:
+            score = 0.0
+        else:
+            # Histograms ignore motion; the pixel difference catches cuts between shots
+            # with similar colours
+            histogram_distance = float(np.abs(histogram - previous[0]).sum()) / 6
+            pixel_distance = float(np.abs(luma - previous[1]).mean())
+            score = histogram_weight * histogram_distance + (1 - histogram_weight) * pixel_distance
+        previous = (histogram, luma)
+        yield score
+
+
+def detect_segments(
+    frames: Iterable[np.ndarray],
+    fps: float,
+    threshold: float = 0.3,
+    min_shot_ms: int = 500,
+    batch_size: int = 64,
+) -> List[Segment]:
+    """Split a frame stream into shots at frames whose change score exceeds threshold"""
+    min_frames = max(1, int(round(min_shot_ms * fps / 1000)))
+    cuts, frame_count = [0], 0
+    for index, score in enumerate(cut_scores(frame_features(frames, batch_size))):
+        frame_count = index + 1
+        # A flash or fast pan can score several frames in a row; keep shots a minimum length
+        if score > threshold and index - cuts[-1] >= min_frames:
+            cuts.append(index)
+    if not frame_count:
+        return []
+    cuts.append(frame_count)
+    to_ms = 1000.0 / fps
+    return [(int(round(start * to_ms)), int(round(end * to_ms))) for start, end in zip(cuts, cuts[1:])]
+
+
+def segment_file(
+    path: str,
+    decoder: str = "ffmpeg",
+    fps: Optional[float] = None,
+    threshold: Optional[float] = None,
+    min_shot_ms: Optional[int] = None,
+) -> List[Segment]:
+    """Decode a video and detect its shots; runs in a worker process"""
+    fps = fps or settings.segment_fps
+    return detect_segments(
+        DECODERS[decoder](path, fps),
+        fps,
+        settings.segment_threshold if threshold is None else threshold,
+        settings.segment_min_shot_ms if min_shot_ms is None else min_shot_ms,
+    )
+
+
+def insert_shots(db: Session, video_id: int, segments: List[Segment]) -> int:
+    """Bulk-insert the detected shots of a video in one executemany"""
+    if not segments:
+        return 0
+    db.execute(insert(Shot), [
+        {"video_id": video_id, "t_start_ms": start, "t_end_ms": end}
+        for start, end in segments
+    ])
+    return len(segments)
+
+
+def ingest_videos(
+    db: Session,
+    videos: List[Tuple[int, str]],
+    decoder: str = "ffmpeg",
+    workers: Optional[int] = None,
+    **options,
+) -> Dict[int, object]:
+    """Segment (video id, path) pairs in a process pool and insert their shots
+
+    Decoding and feature extraction are CPU-bound, so every video gets its own
+    process; only the short segment lists come back to be written from here,
+    keeping database connections out of the workers. Each video is committed as
+    soon as it finishes. Returns the number of shots per video, or the error
+    that stopped it.
+    """
+    results: Dict[int, object] = {}
+    with ProcessPoolExecutor(max_workers=workers or settings.segment_workers) as pool:
+        futures = {
+            pool.submit(segment_file, path, decoder, **options): video_id
+            for video_id, path in videos
+        }
+        for future in as_completed(futures):
+            video_id = futures[future]
+            try:
+                segments = future.result()
+            except Exception as exc:
+                results[video_id] = exc
+                continue
+            try:
+                results[video_id] = insert_shots(db, video_id, segments)
+                db.commit()
+            except Exception as exc:
+                # One video failing to write (e.g. deleted meanwhile) must not stop the others
+                db.rollback()
+                results[video_id] = exc
+    return results
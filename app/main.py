@@ -1,9 +1,41 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api import health, videos, shots, tags, decks
+from app.api import admin, clusters, health, videos, shots, tags, decks
+from app.core.config import settings
+from app.core.outbox import change_consumer
+from app.core.profiling import profiling_middleware
+from app.core.replica import read_your_writes_middleware
+from app.core.warmup import run_warmup, warmup_state
+from app.search.search_log import search_log
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so liveness answers at once; readiness waits for it
+    task = None
+    if settings.warmup_enabled:
+        task = asyncio.create_task(run_in_threadpool(run_warmup))
+    else:
+        warmup_state.finished = True
+    if settings.search_log_enabled:
+        search_log.start()
+    if settings.change_log_enabled:
+        change_consumer.start()
+    yield
+    await change_consumer.stop()
+    if task is not None:
+        await asyncio.wait([task], timeout=5)
+    if settings.search_log_enabled:
+        # Write out searches still buffered so a clean shutdown loses none
+        await search_log.stop()
+
 
-app = FastAPI(title="CVLR-API", version="1.0.0")
+app = FastAPI(title="CVLR-API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -12,9 +44,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.middleware("http")(profiling_middleware)
+app.middleware("http")(read_your_writes_middleware)
 
 app.include_router(health.router, tags=["health"])
 app.include_router(videos.router, prefix="/videos", tags=["videos"])
 app.include_router(shots.router, prefix="/shots", tags=["shots"])
 app.include_router(tags.router, prefix="/tags", tags=["tags"])
 app.include_router(decks.router, prefix="/decks", tags=["decks"])
+app.include_router(clusters.router, prefix="/clusters", tags=["clusters"])
+app.include_router(admin.router, prefix="/admin", tags=["admin"])
@@ -4,5 +4,10 @@ from .video import Video
 from .shot import Shot
 from .tag import Tag, ShotTag
 from .deck import Deck, DeckItem
+from .duplicate import ShotDuplicate
+from .cluster import Cluster, ShotCluster
+from .search_log import SearchLog
+from .change_log import ChangeLog
+from .embedding import EmbeddingModel, ShotEmbedding
 
-__all__ = ["Base", "Video", "Shot", "Tag", "ShotTag", "Deck", "DeckItem"]
+__all__ = ["Base", "Video", "Shot", "Tag", "ShotTag", "Deck", "DeckItem", "ShotDuplicate", "Cluster", "ShotCluster", "SearchLog", "ChangeLog", "EmbeddingModel", "ShotEmbedding"]
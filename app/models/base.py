@@ -1,10 +1,15 @@
 from datetime import datetime
-from sqlalchemy import Column, DateTime
+from sqlalchemy import BigInteger, Column, DateTime, Integer
 from sqlalchemy.sql import func
 
 from app.core.db import Base
 
 
+# SQLite only auto-increments INTEGER PRIMARY KEY columns, so local test databases
+# get Integer ids while PostgreSQL keeps BIGINT
+IdType = BigInteger().with_variant(Integer, "sqlite")
+
+
 # Mixin class to automatically add created_at timestamp to models
 class TimestampMixin:
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, BigInteger, Text
+
+from app.core.db import Base
+from app.models.base import IdType, TimestampMixin
+
+
+# Transactional outbox: one row per changed shot, tag or shot tag, written by triggers
+# in the same transaction as the change (migration 0011) and tailed by every worker
+class ChangeLog(Base, TimestampMixin):
+    __tablename__ = "change_log"
+    
+    id = Column(IdType, primary_key=True, autoincrement=True)
+    entity = Column(Text, nullable=False)  # "shot", "tag" or "shot_tag"
+    op = Column(Text, nullable=False)      # "insert", "update" or "delete"
+    shot_id = Column(BigInteger)
+    tag_id = Column(BigInteger)
+    video_id = Column(BigInteger)          # Video of a changed shot
+    tx_id = Column(BigInteger)             # txid_current() of the writing transaction
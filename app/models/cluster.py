@@ -0,0 +1,26 @@
+from sqlalchemy import Column, BigInteger, Float, Index, Integer, Text, ForeignKey
+
+from app.core.db import Base
+from app.models.base import IdType, TimestampMixin
+
+
+# Model representing a visual theme found by k-means over shot embeddings
+class Cluster(Base, TimestampMixin):
+    __tablename__ = "clusters"
+    
+    id = Column(IdType, primary_key=True, autoincrement=True)
+    size = Column(Integer, nullable=False, default=0)  # Number of shots assigned
+    centroid = Column(Text, nullable=False)            # Centroid as a pgvector literal
+
+
+# Cluster assignment of each embedded shot
+class ShotCluster(Base):
+    __tablename__ = "shot_clusters"
+    __table_args__ = (
+        # Members of a cluster, most typical first (migration 0007)
+        Index("idx_shot_clusters_cluster", "cluster_id", "distance"),
+    )
+    
+    shot_id = Column(BigInteger, ForeignKey("shots.id", ondelete="CASCADE"), primary_key=True)
+    cluster_id = Column(BigInteger, ForeignKey("clusters.id", ondelete="CASCADE"), nullable=False)
+    distance = Column(Float, nullable=False)  # Distance to the centroid; small means typical
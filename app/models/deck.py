@@ -2,16 +2,18 @@ from sqlalchemy import Column, BigInteger, Integer, Text, ForeignKey
 from sqlalchemy.orm import relationship
 
 from app.core.db import Base
-from app.models.base import TimestampMixin
+from app.models.base import IdType, TimestampMixin
 
 
 # Model representing a collection of shots created by a user
 class Deck(Base, TimestampMixin):
     __tablename__ = "decks"
     
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    id = Column(IdType, primary_key=True, autoincrement=True)
     user_id = Column(BigInteger, nullable=False)
     title = Column(Text, nullable=False)
+    # Bumped whenever membership changes; keys cached deck centroids
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     # Relationship to deck items (shots in this deck)
     items = relationship("DeckItem", back_populates="deck", cascade="all, delete-orphan")
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, BigInteger, Float, ForeignKey
+
+from app.core.db import Base
+
+
+# Near-duplicate clusters found by the LSH job; every member (including the canonical
+# shot itself) points at the cluster's canonical shot, the lowest id in the cluster
+class ShotDuplicate(Base):
+    __tablename__ = "shot_duplicates"
+    
+    shot_id = Column(BigInteger, ForeignKey("shots.id", ondelete="CASCADE"), primary_key=True)
+    canonical_id = Column(BigInteger, ForeignKey("shots.id", ondelete="CASCADE"), nullable=False, index=True)
+    distance = Column(Float, nullable=False, default=0.0)  # Cosine distance to the canonical shot
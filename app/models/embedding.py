@@ -0,0 +1,38 @@
+from sqlalchemy import Column, BigInteger, Index, Integer, LargeBinary, Text, ForeignKey
+from sqlalchemy.orm import validates
+
+from app.core.db import Base
+from app.models.base import IdType, TimestampMixin
+from app.search.vectors import to_pgvector
+
+
+# A named embedding model; each has its own dimension and its own partial ANN index.
+# The "default" model is the one stored in shots.embedding.
+class EmbeddingModel(Base, TimestampMixin):
+    __tablename__ = "embedding_models"
+    
+    id = Column(IdType, primary_key=True, autoincrement=True)
+    name = Column(Text, nullable=False, unique=True)
+    dim = Column(Integer, nullable=False)
+    status = Column(Text, nullable=False, default="filling")  # "filling" until every shot is embedded, then "ready"
+    # Set for PCA-reduced models: the model projected from (re-ranking uses its full
+    # vectors) and the serialized projection applied to query vectors
+    source = Column(Text, nullable=True)
+    projection = Column(LargeBinary, nullable=True)
+
+
+# Embedding of a shot under a non-default model, filled side by side by scripts/reembed_shots.py
+class ShotEmbedding(Base):
+    __tablename__ = "shot_embeddings"
+    __table_args__ = (
+        # Shot deletes cascade through it (migration 0012)
+        Index("idx_shot_embeddings_shot", "shot_id"),
+    )
+    
+    model_id = Column(BigInteger, ForeignKey("embedding_models.id", ondelete="CASCADE"), primary_key=True)
+    shot_id = Column(BigInteger, ForeignKey("shots.id", ondelete="CASCADE"), primary_key=True)
+    embedding = Column(Text, nullable=False)  # vector without a fixed dimension
+    
+    @validates("embedding")
+    def _format_embedding(self, key, value):
+        return to_pgvector(value)
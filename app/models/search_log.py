@@ -0,0 +1,23 @@
+from sqlalchemy import BigInteger, Column, Float, Integer, JSON, Text
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+
+from app.core.db import Base
+from app.models.base import IdType, TimestampMixin
+
+
+# JSONB and BIGINT[] on PostgreSQL; SQLite test databases store both as JSON
+JsonType = JSON().with_variant(JSONB(), "postgresql")
+IdArrayType = JSON().with_variant(ARRAY(BigInteger), "postgresql")
+
+
+# One row per shot search, written in batches by the search log flusher
+class SearchLog(Base, TimestampMixin):
+    __tablename__ = "search_logs"
+    
+    id = Column(IdType, primary_key=True, autoincrement=True)
+    query = Column(Text)                                  # Text query, if any
+    filters = Column(JsonType, nullable=False)            # Tag filters and search parameters
+    latency_ms = Column(Float, nullable=False)            # Time spent in the endpoint
+    result_count = Column(Integer, nullable=False)        # Total matches across all pages
+    result_ids = Column(IdArrayType, nullable=False)      # Shot ids on the returned page, in order
+    stats = Column(JsonType, nullable=False)              # Embed/search timings, coalescing, admission wait
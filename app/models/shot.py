@@ -1,21 +1,33 @@
-from sqlalchemy import Column, BigInteger, Integer, Text, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import CheckConstraint, Column, BigInteger, Integer, Text, ForeignKey
+from sqlalchemy.orm import deferred, relationship, validates
 
 from app.core.db import Base
-from app.models.base import TimestampMixin
+from app.models.base import IdType, TimestampMixin
+from app.search.vectors import to_pgvector
 
 
 # Model representing a time segment from a video with vector embeddings
 class Shot(Base, TimestampMixin):
     __tablename__ = "shots"
+    __table_args__ = (
+        # int4range(t_start_ms, t_end_ms) in the timeline index rejects inverted bounds
+        CheckConstraint("t_end_ms >= t_start_ms", name="shots_time_order"),
+    )
     
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    id = Column(IdType, primary_key=True, autoincrement=True)
     video_id = Column(BigInteger, ForeignKey("videos.id"), nullable=False)
     t_start_ms = Column(Integer, nullable=False)  # Start time in milliseconds
     t_end_ms = Column(Integer, nullable=False)    # End time in milliseconds
     thumb_url = Column(Text)                      # Thumbnail image URL
-    embedding = Column("embedding", Text, nullable=True)  # Vector embedding for similarity search
+    # Vector embedding for similarity search. Deferred: ~3 KB per row that no listing
+    # response exposes, so only search, neighbour and export paths load it
+    embedding = deferred(Column("embedding", Text, nullable=True))
     
     # Relationships to parent video and associated tags
     video = relationship("Video", back_populates="shots")
     tags = relationship("ShotTag", back_populates="shot", cascade="all, delete-orphan")
+    
+    # Store embeddings as pgvector literals, unit-normalized when NORMALIZE_EMBEDDINGS is set
+    @validates("embedding")
+    def _format_embedding(self, key, value):
+        return None if value is None else to_pgvector(value)
@@ -2,14 +2,14 @@ from sqlalchemy import Column, BigInteger, Text, ForeignKey, Table
 from sqlalchemy.orm import relationship
 
 from app.core.db import Base
-from app.models.base import TimestampMixin
+from app.models.base import IdType, TimestampMixin
 
 
 # Model representing descriptive labels that can be applied to shots
 class Tag(Base, TimestampMixin):
     __tablename__ = "tags"
     
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    id = Column(IdType, primary_key=True, autoincrement=True)
     slug = Column(Text, nullable=False, unique=True)  # Clean tag name
     name = Column(Text, nullable=False)               # Public tag name
     
@@ -0,0 +1,233 @@
+import math
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+
+INDEX_TYPES = ("ivfflat", "hnsw")
+
+# pgvector distance operator and index operator class for each supported metric.
+# An index is only used when the query orders by the operator of its opclass.
+METRICS = {
+    "cosine": ("<=>", "vector_cosine_ops"),
+    "l2": ("<->", "vector_l2_ops"),
+    "ip": ("<#>", "vector_ip_ops"),
+}
+
+# Compact representations searched first, then re-ranked at full precision.
+# halfvec keeps the metric on 16-bit floats; binary keeps one sign bit per
+# dimension and compares with Hamming distance.
+QUANTIZATIONS = ("none", "halfvec", "binary")
+HALFVEC_OPCLASSES = {
+    "cosine": "halfvec_cosine_ops",
+    "l2": "halfvec_l2_ops",
+    "ip": "halfvec_ip_ops",
+}
+
+# Name of the ANN index on shots.embedding, whichever type it is built as
+INDEX_NAME = "shot_embedding_ann"
+# Expression index over the quantized embedding
+QUANTIZED_INDEX_NAME = "shot_embedding_quantized"
+
+
+def _metric(metric: Optional[str] = None) -> Tuple[str, str]:
+    metric = metric or settings.vector_metric
+    if metric not in METRICS:
+        raise ValueError(f"Unknown vector metric: {metric}")
+    return METRICS[metric]
+
+
+def distance_operator(metric: Optional[str] = None) -> str:
+    return _metric(metric)[0]
+
+
+def operator_class(metric: Optional[str] = None) -> str:
+    return _metric(metric)[1]
+
+
+def distance_sql(left: str, right: str, metric: Optional[str] = None) -> str:
+    """SQL distance expression between two vector operands for the configured metric"""
+    return f"{left} {distance_operator(metric)} {right}"
+
+
+def similarity_sql(distance: str, metric: Optional[str] = None) -> str:
+    """Turn a distance expression into a larger-is-closer score for blending with other scores"""
+    metric = metric or settings.vector_metric
+    _metric(metric)
+    if metric == "cosine":
+        return f"(1 - ({distance}))"
+    if metric == "ip":
+        # <#> returns the negative inner product
+        return f"(-({distance}))"
+    return f"(1 / (1 + ({distance})))"
+
+
+def quantized_sql(operand: str, quantization: Optional[str] = None) -> str:
+    """Wrap a vector operand in the compact representation the quantized index is built on"""
+    quantization = quantization or settings.vector_quantization
+    dim = settings.embedding_dim
+    if quantization == "halfvec":
+        return f"CAST({operand} AS halfvec({dim}))"
+    if quantization == "binary":
+        return f"CAST(binary_quantize(CAST({operand} AS vector)) AS bit({dim}))"
+    raise ValueError(f"Unknown vector quantization: {quantization}")
+
+
+def quantized_distance_sql(left: str, right: str, quantization: Optional[str] = None) -> str:
+    """Distance between the quantized forms of two operands, matching the quantized index"""
+    quantization = quantization or settings.vector_quantization
+    operator = "<~>" if quantization == "binary" else distance_operator()
+    return f"{quantized_sql(left, quantization)} {operator} {quantized_sql(right, quantization)}"
+
+
+def ivfflat_lists_for(rows: int) -> int:
+    """Pick an IVFFlat list count using the pgvector guidance: rows/1000 up to 1M rows, sqrt(rows) above"""
+    if rows <= 1_000_000:
+        return max(1, rows // 1000)
+    return int(math.sqrt(rows))
+
+
+def hnsw_params_for(rows: int) -> Tuple[int, int]:
+    """Pick HNSW (m, ef_construction); larger graphs need more links to keep recall up"""
+    m = 16 if rows <= 1_000_000 else 32
+    return m, max(64, 4 * m)
+
+
+def _index_options(index_type: str, rows: int) -> str:
+    if index_type == "ivfflat":
+        lists = settings.ivfflat_lists or ivfflat_lists_for(rows)
+        options = f"lists = {lists}"
+    elif index_type == "hnsw":
+        m, ef_construction = hnsw_params_for(rows)
+        m = settings.hnsw_m or m
+        ef_construction = settings.hnsw_ef_construction or ef_construction
+        options = f"m = {m}, ef_construction = {ef_construction}"
+    else:
+        raise ValueError(f"Unknown vector index type: {index_type}")
+    return options
+
+
+def index_ddl(index_type: str, rows: int, metric: Optional[str] = None) -> str:
+    """Build the CREATE INDEX statement for the configured ANN index type"""
+    return (
+        f"CREATE INDEX {INDEX_NAME} ON shots "
+        f"USING {index_type} (embedding {operator_class(metric)}) "
+        f"WITH ({_index_options(index_type, rows)})"
+    )
+
+
+def quantized_index_ddl(
+    index_type: str,
+    rows: int,
+    metric: Optional[str] = None,
+    quantization: Optional[str] = None
+) -> str:
+    """Build the CREATE INDEX statement for the expression index over quantized embeddings"""
+    quantization = quantization or settings.vector_quantization
+    if quantization == "binary":
+        opclass = "bit_hamming_ops"
+    else:
+        opclass = HALFVEC_OPCLASSES[metric or settings.vector_metric]
+    return (
+        f"CREATE INDEX {QUANTIZED_INDEX_NAME} ON shots "
+        f"USING {index_type} (({quantized_sql('embedding', quantization)}) {opclass}) "
+        f"WITH ({_index_options(index_type, rows)})"
+    )
+
+
+def model_index_name(model_id: int) -> str:
+    """Name of the partial ANN index over one model's rows in shot_embeddings"""
+    return f"shot_embedding_ann_model_{int(model_id)}"
+
+
+def model_embedding_sql(column: str, dim: int) -> str:
+    """A shot_embeddings vector cast to its model's dimension, the form its index is built on"""
+    return f"CAST({column} AS vector({int(dim)}))"
+
+
+def model_index_ddl(model_id: int, dim: int, index_type: str, rows: int, metric: Optional[str] = None) -> str:
+    """Build the CREATE INDEX statement for one model's partial ANN index"""
+    # pgvector indexes need a fixed dimension, so each model gets an expression index
+    # restricted to its own rows; queries must cast and filter model_id the same way
+    return (
+        f"CREATE INDEX {model_index_name(model_id)} ON shot_embeddings "
+        f"USING {index_type} (({model_embedding_sql('embedding', dim)}) {operator_class(metric)}) "
+        f"WITH ({_index_options(index_type, rows)}) "
+        f"WHERE model_id = {int(model_id)}"
+    )
+
+
+def create_model_index(
+    connection,
+    model_id: int,
+    dim: int,
+    index_type: Optional[str] = None,
+    metric: Optional[str] = None
+) -> str:
+    """(Re)build the ANN index over one model's embeddings sized for its row count"""
+    index_type = index_type or settings.vector_index_type
+    rows = connection.execute(
+        text("SELECT count(*) FROM shot_embeddings WHERE model_id = :model_id"),
+        {"model_id": model_id}
+    ).scalar() or 0
+    ddl = model_index_ddl(model_id, dim, index_type, rows, metric)
+    connection.execute(text(f"DROP INDEX IF EXISTS {model_index_name(model_id)}"))
+    connection.execute(text(ddl))
+    return ddl
+
+
+def create_vector_index(
+    connection,
+    index_type: Optional[str] = None,
+    metric: Optional[str] = None
+) -> List[str]:
+    """(Re)build the ANN indexes on shots.embedding sized for the current row count"""
+    index_type = index_type or settings.vector_index_type
+    quantization = settings.vector_quantization
+    rows = connection.execute(
+        text("SELECT count(*) FROM shots WHERE embedding IS NOT NULL")
+    ).scalar() or 0
+
+    statements = []
+    # With a quantized index the full-precision one is optional: re-ranking only
+    # reads the candidates' heap tuples, never the full-precision index
+    if quantization == "none" or settings.vector_full_index:
+        statements.append(index_ddl(index_type, rows, metric))
+    if quantization != "none":
+        statements.append(quantized_index_ddl(index_type, rows, metric, quantization))
+
+    connection.execute(text(f"DROP INDEX IF EXISTS {INDEX_NAME}"))
+    connection.execute(text(f"DROP INDEX IF EXISTS {QUANTIZED_INDEX_NAME}"))
+    for ddl in statements:
+        connection.execute(text(ddl))
+    return statements
+
+
+# Per-request statements, parsed once
+SET_PROBES = text("SELECT set_config('ivfflat.probes', :value, true)")
+SET_EF_SEARCH = text("SELECT set_config('hnsw.ef_search', :value, true)")
+
+
+def apply_search_params(
+    db: Session,
+    probes: Optional[int] = None,
+    ef_search: Optional[int] = None
+) -> None:
+    """Set the recall/latency knobs for ANN scans in the current transaction"""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+
+    # set_config(..., true) behaves like SET LOCAL but accepts bound parameters
+    if settings.vector_index_type == "ivfflat" or probes is not None:
+        db.execute(
+            SET_PROBES,
+            {"value": str(probes or settings.ivfflat_probes)}
+        )
+    if settings.vector_index_type == "hnsw" or ef_search is not None:
+        db.execute(
+            SET_EF_SEARCH,
+            {"value": str(ef_search or settings.hnsw_ef_search)}
+        )
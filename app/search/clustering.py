@@ -0,0 +1,93 @@
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.search.ann import ivfflat_lists_for
+
+
+class MiniBatchKMeans:
+    """K-means fitted one chunk at a time, so memory is bounded by the chunk size"""
+
+    def __init__(self, n_clusters: int, spherical: bool = True, seed: int = 0):
+        self.n_clusters = n_clusters
+        # Spherical k-means clusters directions, which is what cosine search compares
+        self.spherical = spherical
+        self.rng = np.random.default_rng(seed)
+        self.centroids: Optional[np.ndarray] = None
+        self.counts: Optional[np.ndarray] = None
+
+    def _prepare(self, chunk: np.ndarray) -> np.ndarray:
+        chunk = np.asarray(chunk, dtype=np.float32)
+        if self.spherical:
+            norms = np.linalg.norm(chunk, axis=1, keepdims=True)
+            chunk = chunk / np.where(norms > 0, norms, 1)
+        return chunk
+
+    def _init_centroids(self, chunk: np.ndarray) -> None:
+        # k-means++ seeding on the first chunk
+        k = min(self.n_clusters, len(chunk))
+        centroids = [chunk[self.rng.integers(len(chunk))]]
+        closest = ((chunk - centroids[0]) ** 2).sum(axis=1)
+        for _ in range(1, k):
+            total = closest.sum()
+            if total <= 0:
+                index = self.rng.integers(len(chunk))
+            else:
+                index = self.rng.choice(len(chunk), p=closest / total)
+            centroids.append(chunk[index])
+            closest = np.minimum(closest, ((chunk - chunk[index]) ** 2).sum(axis=1))
+        self.centroids = np.array(centroids, dtype=np.float32)
+        self.counts = np.zeros(k, dtype=np.int64)
+
+    def _nearest(self, chunk: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2, without materialising x - c
+        squared = (
+            (chunk ** 2).sum(axis=1, keepdims=True)
+            - 2 * chunk @ self.centroids.T
+            + (self.centroids ** 2).sum(axis=1)
+        )
+        labels = squared.argmin(axis=1)
+        distances = np.sqrt(np.maximum(squared[np.arange(len(chunk)), labels], 0))
+        return labels, distances
+
+    def partial_fit(self, chunk: np.ndarray) -> "MiniBatchKMeans":
+        """One mini-batch step: every centroid moves toward its points with a 1/count learning rate"""
+        chunk = self._prepare(chunk)
+        if not len(chunk):
+            return self
+        if self.centroids is None:
+            self._init_centroids(chunk)
+        labels, _ = self._nearest(chunk)
+        for cluster in np.unique(labels):
+            members = chunk[labels == cluster]
+            self.counts[cluster] += len(members)
+            rate = len(members) / self.counts[cluster]
+            self.centroids[cluster] += rate * (members.mean(axis=0) - self.centroids[cluster])
+        if self.spherical:
+            norms = np.linalg.norm(self.centroids, axis=1, keepdims=True)
+            self.centroids /= np.where(norms > 0, norms, 1)
+        return self
+
+    def predict(self, chunk: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Cluster index and distance to its centroid for each row"""
+        return self._nearest(self._prepare(chunk))
+
+
+def size_report(sizes: np.ndarray, rows: Optional[int] = None) -> Dict[str, float]:
+    """Cluster size distribution, plus the IVFFlat list count the size heuristic would pick"""
+    sizes = np.asarray(sizes)
+    rows = int(sizes.sum()) if rows is None else rows
+    mean = float(sizes.mean()) if len(sizes) else 0.0
+    return {
+        "clusters": int(len(sizes)),
+        "rows": rows,
+        "empty": int((sizes == 0).sum()),
+        "min": int(sizes.min()) if len(sizes) else 0,
+        "p50": float(np.percentile(sizes, 50)) if len(sizes) else 0.0,
+        "p95": float(np.percentile(sizes, 95)) if len(sizes) else 0.0,
+        "max": int(sizes.max()) if len(sizes) else 0,
+        "mean": mean,
+        # IVFFlat probes lists of very different sizes; max/mean shows how uneven they will be
+        "imbalance": float(sizes.max() / mean) if mean else 0.0,
+        "heuristic_lists": ivfflat_lists_for(rows),
+    }
@@ -0,0 +1,133 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.duplicate import ShotDuplicate
+
+
+def random_hyperplanes(dim: int, bits: int, tables: int, seed: int = 0) -> np.ndarray:
+    """Gaussian hyperplanes, one set of `bits` per hash table"""
+    if bits > 64:
+        raise ValueError("At most 64 bits per table fit a signature")
+    return np.random.default_rng(seed).normal(size=(tables, dim, bits)).astype(np.float32)
+
+
+def lsh_signatures(matrix: np.ndarray, planes: np.ndarray) -> np.ndarray:
+    """Random hyperplane signatures, one uint64 per (row, table); close angles share bits"""
+    weights = np.uint64(1) << np.arange(planes.shape[2], dtype=np.uint64)
+    signatures = np.empty((len(matrix), planes.shape[0]), dtype=np.uint64)
+    for table, table_planes in enumerate(planes):
+        bits = (matrix @ table_planes) > 0
+        signatures[:, table] = (bits.astype(np.uint64) * weights).sum(axis=1, dtype=np.uint64)
+    return signatures
+
+
+def candidate_pairs(signatures: np.ndarray, max_bucket: int = 256) -> np.ndarray:
+    """Row index pairs (i < j) sharing a bucket in at least one table"""
+    pairs = []
+    for table in range(signatures.shape[1]):
+        keys = signatures[:, table]
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        boundaries = np.flatnonzero(np.diff(sorted_keys)) + 1
+        for bucket in np.split(order, boundaries):
+            # Oversized buckets are compared in chunks so one degenerate bucket can't go quadratic
+            for start in range(0, len(bucket), max_bucket):
+                members = bucket[start:start + max_bucket]
+                if len(members) < 2:
+                    continue
+                i, j = np.triu_indices(len(members), k=1)
+                pairs.append(np.stack([members[i], members[j]], axis=1))
+    if not pairs:
+        return np.zeros((0, 2), dtype=np.int64)
+    pairs = np.sort(np.concatenate(pairs), axis=1)
+    return np.unique(pairs, axis=0)
+
+
+def verify_pairs(
+    matrix: np.ndarray,
+    pairs: np.ndarray,
+    threshold: float,
+    chunk_size: int = 100_000
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Keep candidate pairs whose exact cosine distance is within threshold"""
+    norms = np.linalg.norm(matrix, axis=1)
+    kept, distances = [], []
+    for start in range(0, len(pairs), chunk_size):
+        chunk = pairs[start:start + chunk_size]
+        left, right = chunk[:, 0], chunk[:, 1]
+        dots = np.einsum("ij,ij->i", matrix[left], matrix[right])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            distance = 1 - dots / (norms[left] * norms[right])
+        mask = distance <= threshold
+        kept.append(chunk[mask])
+        distances.append(distance[mask])
+    if not kept:
+        return np.zeros((0, 2), dtype=np.int64), np.zeros(0, dtype=np.float32)
+    return np.concatenate(kept), np.concatenate(distances)
+
+
+def duplicate_clusters(ids: Sequence[int], pairs: np.ndarray) -> Dict[int, int]:
+    """Union verified pairs into clusters; maps every clustered shot id to the lowest id"""
+    parent: Dict[int, int] = {}
+
+    def find(x: int) -> int:
+        root = x
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while parent.get(x, x) != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    for left, right in pairs:
+        a, b = find(int(ids[left])), find(int(ids[right]))
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+    members = set(parent) | set(parent.values())
+    return {shot_id: find(shot_id) for shot_id in members}
+
+
+def find_duplicates(
+    ids: Sequence[int],
+    matrix: np.ndarray,
+    threshold: float = 0.05,
+    bits: int = 16,
+    tables: int = 8,
+    seed: int = 0
+) -> Dict[int, int]:
+    """Near-duplicate clusters among the rows of matrix: LSH buckets, then exact verification"""
+    planes = random_hyperplanes(matrix.shape[1], bits, tables, seed)
+    pairs = candidate_pairs(lsh_signatures(matrix, planes))
+    verified, _ = verify_pairs(matrix, pairs, threshold)
+    return duplicate_clusters(ids, verified)
+
+
+def canonical_ids(db: Session, shot_ids: Sequence[int]) -> Dict[int, int]:
+    """Canonical shot of each given shot that belongs to a duplicate cluster"""
+    if not shot_ids:
+        return {}
+    rows = db.query(ShotDuplicate.shot_id, ShotDuplicate.canonical_id).filter(
+        ShotDuplicate.shot_id.in_(shot_ids)
+    )
+    return {shot_id: canonical_id for shot_id, canonical_id in rows}
+
+
+def collapse_duplicate_ids(
+    db: Session,
+    shot_ids: List[int],
+    exclude_cluster_of: Optional[int] = None
+) -> List[int]:
+    """Keep the best-ranked shot of each duplicate cluster, in the original order"""
+    lookup = list(shot_ids) + ([exclude_cluster_of] if exclude_cluster_of is not None else [])
+    canonical = canonical_ids(db, lookup)
+    seen = set()
+    if exclude_cluster_of is not None:
+        seen.add(canonical.get(exclude_cluster_of, exclude_cluster_of))
+    collapsed = []
+    for shot_id in shot_ids:
+        cluster = canonical.get(shot_id, shot_id)
+        if cluster not in seen:
+            seen.add(cluster)
+            collapsed.append(shot_id)
+    return collapsed
@@ -1,23 +1,49 @@
 from abc import ABC, abstractmethod
+from functools import lru_cache
 import numpy as np
 import os
 from typing import Optional, List
 
+from app.core.config import settings
+
 
 class Embedder(ABC):
     @abstractmethod
     def embed(self, text: str) -> Optional[List[float]]:
         pass
+    
+    def embed_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
+        # Models that can batch should override this with a single forward pass
+        return [self.embed(text) for text in texts]
+    
+    def embed_shots(self, thumb_urls: List[Optional[str]]) -> List[Optional[List[float]]]:
+        # Shots are embedded from their thumbnails into the same space as query text;
+        # models without an image tower leave shots unembedded
+        return [None] * len(thumb_urls)
 
 
 class MockEmbedder(Embedder):
+    def __init__(self, dim: int = 768):
+        self.dim = dim
+    
     def embed(self, text: str) -> Optional[List[float]]:
         # TODO: Implement actual embedding logic
         # Didn't want to use a real embedder for now
         if os.getenv("EMBEDDER") == "mock":
-            return list(np.random.normal(0, 1, 768))
+            return list(np.random.normal(0, 1, self.dim))
         return None
+    
+    def embed_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
+        if os.getenv("EMBEDDER") == "mock":
+            return np.random.normal(0, 1, (len(texts), self.dim)).tolist()
+        return [None] * len(texts)
+    
+    def embed_shots(self, thumb_urls: List[Optional[str]]) -> List[Optional[List[float]]]:
+        return self.embed_batch([url or "" for url in thumb_urls])
 
 
-def get_embedder() -> Embedder:
-    return MockEmbedder()
+# One instance per worker: real models are expensive to load, so warm-up loads it once
+@lru_cache(maxsize=None)
+def get_embedder(model: Optional[str] = None, dim: Optional[int] = None) -> Embedder:
+    # Every model is mocked for now; real models are mapped from their name here
+    return MockEmbedder(dim or settings.embedding_dim)
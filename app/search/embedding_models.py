@@ -0,0 +1,174 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, Optional, Tuple
+
+from sqlalchemy import Text, and_, cast, exists, insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.embedding import EmbeddingModel, ShotEmbedding
+from app.models.shot import Shot
+from app.search.ann import model_embedding_sql
+from app.search.embedder import Embedder, get_embedder
+from app.search.projection import PCAProjection
+from app.search.vectors import parse_vectors, to_pgvector
+
+
+# The model stored in shots.embedding, which the snapshot, duplicate, cluster and
+# similar-shot paths read; it has no embedding_models row
+DEFAULT_MODEL = "default"
+
+
+@dataclass(frozen=True)
+class ModelInfo:
+    id: Optional[int]
+    name: str
+    dim: int
+    status: str
+    source: Optional[str] = None
+    projection: Optional[PCAProjection] = field(default=None, compare=False, repr=False)
+
+    @property
+    def in_shots_column(self) -> bool:
+        return self.name == DEFAULT_MODEL
+
+    @property
+    def reduced(self) -> bool:
+        """PCA-reduced copy of the default model, searched as candidates and re-ranked"""
+        return self.projection is not None
+
+
+def default_model() -> ModelInfo:
+    return ModelInfo(None, DEFAULT_MODEL, settings.embedding_dim, "ready")
+
+
+class EmbeddingModelRegistry:
+    """Embedding models by name, re-read from embedding_models after ttl seconds"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._models: Dict[str, Tuple[ModelInfo, float]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db: Session, name: str) -> Optional[ModelInfo]:
+        """The named model, or None when it does not exist"""
+        if name == DEFAULT_MODEL:
+            return default_model()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is not None and now - entry[1] < self.ttl:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        # Unknown names are not cached, so a model created after startup is found at once
+        row = db.query(EmbeddingModel).filter(EmbeddingModel.name == name).first()
+        if row is None:
+            return None
+        projection = PCAProjection.from_bytes(row.projection) if row.projection is not None else None
+        info = ModelInfo(row.id, row.name, row.dim, row.status, row.source, projection)
+        # Models still filling are re-read too, so searches switch to one as soon as it is ready
+        if info.status == "ready":
+            with self._lock:
+                self._models[name] = (info, now)
+        return info
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._models.clear()
+
+    def stats(self) -> dict:
+        return {
+            "models": sorted(self._models),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def embedder_for(model: ModelInfo) -> Embedder:
+    """The embedder producing query vectors comparable with a model's shot embeddings"""
+    # The default model keeps the argument-less instance that warm-up loads; reduced
+    # models project its query vectors
+    if model.in_shots_column or model.reduced:
+        return get_embedder()
+    return get_embedder(model.name, model.dim)
+
+
+def embedding_sql(model: Optional[ModelInfo]) -> str:
+    """Column results are ranked by in vector search SQL (shots aliased s, shot_embeddings e)"""
+    # Reduced models only supply candidates; the final order uses the full vectors
+    if model is None or model.in_shots_column or model.reduced:
+        return "s.embedding"
+    return model_embedding_sql("e.embedding", model.dim)
+
+
+def fill_embeddings(db: Session, model: ModelInfo, embedder: Embedder, batch_size: int = 256) -> Iterator[int]:
+    """Embed shots that have no embedding under model yet, committing each batch
+
+    Yields the number of rows written per batch. Shots are visited in id order
+    and only missing rows are written, so the job can be stopped and resumed at
+    any point, and re-run later to cover shots ingested while it was running.
+    """
+    after = 0
+    while True:
+        rows = (
+            db.query(Shot.id, Shot.thumb_url)
+            .filter(Shot.id > after, ~exists().where(and_(
+                ShotEmbedding.model_id == model.id, ShotEmbedding.shot_id == Shot.id
+            )))
+            .order_by(Shot.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            return
+        after = rows[-1].id
+        values = []
+        for row, vector in zip(rows, embedder.embed_shots([row.thumb_url for row in rows])):
+            if vector is None:
+                continue
+            if len(vector) != model.dim:
+                raise ValueError(f"Model {model.name} expects {model.dim} dimensions, embedder returned {len(vector)}")
+            values.append({"model_id": model.id, "shot_id": row.id, "embedding": to_pgvector(vector)})
+        if values:
+            db.execute(insert(ShotEmbedding), values)
+        db.commit()
+        yield len(values)
+
+
+def fill_reduced_embeddings(db: Session, model: ModelInfo, batch_size: int = 5000) -> Iterator[int]:
+    """Project shots.embedding of shots that have no row under a reduced model yet
+
+    Works like fill_embeddings with the stored projection in place of an
+    embedder, so re-running it brings a reduced model up to date with shots
+    embedded since it was stored.
+    """
+    if not model.reduced:
+        raise ValueError(f"Model {model.name} is not PCA-reduced")
+    after = 0
+    while True:
+        rows = (
+            db.query(Shot.id, cast(Shot.embedding, Text))
+            .filter(Shot.id > after, Shot.embedding.isnot(None), ~exists().where(and_(
+                ShotEmbedding.model_id == model.id, ShotEmbedding.shot_id == Shot.id
+            )))
+            .order_by(Shot.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            return
+        after = rows[-1][0]
+        reduced = model.projection.transform(parse_vectors([row[1] for row in rows]))
+        db.execute(insert(ShotEmbedding), [
+            {"model_id": model.id, "shot_id": row[0], "embedding": to_pgvector(vector)}
+            for row, vector in zip(rows, reduced)
+        ])
+        db.commit()
+        yield len(rows)
+
+
+embedding_models = EmbeddingModelRegistry(settings.embedding_model_cache_ttl_s)
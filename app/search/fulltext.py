@@ -0,0 +1,44 @@
+from sqlalchemy import and_, func, literal, literal_column, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from app.models.video import Video
+
+
+# Text search configuration of the videos.title_tsv generated column (migration 0010);
+# queries must use the same one or the GIN index does not apply
+TITLE_TS_CONFIG = "english"
+
+# The column is generated by PostgreSQL and not mapped, so SQLite test databases work
+title_tsv = literal_column("videos.title_tsv")
+
+# Raw-SQL semi-join for the vector search statements, which only run on PostgreSQL
+VIDEO_MATCH_SQL = f"""
+    SELECT v.id FROM videos v
+    WHERE v.title_tsv @@ websearch_to_tsquery('{TITLE_TS_CONFIG}', :video_query)
+"""
+
+
+def title_tsquery(video_query: str):
+    # websearch_to_tsquery accepts user input ("quoted phrases", or, -negation) without erroring
+    return func.websearch_to_tsquery(literal_column(f"'{TITLE_TS_CONFIG}'::regconfig"), video_query)
+
+
+def video_title_match(db: Session, video_query: str):
+    """Filter on Video matching a search query against the title"""
+    if db.get_bind().dialect.name == "postgresql":
+        return title_tsv.op("@@")(title_tsquery(video_query))
+    # SQLite has no text search; require every word to appear in the title
+    return and_(*[Video.title.ilike(f"%{word}%") for word in video_query.split()])
+
+
+def video_title_rank(db: Session, video_query: str):
+    """Relevance of a video's title to the query, higher is better"""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.ts_rank(title_tsv, title_tsquery(video_query))
+    return literal(0.0)
+
+
+def matching_video_ids(db: Session, video_query: str) -> Select:
+    """Ids of videos whose title matches, for use as a semi-join"""
+    return select(Video.id).where(video_title_match(db, video_query))
@@ -0,0 +1,142 @@
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+
+class PCAProjection:
+    """Linear projection onto the leading principal components of a set of embeddings"""
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)  # (dim, source_dim)
+
+    @property
+    def dim(self) -> int:
+        return self.components.shape[0]
+
+    @property
+    def source_dim(self) -> int:
+        return self.components.shape[1]
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        """Project one vector or a (n, source_dim) batch"""
+        return (np.asarray(vectors, dtype=np.float32) - self.mean) @ self.components.T
+
+    def to_bytes(self) -> bytes:
+        header = np.array([self.dim, self.source_dim], dtype=np.int32)
+        return header.tobytes() + self.mean.tobytes() + self.components.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "PCAProjection":
+        dim, source_dim = np.frombuffer(data, dtype=np.int32, count=2)
+        values = np.frombuffer(data, dtype=np.float32, offset=8)
+        return cls(values[:source_dim], values[source_dim:].reshape(dim, source_dim))
+
+
+class StreamingPCA:
+    """Mean and covariance accumulated one chunk at a time, so memory is bounded by the chunk
+
+    Each chunk is multiplied in float32; the running sums are kept in float64 so
+    millions of rows do not lose precision.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._sum: Optional[np.ndarray] = None
+        self._outer: Optional[np.ndarray] = None
+        self._eigen = None
+
+    def partial_fit(self, chunk: np.ndarray) -> "StreamingPCA":
+        chunk = np.asarray(chunk, dtype=np.float32)
+        if not len(chunk):
+            return self
+        if self._sum is None:
+            self._sum = np.zeros(chunk.shape[1], dtype=np.float64)
+            self._outer = np.zeros((chunk.shape[1], chunk.shape[1]), dtype=np.float64)
+        self.count += len(chunk)
+        self._sum += chunk.sum(axis=0, dtype=np.float64)
+        self._outer += chunk.T @ chunk
+        self._eigen = None
+        return self
+
+    def _decompose(self):
+        if self._eigen is None:
+            mean = self._sum / self.count
+            covariance = self._outer / self.count - np.outer(mean, mean)
+            # eigh returns ascending eigenvalues of the symmetric covariance
+            values, vectors = np.linalg.eigh(covariance)
+            self._eigen = (mean, np.maximum(values[::-1], 0), vectors[:, ::-1].T)
+        return self._eigen
+
+    def projection(self, dim: int) -> PCAProjection:
+        """Projection onto the top dim components"""
+        if not self.count:
+            raise ValueError("No embeddings were fitted")
+        mean, _, components = self._decompose()
+        return PCAProjection(mean, components[:dim])
+
+    def explained_variance(self, dim: int) -> float:
+        """Share of the total variance kept by the top dim components"""
+        _, values, _ = self._decompose()
+        total = values.sum()
+        return float(values[:dim].sum() / total) if total > 0 else 0.0
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    # Indices of the k smallest scores per row, in order
+    k = min(k, scores.shape[1])
+    part = np.argpartition(scores, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(scores, part, axis=1).argsort(axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+def _distances(queries: np.ndarray, matrix: np.ndarray, metric: str) -> np.ndarray:
+    # Same orderings as the pgvector operators of each metric
+    if metric == "ip":
+        return -(queries @ matrix.T)
+    if metric == "l2":
+        return (queries ** 2).sum(axis=1, keepdims=True) - 2 * queries @ matrix.T + (matrix ** 2).sum(axis=1)
+
+    def unit(x):
+        norms = np.linalg.norm(x, axis=1, keepdims=True)
+        return x / np.where(norms > 0, norms, 1)
+    return 1 - unit(queries) @ unit(matrix).T
+
+
+def reduced_search_report(
+    projection: PCAProjection,
+    matrix: np.ndarray,
+    queries: np.ndarray,
+    top_k: int = 50,
+    rerank_factor: int = 4,
+    metric: str = "cosine",
+) -> Dict[str, float]:
+    """Recall@k of reduced-space candidates re-ranked at full precision, against exact search
+
+    Runs in-process over a sample, so it compares dimensions before any index is
+    built; scan times show how the candidate pass scales with the dimension.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    queries = np.asarray(queries, dtype=np.float32)
+    truth = _top_k(_distances(queries, matrix, metric), top_k)
+
+    reduced = projection.transform(matrix)
+    start = time.perf_counter()
+    candidates = _top_k(_distances(projection.transform(queries), reduced, metric), top_k * rerank_factor)
+    reduced_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    recalls = []
+    for query, expected, ids in zip(queries, truth, candidates):
+        rerank = ids[_top_k(_distances(query[None], matrix[ids], metric), top_k)[0]]
+        recalls.append(len(np.intersect1d(expected, rerank)) / len(expected))
+
+    start = time.perf_counter()
+    _top_k(_distances(queries, matrix, metric), top_k)
+    full_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    return {
+        "dim": projection.dim,
+        "recall": float(np.mean(recalls)),
+        "scan_ms": round(reduced_ms, 4),
+        "full_scan_ms": round(full_ms, 4),
+    }
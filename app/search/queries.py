@@ -1,11 +1,96 @@
-from typing import List, Optional, Tuple
-from sqlalchemy import text, func
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import ARRAY, BigInteger, and_, any_, bindparam, exists, func, lambda_stmt, select, text
 from sqlalchemy.orm import Session
-from sqlalchemy.sql import Select
+from sqlalchemy.sql import Executable
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.sql.lambdas import StatementLambdaElement
 
+from app.models.duplicate import ShotDuplicate
 from app.models.shot import Shot
 from app.models.tag import Tag, ShotTag
 from app.models.video import Video
+from app.core.config import settings
+from app.search.ann import distance_sql, model_embedding_sql, quantized_distance_sql, similarity_sql
+from app.search.embedding_models import ModelInfo, embedding_sql
+from app.search.fulltext import VIDEO_MATCH_SQL, matching_video_ids, video_title_rank
+from app.search.snapshot import snapshot_store
+from app.search.vectors import parse_vector, to_pgvector
+
+
+# Columns needed to render a shot in a listing; the embedding is deliberately absent
+SHOT_LIST_COLUMNS = (
+    Shot.id,
+    Shot.video_id,
+    Shot.t_start_ms,
+    Shot.t_end_ms,
+    Shot.thumb_url,
+    Video.title.label("video_title"),
+)
+
+
+def ids_param(dialect: str, column, name: str):
+    """column matching a list of ids bound as one parameter"""
+    # On PostgreSQL this is one array parameter, so the statement text is the same
+    # whatever the number of ids and psycopg prepares it once per connection
+    if dialect == "postgresql":
+        return column == any_(bindparam(name, type_=ARRAY(BigInteger)))
+    return column.in_(bindparam(name, expanding=True))
+
+
+class CachedStatement:
+    """A statement built once per dialect and executed with bound parameters only"""
+
+    def __init__(self, build: Callable[[str], Executable]):
+        self.build = build
+        self._statements: Dict[str, Executable] = {}
+
+    def __call__(self, db: Session) -> Executable:
+        dialect = db.get_bind().dialect.name
+        statement = self._statements.get(dialect)
+        if statement is None:
+            statement = self._statements[dialect] = self.build(dialect)
+        return statement
+
+
+@lru_cache(maxsize=512)
+def cached_text(sql: str) -> TextClause:
+    """text() parsed once per distinct SQL string"""
+    # The search SQL varies with settings and request shape but never with values,
+    # which are always bound, so the number of distinct strings stays small
+    return text(sql)
+
+
+SHOT_ROWS = CachedStatement(lambda dialect: (
+    select(*SHOT_LIST_COLUMNS)
+    .outerjoin(Video, Video.id == Shot.video_id)
+    .where(ids_param(dialect, Shot.id, "shot_ids"))
+))
+
+TAG_NAMES = CachedStatement(lambda dialect: (
+    select(ShotTag.shot_id, Tag.name)
+    .join(Tag, Tag.id == ShotTag.tag_id)
+    .where(ids_param(dialect, ShotTag.shot_id, "shot_ids"))
+))
+
+
+def fetch_shot_rows(db: Session, shot_ids: List[int]) -> List:
+    """Load listing rows for the given shots, preserving the order of shot_ids"""
+    if not shot_ids:
+        return []
+    rows = db.execute(SHOT_ROWS(db), {"shot_ids": list(shot_ids)}).all()
+    rows_by_id = {row.id: row for row in rows}
+    return [rows_by_id[shot_id] for shot_id in shot_ids if shot_id in rows_by_id]
+
+
+def get_tag_names(db: Session, shot_ids: List[int]) -> Dict[int, List[str]]:
+    """Tag names for many shots in one query, keyed by shot id"""
+    tag_names: Dict[int, List[str]] = {}
+    if not shot_ids:
+        return tag_names
+    for shot_id, name in db.execute(TAG_NAMES(db), {"shot_ids": list(shot_ids)}):
+        tag_names.setdefault(shot_id, []).append(name)
+    return tag_names
 
 
 def build_shot_query(
@@ -14,26 +99,143 @@ def build_shot_query(
     tag_query: Optional[str] = None,
     threshold: float = 0.2,
     page: int = 1,
-    page_size: int = 24
-) -> Tuple[Select, int]:
-    """Build a database query for shots with optional tag filtering and pagination"""
-    query = db.query(Shot).join(Video)
+    page_size: int = 24,
+    collapse_duplicates: bool = False,
+    video_query: Optional[str] = None
+) -> Tuple[StatementLambdaElement, int]:
+    """Build a statement for shot listing rows with optional tag filtering and pagination
+    
+    Every clause is a lambda: a request shape seen before reuses the cached statement
+    and its compiled SQL, and only the values captured by the lambdas are bound anew.
+    The same filters are applied to the row and count statements.
+    """
+    rows = lambda_stmt(lambda: select(*SHOT_LIST_COLUMNS).join(Video, Video.id == Shot.video_id))
+    count = lambda_stmt(lambda: select(func.count()).select_from(Shot).join(Video, Video.id == Shot.video_id))
+    filters = []
+    
+    # Matching videos are found through the title index first; shots only join against them
+    if video_query:
+        video_ids = matching_video_ids(db, video_query)
+        filters.append(lambda s: s.where(Shot.video_id.in_(video_ids)))
+    
+    # Only the canonical shot of each duplicate cluster is listed
+    if collapse_duplicates:
+        filters.append(lambda s: s.where(~exists().where(and_(
+            ShotDuplicate.shot_id == Shot.id, ShotDuplicate.canonical_id != Shot.id
+        ))))
+    
+    if tag_slugs or tag_query:
+        filters.append(lambda s: s.join(ShotTag, ShotTag.shot_id == Shot.id).join(Tag, Tag.id == ShotTag.tag_id))
     
     # Filter by specific tag slugs if provided
     if tag_slugs:
-        query = query.join(ShotTag).join(Tag).filter(Tag.slug.in_(tag_slugs))
+        filters.append(lambda s: s.where(Tag.slug.in_(tag_slugs)))
     
     # Apply fuzzy tag search if query provided
     if tag_query:
-        query = query.join(ShotTag).join(Tag).filter(
-            func.similarity(Tag.name, tag_query) >= threshold
-        ).order_by(func.similarity(Tag.name, tag_query).desc())
+        filters.append(lambda s: s.where(func.similarity(Tag.name, tag_query) >= threshold))
+    
+    for criterion in filters:
+        rows += criterion
+        count += criterion
+    
+    if tag_query:
+        rows += lambda s: s.order_by(func.similarity(Tag.name, tag_query).desc())
+    
+    # Shots of the best-matching videos first (after tag similarity, if any)
+    if video_query:
+        rank = video_title_rank(db, video_query)
+        rows += lambda s: s.order_by(rank.desc(), Shot.video_id, Shot.t_start_ms)
     
     # Apply pagination
-    total = query.count()
-    query = query.offset((page - 1) * page_size).limit(page_size)
+    total = db.execute(count).scalar()
+    offset = (page - 1) * page_size
+    rows += lambda s: s.offset(offset).limit(page_size)
+    
+    return rows, total
+
+
+def get_tag_filtered_ids(
+    db: Session,
+    tag_slugs: Optional[List[str]] = None,
+    tag_query: Optional[str] = None,
+    threshold: float = 0.2
+) -> List[int]:
+    """Ids of shots passing the tag filters, used to restrict hybrid vector searches"""
+    tag_query, _ = build_shot_query(db, tag_slugs, tag_query, threshold, 1, 10000)
+    return [s.id for s in db.execute(tag_query)]
+
+
+def get_video_filtered_ids(db: Session, video_query: str) -> List[int]:
+    """Ids of shots of the videos whose title matches, used to restrict snapshot searches"""
+    rows = db.query(Shot.id).filter(Shot.video_id.in_(matching_video_ids(db, video_query)))
+    return [row.id for row in rows]
+
+
+def nearest_shots_sql(
+    columns: str,
+    operand: str,
+    where: str = "TRUE",
+    limit: str = ":top_k",
+    model: Optional[ModelInfo] = None
+) -> str:
+    """SQL selecting shots (aliased s) ordered by distance to a vector operand
+
+    With a PCA-reduced model, candidates come from its index ordered by distance
+    to :reduced_vector and are re-ranked on shots.embedding.
+    """
+    if model is not None and model.reduced:
+        reduced_distance = distance_sql(model_embedding_sql("e.embedding", model.dim), ":reduced_vector")
+        return f"""
+            SELECT {columns} FROM (
+                SELECT s.* FROM shots s
+                JOIN shot_embeddings e ON e.shot_id = s.id AND e.model_id = {int(model.id)}
+                WHERE {where}
+                ORDER BY {reduced_distance}
+                LIMIT {limit} * {settings.rerank_factor}
+            ) s
+            WHERE s.embedding IS NOT NULL
+            ORDER BY {distance_sql("s.embedding", operand)}
+            LIMIT {limit}
+        """
+    
+    if model is not None and not model.in_shots_column:
+        # The model id is inlined so the planner can match the model's partial index
+        return f"""
+            SELECT {columns} FROM shots s
+            JOIN shot_embeddings e ON e.shot_id = s.id AND e.model_id = {int(model.id)}
+            WHERE {where}
+            ORDER BY {distance_sql(embedding_sql(model), operand)}
+            LIMIT {limit}
+        """
     
-    return query, total
+    exact_distance = distance_sql("s.embedding", operand)
+    if settings.vector_quantization == "none":
+        return f"""
+            SELECT {columns} FROM shots s
+            WHERE s.embedding IS NOT NULL AND {where}
+            ORDER BY {exact_distance}
+            LIMIT {limit}
+        """
+    
+    # Candidate pass over the quantized index, then exact re-ranking of the survivors
+    return f"""
+        SELECT {columns} FROM (
+            SELECT * FROM shots s
+            WHERE s.embedding IS NOT NULL AND {where}
+            ORDER BY {quantized_distance_sql("s.embedding", operand)}
+            LIMIT {limit} * {settings.rerank_factor}
+        ) s
+        ORDER BY {exact_distance}
+        LIMIT {limit}
+    """
+
+
+def reduced_vector_params(query_vector: List[float], model: Optional[ModelInfo]) -> dict:
+    """The projected query vector a reduced model's candidate pass compares against"""
+    if model is None or not model.reduced:
+        return {}
+    return {"reduced_vector": to_pgvector(model.projection.transform(parse_vector(query_vector)))}
 
 
 def build_vector_query(
@@ -43,64 +245,200 @@ def build_vector_query(
     tag_slugs: Optional[List[str]] = None,
     tag_query: Optional[str] = None,
     threshold: float = 0.2,
-    hybrid: bool = True
+    hybrid: bool = True,
+    video_query: Optional[str] = None,
+    model: Optional[ModelInfo] = None
 ) -> List[int]:
-    """Find shots using vector similarity with optional tag filtering"""
+    """Find shots using vector similarity with optional tag and video title filtering"""
     if not query_vector:
         return []
     
-    # Convert vector to PostgreSQL array format
-    vector_str = f"[{','.join(map(str, query_vector))}]"
+    # Convert vector to pgvector literal format
+    vector_str = to_pgvector(query_vector)
+    filters = []
+    params = {"query_vector": vector_str, "top_k": top_k, **reduced_vector_params(query_vector, model)}
+    allowed = None
     
     if hybrid and (tag_slugs or tag_query):
-        # Hybrid approach: combine tag filtering with vector search
-        tag_query, _ = build_shot_query(db, tag_slugs, tag_query, threshold, 1, 10000)
-        tag_shot_ids = [s.id for s in tag_query.all()]
-        
-        if not tag_shot_ids:
+        # Hybrid approach: vector search within tag-filtered results
+        allowed = get_tag_filtered_ids(db, tag_slugs, tag_query, threshold)
+        if not allowed:
             return []
-        
-        # Vector search within tag-filtered results
-        vector_query = text(f"""
-            SELECT id FROM shots 
-            WHERE id = ANY(:shot_ids) AND embedding IS NOT NULL
-            ORDER BY embedding <-> :query_vector
-            LIMIT :top_k
-        """)
-        
-        result = db.execute(vector_query, {
-            "shot_ids": tag_shot_ids,
-            "query_vector": vector_str,
-            "top_k": top_k
-        })
-        
-        return [row[0] for row in result]
+        filters.append("s.id = ANY(:shot_ids)")
+        params["shot_ids"] = allowed
+    
+    if video_query:
+        # Semi-join against the videos matched through the title GIN index
+        filters.append(f"s.video_id IN ({VIDEO_MATCH_SQL})")
+        params["video_query"] = video_query
+    
+    # The snapshot only holds the default model's vectors
+    if settings.vector_backend == "snapshot" and (model is None or model.in_shots_column):
+        if video_query:
+            video_shot_ids = get_video_filtered_ids(db, video_query)
+            allowed = video_shot_ids if allowed is None else sorted(set(allowed) & set(video_shot_ids))
+            if not allowed:
+                return []
+        shot_ids = snapshot_store.search(db, vector_str, top_k, allowed=allowed)
+        if shot_ids is not None:
+            return shot_ids
+    
+    vector_query = cached_text(nearest_shots_sql("s.id", ":query_vector", " AND ".join(filters) or "TRUE", model=model))
+    result = db.execute(vector_query, params)
+    return [row[0] for row in result]
+
+
+def build_fusion_query(
+    db: Session,
+    query_vector: List[float],
+    tag_query: str,
+    top_k: int = 200,
+    tag_slugs: Optional[List[str]] = None,
+    threshold: float = 0.2,
+    method: str = "rrf",
+    rrf_k: int = 60,
+    tag_weight: float = 1.0,
+    vector_weight: float = 1.0,
+    video_query: Optional[str] = None,
+    model: Optional[ModelInfo] = None
+) -> List[int]:
+    """Rank shots by fusing independent top-k trigram tag and vector candidate lists"""
+    if not query_vector:
+        return []
+    
+    params = {
+        "query_vector": to_pgvector(query_vector),
+        "tag_query": tag_query,
+        "threshold": threshold,
+        "top_k": top_k,
+        "rrf_k": rrf_k,
+        "tag_weight": tag_weight,
+        "vector_weight": vector_weight,
+        **reduced_vector_params(query_vector, model)
+    }
+    # Exact tag slugs and the video title query stay hard filters on both candidate generators
+    filters = []
+    if tag_slugs:
+        filters.append("""s.id IN (
+            SELECT st.shot_id FROM shot_tags st JOIN tags t ON t.id = st.tag_id
+            WHERE t.slug = ANY(:tag_slugs)
+        )""")
+        params["tag_slugs"] = tag_slugs
+    if video_query:
+        filters.append(f"s.video_id IN ({VIDEO_MATCH_SQL})")
+        params["video_query"] = video_query
+    shot_filter = " AND ".join(filters) or "TRUE"
+    
+    distance = distance_sql(embedding_sql(model), ":query_vector")
+    vector_candidates = nearest_shots_sql(
+        f"s.id, {distance} AS distance", ":query_vector", shot_filter, model=model
+    )
+    
+    if method == "rrf":
+        score = """COALESCE(:tag_weight / (:rrf_k + t.rank), 0)
+                 + COALESCE(:vector_weight / (:rrf_k + v.rank), 0)"""
     else:
-        # Pure vector search across all shots
-        vector_query = text(f"""
-            SELECT id FROM shots 
-            WHERE embedding IS NOT NULL
-            ORDER BY embedding <-> :query_vector
+        score = f"""COALESCE(:tag_weight * t.score, 0)
+                 + COALESCE(:vector_weight * {similarity_sql('v.distance')}, 0)"""
+    
+    query = cached_text(f"""
+        WITH tag_candidates AS (
+            SELECT s.id, max(similarity(tg.name, :tag_query)) AS score
+            FROM shots s
+            JOIN shot_tags stg ON stg.shot_id = s.id
+            JOIN tags tg ON tg.id = stg.tag_id
+            WHERE similarity(tg.name, :tag_query) >= :threshold AND {shot_filter}
+            GROUP BY s.id
+            ORDER BY score DESC, s.id
             LIMIT :top_k
-        """)
-        
-        result = db.execute(vector_query, {
-            "query_vector": vector_str,
-            "top_k": top_k
-        })
-        
-        return [row[0] for row in result]
-
-
-def get_similar_shots(db: Session, shot_id: int, limit: int = 5) -> List[Shot]:
-    """Find shots similar to a given shot using vector similarity"""
-    query = text(f"""
-        SELECT s2.* FROM shots s1
-        JOIN shots s2 ON s1.embedding IS NOT NULL AND s2.embedding IS NOT NULL
-        WHERE s1.id = :shot_id AND s2.id != :shot_id
-        ORDER BY s1.embedding <-> s2.embedding
-        LIMIT :limit
+        ),
+        tag_ranked AS (
+            SELECT id, score, ROW_NUMBER() OVER (ORDER BY score DESC, id) AS rank
+            FROM tag_candidates
+        ),
+        vector_ranked AS (
+            SELECT id, distance, ROW_NUMBER() OVER (ORDER BY distance, id) AS rank
+            FROM ({vector_candidates}) vc
+        )
+        SELECT COALESCE(t.id, v.id) AS id
+        FROM tag_ranked t
+        FULL OUTER JOIN vector_ranked v ON v.id = t.id
+        ORDER BY {score} DESC, COALESCE(t.id, v.id)
+        LIMIT :top_k
+    """)
+    
+    return [row[0] for row in db.execute(query, params)]
+
+
+def build_batch_vector_query(
+    db: Session,
+    query_vectors: List[Optional[List[float]]],
+    top_k: int = 50,
+    tag_slugs: Optional[List[str]] = None,
+    tag_query: Optional[str] = None,
+    threshold: float = 0.2,
+    hybrid: bool = True
+) -> List[List[Tuple[int, float]]]:
+    """Run many vector searches in one statement; returns (shot id, distance) lists per query"""
+    results: List[List[Tuple[int, float]]] = [[] for _ in query_vectors]
+    positions = [i for i, vector in enumerate(query_vectors) if vector]
+    if not positions:
+        return results
+    
+    params = {}
+    where = "TRUE"
+    if hybrid and (tag_slugs or tag_query):
+        # Shared filters are resolved once for the whole batch
+        params["shot_ids"] = get_tag_filtered_ids(db, tag_slugs, tag_query, threshold)
+        if not params["shot_ids"]:
+            return results
+        where = "s.id = ANY(:shot_ids)"
+    
+    neighbors = batch_nearest_shots(
+        db, [to_pgvector(query_vectors[i]) for i in positions], top_k, where, params
+    )
+    for position, ranked in zip(positions, neighbors):
+        results[position] = ranked
+    return results
+
+
+def batch_nearest_shots(
+    db: Session,
+    vector_literals: List[str],
+    top_k: int,
+    where: str = "TRUE",
+    params: Optional[dict] = None
+) -> List[List[Tuple[int, float]]]:
+    """(shot id, distance) neighbours of several pgvector literals in one statement"""
+    results: List[List[Tuple[int, float]]] = [[] for _ in vector_literals]
+    if not vector_literals:
+        return results
+    
+    # Each query vector drives its own index-ordered scan through a LATERAL join
+    operand = "CAST(q.vec AS vector)"
+    nearest = nearest_shots_sql(
+        f"s.id, {distance_sql('s.embedding', operand)} AS distance", operand, where
+    )
+    query = cached_text(f"""
+        SELECT q.idx, n.id, n.distance
+        FROM unnest(CAST(:query_vectors AS text[])) WITH ORDINALITY AS q(vec, idx)
+        CROSS JOIN LATERAL ({nearest}) n
+        ORDER BY q.idx, n.distance
     """)
     
+    params = {**(params or {}), "query_vectors": vector_literals, "top_k": top_k}
+    for idx, shot_id, distance in db.execute(query, params):
+        results[idx - 1].append((shot_id, float(distance)))
+    return results
+
+
+def get_similar_shots(db: Session, shot_id: int, limit: int = 5) -> List[int]:
+    """Find ids of shots similar to a given shot using vector similarity"""
+    # The source embedding is a scalar subquery so the ordering compares the indexed
+    # column against a constant, which is the form the ANN index can serve
+    query = cached_text(nearest_shots_sql(
+        "s.id", "(SELECT embedding FROM shots WHERE id = :shot_id)", "s.id != :shot_id", ":limit"
+    ))
+    
     result = db.execute(query, {"shot_id": shot_id, "limit": limit})
-    return [Shot(**dict(row._mapping)) for row in result]
+    return [row[0] for row in result]
@@ -0,0 +1,148 @@
+import threading
+from collections import OrderedDict
+from typing import FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.invalidation import invalidation
+from app.search.clustering import MiniBatchKMeans
+from app.search.queries import batch_nearest_shots
+from app.search.vectors import parse_vector, to_pgvector
+
+
+class CentroidCache:
+    """Deck centroids keyed on (deck id, deck version, centroid count)
+
+    The deck version covers members being added or removed; a member whose
+    embedding changes reaches the cache as a shot invalidation instead.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[int, int, int], Tuple[List[str], int, FrozenSet[int]]]" = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: Tuple[int, int, int]) -> Optional[Tuple[List[str], int]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(
+        self,
+        key: Tuple[int, int, int],
+        centroids: List[str],
+        members: int,
+        member_ids: Iterable[int] = (),
+        generation: Optional[int] = None,
+    ) -> None:
+        with self._lock:
+            # Centroids read before an invalidation may already be out of date
+            if generation is not None and generation != self._generation:
+                return
+            # A new version makes older entries for the deck unreachable; drop them now
+            for stale in [k for k in self._entries if k[0] == key[0] and k[1] != key[1]]:
+                del self._entries[stale]
+            self._entries[key] = (centroids, members, frozenset(member_ids))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, shot_ids: Optional[Iterable[int]] = None) -> None:
+        """Drop the centroids of every deck holding one of the changed shots"""
+        with self._lock:
+            self._generation += 1
+            if shot_ids is None:
+                self._entries.clear()
+                return
+            changed = frozenset(shot_ids)
+            for key in [k for k, entry in self._entries.items() if not entry[2].isdisjoint(changed)]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        return {"decks": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+centroid_cache = CentroidCache(settings.centroid_cache_size)
+# Re-embedded or deleted members reach this worker through the change log
+invalidation.subscribe("shots", centroid_cache.invalidate)
+
+
+def _member_embeddings(db: Session, deck_id: int) -> np.ndarray:
+    rows = db.execute(text("""
+        SELECT CAST(s.embedding AS text) FROM deck_items di
+        JOIN shots s ON s.id = di.shot_id
+        WHERE di.deck_id = :deck_id AND s.embedding IS NOT NULL
+    """), {"deck_id": deck_id})
+    vectors = [parse_vector(row[0]) for row in rows]
+    if not vectors:
+        return np.zeros((0, settings.embedding_dim), dtype=np.float32)
+    return np.stack(vectors)
+
+
+def deck_centroids(db: Session, deck_id: int, count: int = 1) -> Tuple[List[str], int]:
+    """Centroid literals of a deck's member embeddings and the number of embedded members"""
+    if count == 1 and db.get_bind().dialect.name == "postgresql":
+        # One aggregate over the members; the vectors never leave the database
+        centroid, members = db.execute(text("""
+            SELECT CAST(avg(s.embedding) AS text), count(*) FROM deck_items di
+            JOIN shots s ON s.id = di.shot_id
+            WHERE di.deck_id = :deck_id AND s.embedding IS NOT NULL
+        """), {"deck_id": deck_id}).one()
+        return ([to_pgvector(centroid)] if centroid else []), members
+
+    matrix = _member_embeddings(db, deck_id)
+    if not len(matrix):
+        return [], 0
+    if count == 1 or len(matrix) <= count:
+        centroids = [matrix.mean(axis=0)] if count == 1 else list(matrix)
+    else:
+        # A diverse deck gets one centroid per theme so no theme drowns out the others
+        model = MiniBatchKMeans(count, spherical=settings.vector_metric != "l2")
+        for _ in range(10):
+            model.partial_fit(matrix)
+        centroids = list(model.centroids)
+    return [to_pgvector(centroid) for centroid in centroids], len(matrix)
+
+
+def recommend_shots(db: Session, deck_id: int, version: int, top_k: int, count: int = 1) -> List[int]:
+    """Shots nearest the deck's centroids, excluding its members, best first"""
+    key = (deck_id, version, count)
+    member_ids = {row[0] for row in db.execute(
+        text("SELECT shot_id FROM deck_items WHERE deck_id = :deck_id"), {"deck_id": deck_id}
+    )}
+    cached = centroid_cache.get(key)
+    if cached is None:
+        generation = centroid_cache.generation
+        cached = deck_centroids(db, deck_id, count)
+        centroid_cache.put(key, *cached, member_ids, generation)
+    centroids, members = cached
+    if not centroids:
+        return []
+
+    # Members are filtered afterwards rather than in SQL so each scan stays a plain
+    # index-ordered scan; asking for `members` extra rows keeps top_k results
+    neighbors = batch_nearest_shots(db, centroids, top_k + members)
+
+    # Interleave the centroids' rankings so every theme is represented near the top
+    recommended, seen = [], set(member_ids)
+    for rank in range(max(len(ranked) for ranked in neighbors)):
+        for ranked in neighbors:
+            if rank < len(ranked) and ranked[rank][0] not in seen:
+                seen.add(ranked[rank][0])
+                recommended.append(ranked[rank][0])
+    return recommended[:top_k]
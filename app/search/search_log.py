@@ -0,0 +1,168 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.models.search_log import SearchLog
+
+
+class SearchLogBuffer:
+    """In-memory ring buffer of search log rows, written to the database in batches
+
+    Recording never blocks or touches the database. Past the high-water mark only a
+    sample of searches is kept, and once the ring is full the oldest entries are
+    overwritten, so a slow or unavailable database costs log rows, not request latency.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        capacity: int = 10000,
+        batch_size: int = 500,
+        flush_interval_s: float = 1.0,
+        high_water: float = 0.5,
+        sample_rate: float = 0.1,
+        seed: Optional[int] = None,
+    ):
+        self.session_factory = session_factory
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.high_water = int(capacity * high_water)
+        self.sample_rate = sample_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._entries: deque = deque(maxlen=capacity)
+        self._task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.sampled_out = 0
+        self.overwritten = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_error: Optional[str] = None
+
+    def record(self, entry: dict) -> bool:
+        """Queue one search log row; returns False when it was sampled out under load"""
+        with self._lock:
+            size = len(self._entries)
+            if size >= self.high_water and self._rng.random() >= self.sample_rate:
+                self.sampled_out += 1
+                return False
+            if size == self.capacity:
+                self.overwritten += 1
+            self._entries.append(entry)
+            self.recorded += 1
+            return True
+
+    def _take(self) -> List[dict]:
+        with self._lock:
+            count = min(self.batch_size, len(self._entries))
+            return [self._entries.popleft() for _ in range(count)]
+
+    def flush(self) -> int:
+        """Write everything buffered so far in batch_size multi-row inserts"""
+        total = 0
+        while True:
+            batch = self._take()
+            if not batch:
+                return total
+            db = self.session_factory()
+            try:
+                # A list of parameter sets runs as executemany, which SQLAlchemy sends
+                # to PostgreSQL as multi-row INSERT ... VALUES statements
+                db.execute(insert(SearchLog), batch)
+                db.commit()
+                self.written += len(batch)
+                total += len(batch)
+            except Exception as exc:
+                # The batch is dropped rather than retried so a broken database cannot
+                # make the buffer grow without bound
+                db.rollback()
+                self.failed += len(batch)
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                return total
+            finally:
+                db.close()
+                self.flushes += 1
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval_s)
+            await run_in_threadpool(self.flush)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background flusher and write whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await run_in_threadpool(self.flush)
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._entries),
+            "capacity": self.capacity,
+            "recorded": self.recorded,
+            "sampled_out": self.sampled_out,
+            "overwritten": self.overwritten,
+            "written": self.written,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "last_error": self.last_error,
+        }
+
+
+@contextmanager
+def log_phase(stats: dict, name: str):
+    """Record how long a block took, in milliseconds, under `<name>_ms`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats[f"{name}_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+
+def search_log_entry(
+    query: Optional[str],
+    filters: dict,
+    started: float,
+    result_count: int,
+    result_ids: List[int],
+    stats: dict,
+) -> dict:
+    """Row for one search; filters left at None are omitted"""
+    return {
+        "query": query,
+        "filters": {name: value for name, value in filters.items() if value is not None},
+        "latency_ms": round((time.perf_counter() - started) * 1000, 3),
+        "result_count": result_count,
+        "result_ids": list(result_ids),
+        "stats": stats,
+    }
+
+
+# Shared by every request served by this worker; flushed by a task started in the lifespan
+search_log = SearchLogBuffer(
+    capacity=settings.search_log_capacity,
+    batch_size=settings.search_log_batch_size,
+    flush_interval_s=settings.search_log_flush_interval_s,
+    high_water=settings.search_log_high_water,
+    sample_rate=settings.search_log_sample_rate,
+)
@@ -0,0 +1,51 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+def normalize_query(q: str) -> str:
+    """Collapse case and whitespace so trivially different spellings share a flight"""
+    return " ".join(q.casefold().split())
+
+
+class SingleFlight:
+    """Let concurrent callers with the same key share one in-flight computation"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is not None:
+            self.coalesced += 1
+        else:
+            self.leaders += 1
+            call = asyncio.ensure_future(fn())
+            self._calls[key] = call
+            call.add_done_callback(lambda done: self._finish(key, done))
+        # Shielded so one caller disconnecting does not cancel the work for the others
+        return await asyncio.shield(call)
+
+    def _finish(self, key: Hashable, call: asyncio.Future) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # Mark the exception retrieved even if every waiter went away
+        if not call.cancelled():
+            call.exception()
+
+    def stats(self) -> dict:
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+        }
+
+
+def search_key(q: str, tag_slugs: Optional[List[str]] = None, *params: Hashable) -> tuple:
+    """Key identifying a search by its normalized text and every parameter that shapes the result"""
+    return (normalize_query(q), tuple(sorted(tag_slugs or ())), *params)
+
+
+# Shared by all requests served by this worker's event loop
+search_flights = SingleFlight()
@@ -0,0 +1,354 @@
+import os
+import struct
+import threading
+import time
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.invalidation import invalidation
+from app.search.vectors import VectorLike, parse_vector
+
+
+# On-disk layout, every section 64-byte aligned so it can be mapped in place:
+#   header | float32 matrix [capacity x dim] | int64 ids [capacity] | float32 norms [capacity]
+# Rows are sorted by shot id; only the first `count` rows of each section are valid.
+MAGIC = b"CVLRSNAP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIIQQqd")
+HEADER_SIZE = 64
+ALIGNMENT = 64
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _layout(capacity: int, dim: int) -> Tuple[int, int, int, int]:
+    """Byte offsets of the matrix, ids and norms sections and the total file size"""
+    matrix_offset = HEADER_SIZE
+    ids_offset = _aligned(matrix_offset + capacity * dim * 4)
+    norms_offset = _aligned(ids_offset + capacity * 8)
+    return matrix_offset, ids_offset, norms_offset, _aligned(norms_offset + capacity * 4)
+
+
+def write_snapshot(
+    path: str,
+    rows: Iterable[Tuple[int, VectorLike]],
+    capacity: int,
+    dim: int,
+    watermark: int
+) -> int:
+    """Write (shot id, vector) rows in ascending id order to a new snapshot and swap it in atomically"""
+    matrix_offset, ids_offset, norms_offset, size = _layout(capacity, dim)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.truncate(size)
+
+    # Fill through a writable mapping so the matrix never has to fit in memory twice
+    count, last_id = 0, None
+    try:
+        if capacity:
+            matrix = np.memmap(tmp_path, np.float32, "r+", matrix_offset, (capacity, dim))
+            ids = np.memmap(tmp_path, np.int64, "r+", ids_offset, (capacity,))
+            norms = np.memmap(tmp_path, np.float32, "r+", norms_offset, (capacity,))
+            for shot_id, vector in rows:
+                if count == capacity:
+                    raise ValueError("More rows than the snapshot capacity")
+                if last_id is not None and shot_id <= last_id:
+                    raise ValueError("Snapshot rows must be in ascending id order")
+                vector = parse_vector(vector)
+                matrix[count] = vector
+                ids[count] = shot_id
+                norms[count] = np.linalg.norm(vector)
+                count, last_id = count + 1, shot_id
+            for array in (matrix, ids, norms):
+                array.flush()
+            del matrix, ids, norms
+
+        with open(tmp_path, "r+b") as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, dim, count, capacity, watermark, time.time()))
+            f.flush()
+            os.fsync(f.fileno())
+        # Workers that still map the old file keep reading it until they notice the swap
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def _distances(matrix: np.ndarray, norms: np.ndarray, query: np.ndarray, metric: str) -> np.ndarray:
+    """Distances from every row to the query, using the same conventions as pgvector"""
+    dots = matrix @ query
+    if metric == "ip":
+        return -dots
+    query_norm = float(np.linalg.norm(query))
+    if metric == "cosine":
+        denominators = norms * query_norm
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(denominators > 0, 1 - dots / denominators, np.nan)
+    squared = norms ** 2 + query_norm ** 2 - 2 * dots
+    return np.sqrt(np.maximum(squared, 0))
+
+
+def _nearest(
+    ids: np.ndarray,
+    distances: np.ndarray,
+    top_k: int,
+    allowed: Optional[np.ndarray] = None
+) -> List[Tuple[int, float]]:
+    if allowed is not None:
+        keep = np.isin(ids, allowed)
+        ids, distances = ids[keep], distances[keep]
+    keep = ~np.isnan(distances)
+    ids, distances = ids[keep], distances[keep]
+    if len(ids) > top_k:
+        candidates = np.argpartition(distances, top_k - 1)[:top_k]
+        ids, distances = ids[candidates], distances[candidates]
+    order = np.lexsort((ids, distances))
+    return [(int(ids[i]), float(distances[i])) for i in order]
+
+
+class EmbeddingSnapshot:
+    """A read-only, memory-mapped embedding matrix shared through the page cache"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+            stat = os.fstat(f.fileno())
+        magic, version, dim, count, capacity, watermark, built_at = HEADER.unpack(header)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} embedding snapshot")
+
+        self.path = path
+        self.dim = dim
+        self.count = count
+        self.watermark = watermark
+        self.built_at = built_at
+        self.identity = (stat.st_ino, stat.st_mtime_ns)
+
+        matrix_offset, ids_offset, norms_offset, _ = _layout(capacity, dim)
+        if count:
+            self.matrix = np.memmap(path, np.float32, "r", matrix_offset, (count, dim))
+            self.ids = np.memmap(path, np.int64, "r", ids_offset, (count,))
+            self.norms = np.memmap(path, np.float32, "r", norms_offset, (count,))
+        else:
+            self.matrix = np.zeros((0, dim), dtype=np.float32)
+            self.ids = np.zeros(0, dtype=np.int64)
+            self.norms = np.zeros(0, dtype=np.float32)
+
+    def get(self, shot_id: int) -> Optional[np.ndarray]:
+        """The stored vector of a shot, found by binary search over the sorted ids"""
+        position = int(np.searchsorted(self.ids, shot_id))
+        if position < self.count and self.ids[position] == shot_id:
+            return np.asarray(self.matrix[position])
+        return None
+
+    def search(
+        self,
+        query_vector: VectorLike,
+        top_k: int,
+        metric: Optional[str] = None,
+        allowed: Optional[Sequence[int]] = None,
+        masked: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """Exact (shot id, distance) neighbours within the snapshot, skipping rows set in masked"""
+        query = parse_vector(query_vector)
+        distances = _distances(self.matrix, self.norms, query, metric or settings.vector_metric)
+        if masked is not None:
+            distances[masked] = np.nan
+        allowed = None if allowed is None else np.asarray(allowed, dtype=np.int64)
+        return _nearest(np.asarray(self.ids), distances, top_k, allowed)
+
+
+class SnapshotStore:
+    """The current snapshot of this worker plus the shots embedded since it was built"""
+
+    def __init__(self, path: str, check_interval: float = 1.0, delta_interval: float = 5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.delta_interval = delta_interval
+        self._lock = threading.Lock()
+        # Held while the delta is read from the database, so only one search refreshes it
+        self._refresh_lock = threading.Lock()
+        self._snapshot: Optional[EmbeddingSnapshot] = None
+        self._checked_at = 0.0
+        self._delta_ids = np.zeros(0, dtype=np.int64)
+        self._delta_matrix: Optional[np.ndarray] = None
+        self._delta_refreshed_at = 0.0
+        self._delta_after = 0
+        # Bumped whenever the delta is discarded, so reads started before that are dropped
+        self._delta_generation = 0
+        # Shots changed since they were read: pending ones are re-read on the next search.
+        # Snapshot rows outdated by a change are flagged in a mask over the rows of the
+        # snapshot it was built for, so searches skip them without fetching extra candidates
+        self._pending: Set[int] = set()
+        self._stale: Optional[Tuple[EmbeddingSnapshot, np.ndarray]] = None
+
+    def current(self) -> Optional[EmbeddingSnapshot]:
+        """The mapped snapshot, reopened when the file on disk has been swapped"""
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._checked_at < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                self._snapshot = None
+                return None
+            if self._snapshot is None or self._snapshot.identity != (stat.st_ino, stat.st_mtime_ns):
+                self._snapshot = EmbeddingSnapshot(self.path)
+                self._stale = None
+                self._reset_delta()
+            return self._snapshot
+
+    def _reset_delta(self) -> None:
+        self._delta_ids = np.zeros(0, dtype=np.int64)
+        self._delta_matrix = None
+        self._delta_refreshed_at = 0.0
+        self._delta_after = 0
+        self._delta_generation += 1
+
+    def _append_delta(self, rows) -> None:
+        if not rows:
+            return
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        matrix = np.stack([parse_vector(row[1]) for row in rows])
+        self._delta_ids = np.concatenate([self._delta_ids, ids])
+        if self._delta_matrix is None:
+            self._delta_matrix = matrix
+        else:
+            self._delta_matrix = np.concatenate([self._delta_matrix, matrix])
+
+    def _mask_stale(self, snapshot: EmbeddingSnapshot, shot_ids: List[int]) -> None:
+        ids = np.asarray(shot_ids, dtype=np.int64)
+        positions = np.searchsorted(snapshot.ids, ids)
+        inside = positions < snapshot.count
+        positions, ids = positions[inside], ids[inside]
+        positions = positions[np.asarray(snapshot.ids[positions]) == ids]
+        if not len(positions):
+            return
+        # Replaced rather than updated in place, so a running search sees one mask or the other
+        if self._stale is not None and self._stale[0] is snapshot:
+            mask = self._stale[1].copy()
+        else:
+            mask = np.zeros(snapshot.count, dtype=bool)
+        mask[positions] = True
+        self._stale = (snapshot, mask)
+
+    def invalidate(self, shot_ids: Optional[Iterable[int]] = None) -> None:
+        """Pick up changed shots on the next search instead of waiting for the next build"""
+        with self._lock:
+            if shot_ids is None:
+                self._reset_delta()
+            else:
+                self._pending.update(shot_ids)
+
+    def _apply_changes(self, db: Session, snapshot: EmbeddingSnapshot) -> None:
+        # Called with the refresh lock held
+        with self._lock:
+            pending, self._pending = self._pending, set()
+            generation = self._delta_generation
+            # Shots past the horizon have not been read yet and arrive with the delta
+            horizon = max(self._delta_after, snapshot.watermark)
+        changed = sorted(shot_id for shot_id in pending if shot_id <= horizon)
+        if not changed:
+            return
+        rows = db.execute(text("""
+            SELECT id, CAST(embedding AS text) FROM shots
+            WHERE id IN :ids AND embedding IS NOT NULL
+            ORDER BY id
+        """).bindparams(bindparam("ids", expanding=True)), {"ids": changed}).all()
+        with self._lock:
+            if generation != self._delta_generation:
+                # The delta was discarded while reading; apply these on the next search
+                self._pending.update(changed)
+                return
+            # Outdated copies go: snapshot rows are masked and delta rows replaced, and
+            # shots that were deleted or lost their embedding are simply not re-added
+            self._mask_stale(snapshot, changed)
+            keep = ~np.isin(self._delta_ids, changed)
+            self._delta_ids = self._delta_ids[keep]
+            if self._delta_matrix is not None:
+                self._delta_matrix = self._delta_matrix[keep]
+            self._append_delta(rows)
+
+    def _refresh_delta(self, db: Session, snapshot: EmbeddingSnapshot) -> None:
+        if not self._pending and time.monotonic() - self._delta_refreshed_at < self.delta_interval:
+            return
+        with self._refresh_lock:
+            self._apply_changes(db, snapshot)
+            # Searches that waited here find the delta already refreshed
+            if time.monotonic() - self._delta_refreshed_at < self.delta_interval:
+                return
+            with self._lock:
+                generation = self._delta_generation
+                # Only rows past what we already hold are read, so each refresh stays small
+                after = max(self._delta_after, snapshot.watermark)
+            rows = db.execute(text("""
+                SELECT id, CAST(embedding AS text) FROM shots
+                WHERE id > :after AND embedding IS NOT NULL
+                ORDER BY id
+            """), {"after": after}).all()
+            with self._lock:
+                if generation != self._delta_generation:
+                    # The snapshot was swapped or the delta reset while reading
+                    return
+                rows = [row for row in rows if row[0] > self._delta_after]
+                self._append_delta(rows)
+                if rows:
+                    self._delta_after = int(rows[-1][0])
+                self._delta_refreshed_at = time.monotonic()
+
+    def search(
+        self,
+        db: Session,
+        query_vector: VectorLike,
+        top_k: int,
+        allowed: Optional[Sequence[int]] = None
+    ) -> Optional[List[int]]:
+        """Nearest shot ids over snapshot and delta, or None when there is no snapshot"""
+        snapshot = self.current()
+        if snapshot is None:
+            return None
+        self._refresh_delta(db, snapshot)
+
+        stale = self._stale
+        masked = stale[1] if stale is not None and stale[0] is snapshot else None
+        results = snapshot.search(query_vector, top_k, allowed=allowed, masked=masked)
+        with self._lock:
+            # Writers replace the two one after the other; read them as a matching pair
+            delta_ids, delta_matrix = self._delta_ids, self._delta_matrix
+        if delta_matrix is not None:
+            query = parse_vector(query_vector)
+            norms = np.linalg.norm(delta_matrix, axis=1)
+            distances = _distances(delta_matrix, norms, query, settings.vector_metric)
+            allowed = None if allowed is None else np.asarray(allowed, dtype=np.int64)
+            results = sorted(
+                results + _nearest(delta_ids, distances, top_k, allowed),
+                key=lambda item: (item[1], item[0])
+            )[:top_k]
+        return [shot_id for shot_id, _ in results]
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "path": self.path,
+            "loaded": snapshot is not None,
+            "rows": snapshot.count if snapshot else 0,
+            "watermark": snapshot.watermark if snapshot else None,
+            "built_at": snapshot.built_at if snapshot else None,
+            "delta_rows": len(self._delta_ids),
+            "stale_rows": 0 if self._stale is None else int(self._stale[1].sum()),
+        }
+
+
+snapshot_store = SnapshotStore(settings.snapshot_path, delta_interval=settings.snapshot_delta_interval)
+# Embeddings changed or removed after the build reach this worker through the change log
+invalidation.subscribe("shots", snapshot_store.invalidate)
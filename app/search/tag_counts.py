@@ -0,0 +1,77 @@
+import threading
+import time
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.invalidation import invalidation
+from app.models.tag import ShotTag
+
+
+class TagCountCache:
+    """Number of shots carrying each tag, loaded for all missing tags in one GROUP BY"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._counts: Dict[int, Tuple[int, float]] = {}
+        # Bumped by every invalidation; a count read before one is not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def counts(self, db: Session, tag_ids: List[int]) -> Dict[int, int]:
+        now = time.monotonic()
+        result, missing = {}, []
+        with self._lock:
+            for tag_id in tag_ids:
+                entry = self._counts.get(tag_id)
+                if entry is not None and now - entry[1] < self.ttl:
+                    result[tag_id] = entry[0]
+                else:
+                    missing.append(tag_id)
+            self.hits += len(result)
+            self.misses += len(missing)
+            generation = self._generation
+        if missing:
+            loaded = dict.fromkeys(missing, 0)
+            loaded.update(
+                db.query(ShotTag.tag_id, func.count())
+                .filter(ShotTag.tag_id.in_(missing))
+                .group_by(ShotTag.tag_id)
+                .all()
+            )
+            # A lagging replica can still return the count from before an invalidation,
+            # so only primary reads are cached
+            if not db.info.get("replica"):
+                with self._lock:
+                    if generation == self._generation:
+                        for tag_id, count in loaded.items():
+                            self._counts[tag_id] = (count, now)
+            result.update(loaded)
+        return result
+
+    def invalidate(self, tag_ids: Optional[FrozenSet[int]] = None) -> None:
+        with self._lock:
+            self.invalidations += 1
+            self._generation += 1
+            if tag_ids is None:
+                self._counts.clear()
+            else:
+                for tag_id in tag_ids:
+                    self._counts.pop(tag_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "tags": len(self._counts),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+tag_counts = TagCountCache(settings.tag_count_cache_ttl_s)
+invalidation.subscribe("tags", tag_counts.invalidate)
@@ -0,0 +1,159 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.invalidation import invalidation
+from app.models.shot import Shot
+
+
+# Columns the timeline scrubber renders; rows are ordered by (t_start_ms, id)
+TIMELINE_COLUMNS = (Shot.id, Shot.t_start_ms, Shot.t_end_ms, Shot.thumb_url)
+
+# Keyset position: the (t_start_ms, id) of the last row already returned
+Cursor = Tuple[int, int]
+
+
+def encode_cursor(t_start_ms: int, shot_id: int) -> str:
+    return f"{t_start_ms}:{shot_id}"
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Cursor]:
+    """Parse a continuation token; raises ValueError for malformed ones"""
+    if not cursor:
+        return None
+    t_start_ms, shot_id = cursor.split(":")
+    return int(t_start_ms), int(shot_id)
+
+
+def overlapping_shots_query(
+    db: Session,
+    video_id: int,
+    from_ms: int,
+    to_ms: int,
+    after: Optional[Cursor] = None,
+    limit: int = 100
+):
+    """Shots of a video overlapping [from_ms, to_ms) in time order, after a keyset cursor
+
+    Zero-length shots overlap nothing, as an empty int4range never matches &&.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        # Matches the shot_time_range GiST index
+        overlap = func.int4range(Shot.t_start_ms, Shot.t_end_ms).op("&&")(func.int4range(from_ms, to_ms))
+    else:
+        overlap = and_(Shot.t_start_ms < to_ms, Shot.t_end_ms > from_ms, Shot.t_end_ms > Shot.t_start_ms)
+
+    query = db.query(*TIMELINE_COLUMNS).filter(Shot.video_id == video_id, overlap)
+    if after is not None:
+        query = query.filter(or_(
+            Shot.t_start_ms > after[0],
+            and_(Shot.t_start_ms == after[0], Shot.id > after[1])
+        ))
+    return query.order_by(Shot.t_start_ms, Shot.id).limit(limit)
+
+
+class VideoTimeline:
+    """All shots of one video as sorted interval arrays for in-memory overlap queries"""
+
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda row: (row[1], row[0]))
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.starts = np.array([row[1] for row in rows], dtype=np.int64)
+        self.ends = np.array([row[2] for row in rows], dtype=np.int64)
+        self.thumbs = [row[3] for row in rows]
+        # Running maximum of end times: every shot before position i ends by max_ends[i],
+        # so a binary search finds the first shot that can still reach from_ms
+        self.max_ends = np.maximum.accumulate(self.ends) if len(rows) else self.ends
+        self.loaded_at = time.monotonic()
+
+    def overlapping(
+        self,
+        from_ms: int,
+        to_ms: int,
+        after: Optional[Cursor] = None,
+        limit: int = 100
+    ) -> List[Tuple[int, int, int, Optional[str]]]:
+        lo = int(np.searchsorted(self.max_ends, from_ms, side="right"))
+        hi = int(np.searchsorted(self.starts, to_ms, side="left"))
+        if after is not None:
+            # Skip straight past the cursor instead of filtering the whole window
+            lo = max(lo, int(np.searchsorted(self.starts, after[0], side="left")))
+        results = []
+        for i in range(lo, hi):
+            # Zero-length shots are left out, as in overlapping_shots_query
+            if self.ends[i] <= from_ms or self.ends[i] == self.starts[i]:
+                continue
+            if after is not None and (self.starts[i], self.ids[i]) <= after:
+                continue
+            results.append((int(self.ids[i]), int(self.starts[i]), int(self.ends[i]), self.thumbs[i]))
+            if len(results) == limit:
+                break
+        return results
+
+
+class TimelineCache:
+    """LRU of timelines for videos requested often enough to be worth holding in memory"""
+
+    def __init__(self, capacity: int, hot_after: int, ttl: float):
+        self.capacity = capacity
+        self.hot_after = hot_after
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._timelines: "OrderedDict[int, VideoTimeline]" = OrderedDict()
+        self._requests: Dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db: Session, video_id: int) -> Optional[VideoTimeline]:
+        """The cached timeline, loading it once the video is hot; None means query the database"""
+        with self._lock:
+            timeline = self._timelines.get(video_id)
+            if timeline is not None and time.monotonic() - timeline.loaded_at < self.ttl:
+                self._timelines.move_to_end(video_id)
+                self.hits += 1
+                return timeline
+            self.misses += 1
+            count = self._requests.get(video_id, 0) + 1
+            self._requests[video_id] = count
+            # Bound the request counters along with the cache itself
+            if len(self._requests) > self.capacity * 16:
+                self._requests.clear()
+            if count < self.hot_after:
+                return None
+
+        rows = db.query(*TIMELINE_COLUMNS).filter(Shot.video_id == video_id).all()
+        timeline = VideoTimeline(rows)
+        with self._lock:
+            self._timelines[video_id] = timeline
+            self._timelines.move_to_end(video_id)
+            while len(self._timelines) > self.capacity:
+                self._timelines.popitem(last=False)
+        return timeline
+
+    def invalidate(self, video_ids: Optional[Iterable[int]] = None) -> None:
+        with self._lock:
+            if video_ids is None:
+                self._timelines.clear()
+            else:
+                for video_id in video_ids:
+                    self._timelines.pop(video_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "videos": len(self._timelines),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+timeline_cache = TimelineCache(
+    settings.timeline_cache_size, settings.timeline_hot_after, settings.timeline_cache_ttl_s
+)
+# Shots added, moved or removed anywhere reach this worker through the change log
+invalidation.subscribe("videos", timeline_cache.invalidate)
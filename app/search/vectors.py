@@ -0,0 +1,41 @@
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+from app.core.config import settings
+
+
+VectorLike = Union[str, Sequence[float], np.ndarray]
+
+
+def parse_vector(value: VectorLike) -> np.ndarray:
+    """Turn a pgvector text literal ('[1,2,3]') or a sequence into a float32 array"""
+    if isinstance(value, str):
+        return np.array([float(x) for x in value.strip("[]").split(",")], dtype=np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
+def parse_vectors(values: Sequence[str]) -> np.ndarray:
+    """Parse many pgvector text literals into one (n, dim) float32 matrix in a single conversion"""
+    if not values:
+        return np.zeros((0, 0), dtype=np.float32)
+    joined = ",".join(value.strip("[]") for value in values)
+    return np.array(joined.split(","), dtype=np.float32).reshape(len(values), -1)
+
+
+def normalize(vector: np.ndarray) -> np.ndarray:
+    """Scale to unit length; zero vectors are returned unchanged"""
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def to_pgvector(value: VectorLike, normalized: Optional[bool] = None) -> str:
+    """Format a vector as a pgvector text literal, normalizing it when configured"""
+    if normalized is None:
+        normalized = settings.normalize_embeddings
+    if isinstance(value, str) and not normalized:
+        return value
+    vector = parse_vector(value)
+    if normalized:
+        vector = normalize(vector)
+    return f"[{','.join(map(str, vector.tolist()))}]"
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+ANN recall benchmark for CVLR backend.
+Compares index-backed vector search against exact search for a sample of
+shot embeddings, sweeping ivfflat.probes or hnsw.ef_search, and reports
+recall@k and latency so search defaults can be picked from data. With
+--quantization the ANN side searches the quantized index and re-ranks; with
+--model it searches that model, e.g. a PCA-reduced one from
+scripts/reduce_embeddings.py, whose candidates are re-ranked on shots.embedding.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.search.ann import QUANTIZATIONS, apply_search_params
+from app.search.embedding_models import embedding_models
+from app.search.queries import build_vector_query
+
+
+def sample_query_vectors(db, samples):
+    """Use stored shot embeddings as queries so the benchmark reflects the real distribution."""
+    rows = db.execute(text("""
+        SELECT embedding::text FROM shots
+        WHERE embedding IS NOT NULL
+        ORDER BY random()
+        LIMIT :samples
+    """), {"samples": samples})
+    return [[float(x) for x in row[0].strip("[]").split(",")] for row in rows]
+
+
+def exact_neighbors(db, query_vector, top_k):
+    """Ground truth: force a full-precision sequential scan so every row is compared."""
+    quantization = settings.vector_quantization
+    settings.vector_quantization = "none"
+    try:
+        db.execute(text("SET LOCAL enable_indexscan = off"))
+        ids = build_vector_query(db, query_vector, top_k, hybrid=False)
+    finally:
+        settings.vector_quantization = quantization
+        db.rollback()
+    return ids
+
+
+def ann_neighbors(db, query_vector, top_k, value, model=None):
+    if settings.vector_index_type == "hnsw":
+        apply_search_params(db, ef_search=value)
+    else:
+        apply_search_params(db, probes=value)
+    start = time.perf_counter()
+    ids = build_vector_query(db, query_vector, top_k, hybrid=False, model=model)
+    elapsed = time.perf_counter() - start
+    db.rollback()
+    return ids, elapsed
+
+
+def run_benchmark(samples, top_k, values, target, model_name=None):
+    db = SessionLocal()
+    try:
+        model = None
+        if model_name:
+            model = embedding_models.get(db, model_name)
+            if model is None:
+                raise SystemExit(f"Unknown embedding model: {model_name}")
+        queries = sample_query_vectors(db, samples)
+        if not queries:
+            print("No embedded shots to benchmark against.")
+            return []
+        truth = [set(exact_neighbors(db, q, top_k)) for q in queries]
+
+        knob = "hnsw.ef_search" if settings.vector_index_type == "hnsw" else "ivfflat.probes"
+        results = []
+        for value in values:
+            recalls, latencies = [], []
+            for query_vector, expected in zip(queries, truth):
+                ids, elapsed = ann_neighbors(db, query_vector, top_k, value, model)
+                recalls.append(len(expected.intersection(ids)) / max(len(expected), 1))
+                latencies.append(elapsed * 1000)
+            results.append({
+                knob: value,
+                "recall": float(np.mean(recalls)),
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p95_ms": float(np.percentile(latencies, 95)),
+            })
+
+        print(f"{knob:>16} {'recall@' + str(top_k):>10} {'p50 ms':>9} {'p95 ms':>9}")
+        for row in results:
+            print(f"{row[knob]:>16} {row['recall']:>10.3f} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f}")
+
+        reaching = [row for row in results if row["recall"] >= target]
+        if reaching:
+            print(f"\nSmallest {knob} reaching recall {target}: {reaching[0][knob]}")
+        else:
+            print(f"\nNo tested {knob} value reached recall {target}")
+        return results
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=int, default=100, help="Number of query vectors")
+    parser.add_argument("--top-k", type=int, default=50, help="Neighbours compared per query")
+    parser.add_argument("--values", default="1,5,10,20,40,80",
+                        help="Comma-separated probes / ef_search values to sweep")
+    parser.add_argument("--target", type=float, default=0.95, help="Recall target")
+    parser.add_argument("--quantization", choices=QUANTIZATIONS, default=None,
+                        help="Candidate representation (defaults to VECTOR_QUANTIZATION)")
+    parser.add_argument("--rerank-factor", type=int, default=None,
+                        help="Candidates per result re-ranked at full precision")
+    parser.add_argument("--model", default=None,
+                        help="Embedding model searched on the ANN side (must share the default model's space)")
+    parser.add_argument("--json", dest="json_path", help="Write results to this file")
+    args = parser.parse_args()
+
+    if args.quantization:
+        settings.vector_quantization = args.quantization
+    if args.rerank_factor:
+        settings.rerank_factor = args.rerank_factor
+
+    values = sorted(int(v) for v in args.values.split(","))
+    results = run_benchmark(args.samples, args.top_k, values, args.target, args.model)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
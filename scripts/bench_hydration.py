@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Shot hydration benchmark for CVLR backend.
+Compares the old listing path (full Shot entities including the embedding,
+one video and one tag query per shot) with the projected row path used by
+the API, reporting payload bytes and latency per page.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy.orm import undefer
+
+from app.core.db import SessionLocal
+from app.models import Shot, Tag, ShotTag, Video
+from app.search.queries import fetch_shot_rows, get_tag_names
+
+
+def _payload_bytes(values):
+    """Approximate wire size: psycopg transfers these columns in text format."""
+    return sum(len(str(value).encode()) for value in values if value is not None)
+
+
+def hydrate_entities(db, shot_ids):
+    """The pre-projection path: full ORM instances plus per-shot lookups."""
+    shots = db.query(Shot).options(undefer(Shot.embedding)).filter(Shot.id.in_(shot_ids)).all()
+    size = 0
+    for shot in shots:
+        video = db.query(Video).filter(Video.id == shot.video_id).first()
+        tags = db.query(Tag).join(ShotTag).filter(ShotTag.shot_id == shot.id).all()
+        size += _payload_bytes(getattr(shot, column.key) for column in Shot.__table__.columns)
+        size += _payload_bytes(getattr(video, column.key) for column in Video.__table__.columns)
+        for tag in tags:
+            size += _payload_bytes(getattr(tag, column.key) for column in Tag.__table__.columns)
+    return size
+
+
+def hydrate_rows(db, shot_ids):
+    """The current path: listing columns only, tags for the whole page in one query."""
+    rows = fetch_shot_rows(db, shot_ids)
+    tag_names = get_tag_names(db, shot_ids)
+    size = sum(_payload_bytes(row) for row in rows)
+    size += sum(_payload_bytes(names) for names in tag_names.values())
+    return size
+
+
+def measure(db, hydrate, shot_ids, iterations):
+    latencies, size = [], 0
+    for _ in range(iterations):
+        # Start from an empty identity map so every iteration really loads
+        db.expunge_all()
+        start = time.perf_counter()
+        size = hydrate(db, shot_ids)
+        latencies.append((time.perf_counter() - start) * 1000)
+        db.rollback()
+    return {
+        "bytes_per_page": size,
+        "mean_ms": statistics.mean(latencies),
+        "p95_ms": sorted(latencies)[int(0.95 * (len(latencies) - 1))],
+    }
+
+
+def run_benchmark(page_size, iterations):
+    db = SessionLocal()
+    try:
+        shot_ids = [row[0] for row in db.query(Shot.id).order_by(Shot.id).limit(page_size)]
+        if not shot_ids:
+            print("No shots to hydrate.")
+            return {}
+
+        results = {
+            "before": measure(db, hydrate_entities, shot_ids, iterations),
+            "after": measure(db, hydrate_rows, shot_ids, iterations),
+        }
+        print(f"Page of {len(shot_ids)} shots, {iterations} iterations")
+        for name, result in results.items():
+            print(f"{name:>7}: {result['bytes_per_page']:>10} bytes  "
+                  f"{result['mean_ms']:>8.2f} ms mean  {result['p95_ms']:>8.2f} ms p95")
+        return results
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--page-size", type=int, default=24, help="Shots per page")
+    parser.add_argument("--iterations", type=int, default=50, help="Repetitions per path")
+    parser.add_argument("--json", dest="json_path", help="Write results to this file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.page_size, args.iterations)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Query construction overhead benchmark for CVLR backend.
+Times the hot read statements per call the way they used to be built (ORM
+Query objects and text() rebuilt on every request) and as they are now
+(prebuilt statements, lambda statements and cached text() with bound
+parameters). The "after" path is also timed with SQLAlchemy's compiled cache
+disabled, which shows what compilation costs. Run it against a small or
+local database so Python overhead rather than query execution dominates; on
+PostgreSQL, --prepare-threshold compares psycopg's server-side prepared
+statements against none.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import create_engine, func, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models import Shot, Tag, ShotTag, Video
+from app.search.queries import (
+    SHOT_LIST_COLUMNS, build_shot_query, cached_text, fetch_shot_rows, get_tag_names, nearest_shots_sql
+)
+from app.api.shots import SHOT_DETAIL
+
+
+def legacy_shot_listing(db, tag_slugs=None):
+    """build_shot_query before statement caching: a new ORM Query per request."""
+    query = db.query(*SHOT_LIST_COLUMNS).join(Video)
+    if tag_slugs:
+        query = query.join(ShotTag).join(Tag).filter(Tag.slug.in_(tag_slugs))
+    total = query.count()
+    return query.offset(0).limit(24).all(), total
+
+
+def current_shot_listing(db, tag_slugs=None):
+    statement, total = build_shot_query(db, tag_slugs, page=1, page_size=24)
+    return db.execute(statement).all(), total
+
+
+def legacy_shot_rows(db, shot_ids):
+    return db.query(*SHOT_LIST_COLUMNS).outerjoin(Video).filter(Shot.id.in_(shot_ids)).all()
+
+
+def legacy_tag_names(db, shot_ids):
+    rows = db.query(ShotTag.shot_id, Tag.name).join(Tag).filter(ShotTag.shot_id.in_(shot_ids))
+    return [tuple(row) for row in rows]
+
+
+def legacy_shot_detail(db, shot_id):
+    return db.query(
+        *SHOT_LIST_COLUMNS,
+        Video.src_url.label("video_src_url"),
+        Shot.embedding.isnot(None).label("has_embedding")
+    ).outerjoin(Video).filter(Shot.id == shot_id).first()
+
+
+def current_shot_detail(db, shot_id):
+    return db.execute(SHOT_DETAIL, {"shot_id": shot_id}).first()
+
+
+def legacy_vector_statement(db):
+    return text(nearest_shots_sql("s.id", ":query_vector"))
+
+
+def current_vector_statement(db):
+    return cached_text(nearest_shots_sql("s.id", ":query_vector"))
+
+
+def paths(shot_ids, tag_slug):
+    """name -> (before, after) callables taking a session."""
+    return {
+        "shot_listing": (legacy_shot_listing, current_shot_listing),
+        "tag_listing": (
+            lambda db: legacy_shot_listing(db, [tag_slug]),
+            lambda db: current_shot_listing(db, [tag_slug]),
+        ),
+        "shot_rows": (lambda db: legacy_shot_rows(db, shot_ids), lambda db: fetch_shot_rows(db, shot_ids)),
+        "tag_names": (lambda db: legacy_tag_names(db, shot_ids), lambda db: get_tag_names(db, shot_ids)),
+        "shot_detail": (
+            lambda db: legacy_shot_detail(db, shot_ids[0]),
+            lambda db: current_shot_detail(db, shot_ids[0]),
+        ),
+        # Statement construction only; the SQL needs pgvector to run
+        "vector_sql_build": (legacy_vector_statement, current_vector_statement),
+    }
+
+
+def time_us(db, fn, iterations, repeats):
+    """Best-of-repeats mean microseconds per call, after a warm-up that fills the caches."""
+    for _ in range(min(iterations, 20)):
+        fn(db)
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn(db)
+        best = min(best, (time.perf_counter() - start) / iterations)
+        db.rollback()
+    return best * 1e6
+
+
+def run_benchmark(bind, iterations, repeats, page_size):
+    db = Session(bind=bind)
+    # Same connections, but every statement is compiled from scratch
+    uncached = Session(bind=bind.execution_options(compiled_cache=None))
+    try:
+        shot_ids = [row[0] for row in db.query(Shot.id).order_by(Shot.id).limit(page_size)]
+        tag_slug = db.query(Tag.slug).order_by(func.random()).limit(1).scalar() or "action"
+        if not shot_ids:
+            print("No shots to query.")
+            return {}
+
+        results = {}
+        for name, (before, after) in paths(shot_ids, tag_slug).items():
+            results[name] = {
+                "before_us": round(time_us(db, before, iterations, repeats), 1),
+                "after_us": round(time_us(db, after, iterations, repeats), 1),
+                "after_uncached_us": round(time_us(uncached, after, iterations, repeats), 1),
+            }
+            results[name]["speedup"] = round(results[name]["before_us"] / results[name]["after_us"], 2)
+
+        print(f"{iterations} calls x {repeats} repeats, page of {len(shot_ids)} shots ({bind.dialect.name})")
+        print(f"{'path':>17} {'before us':>10} {'after us':>10} {'speedup':>8} {'uncached us':>12}")
+        for name, row in results.items():
+            print(f"{name:>17} {row['before_us']:>10.1f} {row['after_us']:>10.1f} "
+                  f"{row['speedup']:>7.2f}x {row['after_uncached_us']:>12.1f}")
+        return results
+    finally:
+        uncached.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=500, help="Calls per timing")
+    parser.add_argument("--repeats", type=int, default=5, help="Timings per path; the best is kept")
+    parser.add_argument("--page-size", type=int, default=24, help="Shots per page")
+    parser.add_argument("--prepare-threshold", default=None,
+                        help="psycopg prepare_threshold for this run ('none' disables; default DB_PREPARE_THRESHOLD)")
+    parser.add_argument("--json", dest="json_path", help="Write results to this file")
+    args = parser.parse_args()
+
+    bind = engine
+    if args.prepare_threshold is not None and engine.dialect.name == "postgresql":
+        threshold = None if args.prepare_threshold == "none" else int(args.prepare_threshold)
+        bind = create_engine(settings.database_url, connect_args={"prepare_threshold": threshold})
+
+    results = run_benchmark(bind, args.iterations, args.repeats, args.page_size)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Build the memory-mapped embedding snapshot for CVLR backend.
+Streams every embedded shot into a new snapshot file next to SNAPSHOT_PATH
+and atomically swaps it in; running workers pick it up on their next search
+and read anything embedded after the build from the database.
+"""
+
+import argparse
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.db import engine
+from app.search.snapshot import write_snapshot
+
+
+def build_snapshot(path, batch_size=5000):
+    """Write all embeddings up to the current max shot id into a snapshot at path."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    start = time.perf_counter()
+    # One repeatable-read transaction so the count, watermark and rows agree
+    with engine.connect().execution_options(isolation_level="REPEATABLE READ") as connection:
+        # Later shots are served from the delta until the next build
+        watermark = connection.execute(text("SELECT COALESCE(max(id), 0) FROM shots")).scalar()
+        capacity = connection.execute(
+            text("SELECT count(*) FROM shots WHERE embedding IS NOT NULL AND id <= :watermark"),
+            {"watermark": watermark}
+        ).scalar()
+        rows = connection.execution_options(yield_per=batch_size).execute(
+            text("""
+                SELECT id, CAST(embedding AS text) FROM shots
+                WHERE embedding IS NOT NULL AND id <= :watermark
+                ORDER BY id
+            """),
+            {"watermark": watermark}
+        )
+        count = write_snapshot(path, rows, capacity, settings.embedding_dim, watermark)
+
+    size = os.path.getsize(path)
+    print(f"Wrote {count} embeddings up to shot {watermark} to {path} "
+          f"({size / 1024 / 1024:.1f} MiB) in {time.perf_counter() - start:.1f}s")
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--path", default=settings.snapshot_path, help="Snapshot file to replace")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows fetched per round trip")
+    args = parser.parse_args()
+    build_snapshot(args.path, args.batch_size)
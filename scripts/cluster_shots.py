@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Embedding clustering job for CVLR backend.
+Fits mini-batch k-means over shot embeddings streamed from the database in
+chunks (visited in random order each epoch), stores centroids and per-shot
+assignments for browse-by-cluster, and reports the cluster size distribution
+so IVFFlat list counts can be chosen from data. --sweep only reports.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.models.cluster import Cluster, ShotCluster
+from app.search.ann import ivfflat_lists_for
+from app.search.clustering import MiniBatchKMeans, size_report
+from app.search.vectors import parse_vector, to_pgvector
+
+
+def chunk_bounds(db, batch_size):
+    """Id ranges holding about batch_size embedded shots each."""
+    starts = [row[0] for row in db.execute(text("""
+        SELECT id FROM (
+            SELECT id, row_number() OVER (ORDER BY id) AS rn
+            FROM shots WHERE embedding IS NOT NULL
+        ) numbered
+        WHERE (rn - 1) % :batch_size = 0
+        ORDER BY id
+    """), {"batch_size": batch_size})]
+    return [(start, starts[i + 1] if i + 1 < len(starts) else None) for i, start in enumerate(starts)]
+
+
+def load_chunk(db, bounds):
+    start, end = bounds
+    upper = "" if end is None else "AND id < :end"
+    rows = db.execute(text(f"""
+        SELECT id, CAST(embedding AS text) FROM shots
+        WHERE embedding IS NOT NULL AND id >= :start {upper}
+        ORDER BY id
+    """), {"start": start, "end": end}).all()
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    matrix = np.array([parse_vector(row[1]) for row in rows], dtype=np.float32)
+    return ids, matrix
+
+
+def fit(db, bounds, n_clusters, epochs, seed):
+    model = MiniBatchKMeans(n_clusters, spherical=settings.vector_metric != "l2", seed=seed)
+    rng = np.random.default_rng(seed)
+    for _ in range(epochs):
+        # Visiting chunks in random order keeps upload order from biasing the centroids
+        for index in rng.permutation(len(bounds)):
+            _, matrix = load_chunk(db, bounds[index])
+            model.partial_fit(matrix)
+    return model
+
+
+def assignment_sizes(db, bounds, model):
+    sizes = np.zeros(len(model.centroids), dtype=np.int64)
+    total_distance = 0.0
+    for chunk in bounds:
+        _, matrix = load_chunk(db, chunk)
+        labels, distances = model.predict(matrix)
+        sizes += np.bincount(labels, minlength=len(sizes))
+        total_distance += float(distances.sum())
+    return sizes, total_distance / max(int(sizes.sum()), 1)
+
+
+def store(db, bounds, model):
+    """Replace all clusters and assignments with those of the fitted model."""
+    db.query(ShotCluster).delete()
+    db.query(Cluster).delete()
+    clusters = [Cluster(size=0, centroid=to_pgvector(c, normalized=False)) for c in model.centroids]
+    db.add_all(clusters)
+    db.flush()
+    cluster_ids = np.array([cluster.id for cluster in clusters], dtype=np.int64)
+
+    sizes = np.zeros(len(clusters), dtype=np.int64)
+    for chunk in bounds:
+        ids, matrix = load_chunk(db, chunk)
+        labels, distances = model.predict(matrix)
+        sizes += np.bincount(labels, minlength=len(sizes))
+        db.bulk_insert_mappings(ShotCluster, [
+            {"shot_id": int(shot_id), "cluster_id": int(cluster_ids[label]), "distance": float(distance)}
+            for shot_id, label, distance in zip(ids, labels, distances)
+        ])
+    for cluster, size in zip(clusters, sizes):
+        cluster.size = int(size)
+    db.commit()
+    return sizes
+
+
+def print_report(k, report, mean_distance):
+    print(f"k={k:>6}  mean distance {mean_distance:.4f}  sizes min {report['min']} "
+          f"p50 {report['p50']:.0f} p95 {report['p95']:.0f} max {report['max']} "
+          f"(imbalance {report['imbalance']:.2f}, {report['empty']} empty)")
+
+
+def run_job(n_clusters, epochs, batch_size, seed, sweep, json_path):
+    db = SessionLocal()
+    try:
+        bounds = chunk_bounds(db, batch_size)
+        if not bounds:
+            print("No embedded shots to cluster.")
+            return {}
+        rows = db.execute(text("SELECT count(*) FROM shots WHERE embedding IS NOT NULL")).scalar()
+        print(f"{rows} embedded shots in {len(bounds)} chunks; "
+              f"the rows/1000 heuristic would use {ivfflat_lists_for(rows)} lists")
+
+        results = {"rows": rows, "sweep": []}
+        for k in sweep:
+            model = fit(db, bounds, k, epochs, seed)
+            sizes, mean_distance = assignment_sizes(db, bounds, model)
+            report = size_report(sizes, rows)
+            results["sweep"].append({"k": k, "mean_distance": mean_distance, **report})
+            print_report(k, report, mean_distance)
+
+        if not sweep:
+            n_clusters = n_clusters or ivfflat_lists_for(rows)
+            start = time.perf_counter()
+            model = fit(db, bounds, n_clusters, epochs, seed)
+            sizes = store(db, bounds, model)
+            report = size_report(sizes, rows)
+            results["stored"] = report
+            print(f"Stored {len(sizes)} clusters in {time.perf_counter() - start:.1f}s")
+            print(json.dumps(report, indent=2))
+
+        if json_path:
+            with open(json_path, "w") as f:
+                json.dump(results, f, indent=2)
+        return results
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clusters", type=int, default=None,
+                        help="Number of clusters (defaults to the IVFFlat rows/1000 heuristic)")
+    parser.add_argument("--epochs", type=int, default=3, help="Passes over the data")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Shots per mini-batch")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--sweep", default="",
+                        help="Comma-separated cluster counts to compare instead of storing")
+    parser.add_argument("--json", dest="json_path", help="Write the report to this file")
+    args = parser.parse_args()
+
+    sweep = [int(k) for k in args.sweep.split(",") if k]
+    run_job(args.clusters, args.epochs, args.batch_size, args.seed, sweep, args.json_path)
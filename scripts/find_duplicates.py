@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate shot detection for CVLR backend.
+Hashes every shot embedding with random hyperplane LSH, verifies shots that
+share a bucket with exact cosine distance, and rewrites the shot_duplicates
+table with the resulting clusters. Reads the embedding snapshot when one
+exists, otherwise streams embeddings from the database.
+"""
+
+import argparse
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.models.duplicate import ShotDuplicate
+from app.search.dedup import find_duplicates
+from app.search.snapshot import EmbeddingSnapshot
+from app.search.vectors import parse_vector
+
+
+def load_embeddings(db, snapshot_path=None, batch_size=5000):
+    """Shot ids and a float32 matrix of their embeddings, from the snapshot or the database."""
+    if snapshot_path and os.path.exists(snapshot_path):
+        snapshot = EmbeddingSnapshot(snapshot_path)
+        return np.asarray(snapshot.ids), snapshot.matrix
+
+    count = db.execute(text("SELECT count(*) FROM shots WHERE embedding IS NOT NULL")).scalar()
+    ids = np.zeros(count, dtype=np.int64)
+    matrix = np.zeros((count, settings.embedding_dim), dtype=np.float32)
+    rows = db.execute(
+        text("SELECT id, CAST(embedding AS text) FROM shots WHERE embedding IS NOT NULL ORDER BY id"),
+        execution_options={"yield_per": batch_size}
+    )
+    filled = 0
+    for shot_id, embedding in rows:
+        if filled == count:
+            break
+        ids[filled] = shot_id
+        matrix[filled] = parse_vector(embedding)
+        filled += 1
+    return ids[:filled], matrix[:filled]
+
+
+def run_job(threshold, bits, tables, seed, snapshot_path):
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        ids, matrix = load_embeddings(db, snapshot_path)
+        loaded = time.perf_counter()
+        clusters = find_duplicates(ids, matrix, threshold, bits, tables, seed)
+        found = time.perf_counter()
+
+        # Distance of each member to its canonical shot, for auditing the threshold
+        positions = {int(shot_id): i for i, shot_id in enumerate(ids)}
+        records = []
+        for shot_id, canonical_id in clusters.items():
+            a, b = matrix[positions[shot_id]], matrix[positions[canonical_id]]
+            denominator = float(np.linalg.norm(a) * np.linalg.norm(b)) or 1.0
+            records.append({
+                "shot_id": shot_id,
+                "canonical_id": canonical_id,
+                "distance": max(0.0, 1 - float(a @ b) / denominator),
+            })
+
+        db.query(ShotDuplicate).delete()
+        if records:
+            db.bulk_insert_mappings(ShotDuplicate, records)
+        db.commit()
+
+        cluster_count = len(set(clusters.values()))
+        print(f"Scanned {len(ids)} embeddings in {found - loaded:.1f}s (loaded in {loaded - start:.1f}s)")
+        print(f"Found {cluster_count} duplicate clusters covering {len(clusters)} shots")
+        return clusters
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threshold", type=float, default=0.05,
+                        help="Maximum cosine distance between duplicates")
+    parser.add_argument("--bits", type=int, default=16, help="Hyperplanes per hash table")
+    parser.add_argument("--tables", type=int, default=8, help="Number of hash tables")
+    parser.add_argument("--seed", type=int, default=0, help="Hyperplane seed")
+    parser.add_argument("--snapshot", default=settings.snapshot_path,
+                        help="Embedding snapshot to read instead of the database")
+    args = parser.parse_args()
+    run_job(args.threshold, args.bits, args.tables, args.seed, args.snapshot)
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+HTTP load generator for CVLR backend.
+Replays a weighted mix of shot searches (vector, hybrid, tag, fuzzy), shot
+detail, deck edits and tag autocomplete at a target request rate against a
+running API, or against one started here on a local PostgreSQL or SQLite
+database (--serve; PostgreSQL is migrated to head first). Requests are
+scheduled open-loop, so a slow server cannot slow the load down, and
+latency is measured from each request's scheduled start. Reports
+p50/p95/p99, throughput and error rates per endpoint as JSON; --baseline
+compares the run against an earlier report.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import httpx
+import numpy as np
+
+
+QUERIES = [
+    "sunset over water", "close-up of a face", "car chase at night", "crowd in the rain",
+    "wide shot of mountains", "slow motion explosion", "two people talking", "city skyline",
+]
+
+DEFAULT_MIX = {
+    "shots_vector": 30,
+    "shots_hybrid": 10,
+    "shots_tag": 15,
+    "shots_fuzzy": 10,
+    "shot_detail": 20,
+    "deck_edit": 5,
+    "tag_autocomplete": 10,
+}
+
+# These rely on pg_trgm; SQLite answers them with errors, so --serve drops them there
+POSTGRES_ONLY = {"shots_fuzzy", "tag_autocomplete"}
+
+
+class Workload:
+    """Ids and tag names discovered from the API, used to build realistic requests"""
+
+    def __init__(self, shot_ids, tag_slugs, tag_names, deck_id, seed):
+        self.shot_ids = shot_ids or [1]
+        self.tag_slugs = tag_slugs or ["action"]
+        self.tag_names = tag_names or ["action"]
+        self.deck_id = deck_id
+        self.rng = random.Random(seed)
+
+    def request(self, endpoint):
+        """(method, path, params, json body) for one request of the given endpoint"""
+        rng = self.rng
+        if endpoint == "shots_vector":
+            return "GET", "/shots/", {"q": rng.choice(QUERIES), "top_k": 200}, None
+        if endpoint == "shots_hybrid":
+            params = {"q": rng.choice(QUERIES), "tag_slugs": rng.choice(self.tag_slugs)}
+            return "GET", "/shots/", params, None
+        if endpoint == "shots_tag":
+            params = {"tag_slugs": rng.choice(self.tag_slugs), "page": rng.randint(1, 3)}
+            return "GET", "/shots/", params, None
+        if endpoint == "shots_fuzzy":
+            # Misspell a real tag name the way people type into the search box
+            name = rng.choice(self.tag_names).lower()
+            return "GET", "/shots/", {"tag_query": name[:max(3, len(name) - 1)]}, None
+        if endpoint == "shot_detail":
+            return "GET", f"/shots/{rng.choice(self.shot_ids)}", None, None
+        if endpoint == "deck_edit":
+            shot_id = rng.choice(self.shot_ids)
+            if rng.random() < 0.5:
+                return "POST", f"/decks/{self.deck_id}/items", None, {"shot_id": shot_id}
+            return "DELETE", f"/decks/{self.deck_id}/items/{shot_id}", None, None
+        if endpoint == "tag_autocomplete":
+            prefix = rng.choice(self.tag_names)[:rng.randint(2, 4)]
+            return "GET", "/tags/", {"query": prefix, "page_size": 10}, None
+        raise ValueError(f"Unknown endpoint {endpoint}")
+
+
+def parse_mix(spec):
+    """Parse "shots_vector=3,shot_detail=1" into endpoint weights"""
+    if not spec:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise SystemExit(f"Unknown endpoint in --mix: {name} (choose from {', '.join(DEFAULT_MIX)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def discover(client, seed):
+    """Collect shot ids and tags to request, and a deck to edit"""
+    shots = (await client.get("/shots/", params={"page_size": 60})).json().get("items", [])
+    tags = (await client.get("/tags/", params={"page_size": 60})).json().get("items", [])
+    deck = (await client.post("/decks/", json={"user_id": 0, "title": "load test"})).json()
+    return Workload(
+        [shot["id"] for shot in shots],
+        [tag["slug"] for tag in tags],
+        [tag["name"] for tag in tags],
+        deck.get("id"),
+        seed,
+    )
+
+
+async def send(client, workload, endpoint, scheduled, results):
+    method, path, params, body = workload.request(endpoint)
+    record = results.setdefault(endpoint, {"latencies": [], "statuses": {}, "errors": 0})
+    try:
+        response = await client.request(method, path, params=params, json=body)
+        status = str(response.status_code)
+        # 4xx from deck edits (already in / not in the deck) are expected; 5xx and 429 are not
+        if response.status_code >= 500 or response.status_code == 429:
+            record["errors"] += 1
+    except httpx.HTTPError as exc:
+        status = type(exc).__name__
+        record["errors"] += 1
+    record["statuses"][status] = record["statuses"].get(status, 0) + 1
+    # Timed from the scheduled start so queueing in this client counts against the server
+    record["latencies"].append((time.perf_counter() - scheduled) * 1000)
+
+
+async def generate_load(base_url, mix, rate, duration, max_in_flight, timeout, seed):
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        workload = await discover(client, seed)
+        endpoints, weights = list(mix), list(mix.values())
+        rng = random.Random(seed)
+        results, tasks = {}, set()
+        skipped = 0
+
+        start = time.perf_counter()
+        next_at = start
+        while next_at - start < duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            endpoint = rng.choices(endpoints, weights)[0]
+            if len(tasks) >= max_in_flight:
+                # Open loop: never wait for the server to catch up, count the miss instead
+                skipped += 1
+            else:
+                task = asyncio.create_task(send(client, workload, endpoint, next_at, results))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            # Poisson arrivals, like independent users
+            next_at += rng.expovariate(rate)
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+        elapsed = time.perf_counter() - start
+
+    return summarize(results, elapsed, skipped, rate)
+
+
+def summarize(results, elapsed, skipped, rate):
+    report = {"target_rps": rate, "duration_s": round(elapsed, 3), "skipped": skipped, "endpoints": {}}
+    total = errors = 0
+    for endpoint, record in sorted(results.items()):
+        latencies = np.array(record["latencies"])
+        count = len(latencies)
+        total += count
+        errors += record["errors"]
+        report["endpoints"][endpoint] = {
+            "requests": count,
+            "throughput_rps": round(count / elapsed, 3),
+            "error_rate": round(record["errors"] / count, 4) if count else 0.0,
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3) if count else None,
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3) if count else None,
+            "p99_ms": round(float(np.percentile(latencies, 99)), 3) if count else None,
+            "statuses": record["statuses"],
+        }
+    report["requests"] = total
+    report["throughput_rps"] = round(total / elapsed, 3) if elapsed else 0.0
+    report["error_rate"] = round(errors / total, 4) if total else 0.0
+    return report
+
+
+def compare(report, baseline, tolerance):
+    """Regressions against a baseline report: p95 or error rate more than tolerance worse"""
+    regressions = []
+    for endpoint, current in report["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(endpoint)
+        if not before or current["p95_ms"] is None or before["p95_ms"] is None:
+            continue
+        if current["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{endpoint}: p95 {before['p95_ms']:.1f} -> {current['p95_ms']:.1f} ms")
+        if current["error_rate"] > before["error_rate"] + tolerance / 10:
+            regressions.append(f"{endpoint}: error rate {before['error_rate']:.2%} -> {current['error_rate']:.2%}")
+    return regressions
+
+
+def serve(database_url, port, workers):
+    """Migrate and seed the database and start the API on it; returns the uvicorn process"""
+    env = dict(os.environ, DATABASE_URL=database_url, WARMUP_ENABLED="false")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if database_url.startswith("postgresql"):
+        env.setdefault("EMBEDDER", "mock")
+        # The production schema: vector column, ANN and full-text indexes, change-log
+        # triggers. seed's create_all then leaves the migrated tables alone
+        subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], env=env, cwd=root, check=True)
+    subprocess.run([sys.executable, "-m", "scripts.seed"], env=env, cwd=root, check=True)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        env=env, cwd=root,
+    )
+
+
+def wait_until_ready(base_url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health/ready", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"API at {base_url} did not become ready within {timeout:.0f}s")
+
+
+def print_report(report):
+    print(f"{report['requests']} requests in {report['duration_s']:.1f}s "
+          f"({report['throughput_rps']:.1f} rps, target {report['target_rps']}), "
+          f"error rate {report['error_rate']:.2%}, {report['skipped']} skipped")
+    for endpoint, stats in report["endpoints"].items():
+        print(f"{endpoint:>17}: {stats['requests']:>6} req  p50 {stats['p50_ms']:>8.1f}  "
+              f"p95 {stats['p95_ms']:>8.1f}  p99 {stats['p99_ms']:>8.1f} ms  errors {stats['error_rate']:.2%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="API to load")
+    parser.add_argument("--serve", action="store_true",
+                        help="Seed --database-url and start the API on it at --base-url's port")
+    parser.add_argument("--database-url", default="sqlite:///data/loadtest.db",
+                        help="Database for --serve (PostgreSQL URL or SQLite path)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for --serve")
+    parser.add_argument("--rate", type=float, default=50.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    parser.add_argument("--mix", default="",
+                        help="Endpoint weights, e.g. shots_vector=3,shot_detail=1 (default: all)")
+    parser.add_argument("--max-in-flight", type=int, default=200,
+                        help="Concurrent requests before new ones are skipped")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--json", dest="json_path", help="Write the report to this file")
+    parser.add_argument("--baseline", help="Earlier report; exit 1 if any endpoint regressed")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative p95 increase against --baseline")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    process = None
+    if args.serve:
+        if args.database_url.startswith("sqlite"):
+            os.makedirs("data", exist_ok=True)
+            if not args.mix:
+                mix = {name: weight for name, weight in mix.items() if name not in POSTGRES_ONLY}
+        port = httpx.URL(args.base_url).port or 8000
+        process = serve(args.database_url, port, args.workers)
+    try:
+        wait_until_ready(args.base_url)
+        report = asyncio.run(generate_load(
+            args.base_url, mix, args.rate, args.duration, args.max_in_flight, args.timeout, args.seed
+        ))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Rebuild the ANN index on shots.embedding.
+Run after bulk loads or when switching VECTOR_INDEX_TYPE / VECTOR_METRIC;
+build parameters are re-derived from the current number of embedded shots.
+"""
+
+import argparse
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import text
+
+from app.core.db import engine
+from app.search.ann import INDEX_NAME, INDEX_TYPES, QUANTIZED_INDEX_NAME, create_vector_index
+
+
+def rebuild_index(index_type=None, normalize=False):
+    """Drop and recreate the vector index in a single transaction."""
+    with engine.begin() as connection:
+        if normalize:
+            # Unit vectors let the inner product metric rank exactly like cosine
+            result = connection.execute(text(
+                "UPDATE shots SET embedding = l2_normalize(embedding) WHERE embedding IS NOT NULL"
+            ))
+            print(f"Normalized {result.rowcount} embeddings")
+        statements = create_vector_index(connection, index_type)
+        for ddl in statements:
+            print(f"Built: {ddl}")
+
+        # Report index sizes so quantization savings are visible
+        for name in (INDEX_NAME, QUANTIZED_INDEX_NAME):
+            size = connection.execute(
+                text("SELECT pg_size_pretty(pg_relation_size(to_regclass(:name)))"),
+                {"name": name}
+            ).scalar()
+            if size:
+                print(f"{name}: {size}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--type", choices=INDEX_TYPES, default=None,
+                        help="Index type (defaults to VECTOR_INDEX_TYPE)")
+    parser.add_argument("--normalize", action="store_true",
+                        help="Normalize stored embeddings to unit length first")
+    args = parser.parse_args()
+    rebuild_index(args.type, args.normalize)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+PCA reduction job for CVLR backend.
+Fits a PCA projection over a random sample of shot embeddings, streamed from
+the database in float32 chunks, and reports for each target dimension the
+explained variance and the recall@k and scan time of reduced-space search
+with full-precision re-ranking, measured on sampled embeddings left out of
+the fit. --store DIM projects every embedded shot and stores the result as a
+new embedding model with its own ANN index; GET /shots?model=<name> then
+takes candidates from it and re-ranks them against shots.embedding.
+--extend NAME projects shots embedded since a model was stored.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.models.embedding import EmbeddingModel
+from app.search.ann import INDEX_TYPES, create_model_index
+from app.search.embedding_models import DEFAULT_MODEL, ModelInfo, fill_reduced_embeddings
+from app.search.projection import PCAProjection, StreamingPCA, reduced_search_report
+from app.search.vectors import parse_vectors
+
+
+def stream_embeddings(db, batch_size):
+    """(ids, float32 matrix) chunks of embedded shots in id order."""
+    after = 0
+    while True:
+        rows = db.execute(text("""
+            SELECT id, CAST(embedding AS text) FROM shots
+            WHERE embedding IS NOT NULL AND id > :after
+            ORDER BY id
+            LIMIT :batch_size
+        """), {"after": after, "batch_size": batch_size}).all()
+        if not rows:
+            return
+        after = rows[-1][0]
+        yield np.array([row[0] for row in rows], dtype=np.int64), parse_vectors([row[1] for row in rows])
+
+
+def fit(db, sample, batch_size, eval_rows, seed):
+    """Fit PCA over about `sample` random embeddings and hold up to eval_rows others out for the report."""
+    rows = db.execute(text("SELECT count(*) FROM shots WHERE embedding IS NOT NULL")).scalar() or 0
+    fraction = min(1.0, (sample + eval_rows) / max(rows, 1))
+    # Each sampled row is held out with the same odds, so the held-out rows are
+    # spread over the whole id range rather than taken from the first chunks
+    held_odds = eval_rows / max(sample + eval_rows, 1)
+    rng = np.random.default_rng(seed)
+    pca = StreamingPCA()
+    kept = []
+    kept_rows = 0
+    for _, matrix in stream_embeddings(db, batch_size):
+        chunk = matrix[rng.random(len(matrix)) < fraction]
+        held = rng.random(len(chunk)) < held_odds
+        held[np.flatnonzero(held)[eval_rows - kept_rows:]] = False
+        pca.partial_fit(chunk[~held])
+        if held.any():
+            kept.append(chunk[held])
+            kept_rows += len(kept[-1])
+    held = np.concatenate(kept) if kept else np.zeros((0, 0), dtype=np.float32)
+    return pca, held, rows
+
+
+def report(pca, held, dims, queries, top_k, rerank_factor, seed):
+    rng = np.random.default_rng(seed)
+    query_rows = held[rng.choice(len(held), min(queries, len(held)), replace=False)]
+    results = []
+    for dim in dims:
+        row = reduced_search_report(
+            pca.projection(dim), held, query_rows, top_k, rerank_factor, settings.vector_metric
+        )
+        row["explained_variance"] = round(pca.explained_variance(dim), 4)
+        results.append(row)
+
+    print(f"{'dim':>6} {'variance':>9} {'recall@' + str(top_k):>10} {'scan ms':>9} {'full ms':>9}")
+    for row in results:
+        print(f"{row['dim']:>6} {row['explained_variance']:>9.3f} {row['recall']:>10.3f} "
+              f"{row['scan_ms']:>9.3f} {row['full_scan_ms']:>9.3f}")
+    return results
+
+
+def free_name(db, base):
+    """`base`, or the first of base-v2, base-v3, ... that no model uses yet."""
+    names = {name for (name,) in db.query(EmbeddingModel.name).filter(EmbeddingModel.name.like(f"{base}%"))}
+    version = 1
+    name = base
+    while name in names:
+        version += 1
+        name = f"{base}-v{version}"
+    return name
+
+
+def extend(db, row, batch_size, index_type):
+    """Project shots with no row under the reduced model yet; a model still filling gets its index and is marked ready."""
+    if row.projection is None:
+        raise SystemExit(f"Model {row.name} is not PCA-reduced")
+    model = ModelInfo(row.id, row.name, row.dim, row.status, row.source, PCAProjection.from_bytes(row.projection))
+    written = sum(fill_reduced_embeddings(db, model, batch_size))
+    # A ready model's index already takes in the new rows; rebuilding it would leave
+    # live searches without one until the build finished
+    if row.status != "ready" and db.get_bind().dialect.name == "postgresql":
+        print(f"Built: {create_model_index(db.connection(), row.id, row.dim, index_type)}")
+    row.status = "ready"
+    db.commit()
+    return written
+
+
+def store(db, name, projection, batch_size, index_type):
+    """Project every embedded shot and store the vectors as the new reduced model `name`."""
+    # A new fit changes the reduced space, so it never replaces the rows or projection
+    # of a model searches may be using; it goes live when clients switch to its name
+    if db.query(EmbeddingModel).filter(EmbeddingModel.name == name).first() is not None:
+        raise SystemExit(f"Model {name} already exists; store the new fit under another --name")
+    row = EmbeddingModel(
+        name=name, dim=projection.dim, source=DEFAULT_MODEL, projection=projection.to_bytes(), status="filling"
+    )
+    db.add(row)
+    db.commit()
+    return extend(db, row, batch_size, index_type)
+
+
+def run_extend(name, batch_size, index_type):
+    db = SessionLocal()
+    try:
+        row = db.query(EmbeddingModel).filter(EmbeddingModel.name == name).first()
+        if row is None:
+            raise SystemExit(f"Model {name} does not exist")
+        start = time.perf_counter()
+        written = extend(db, row, batch_size, index_type)
+        print(f"Model {name} ready: {written} shots projected in {time.perf_counter() - start:.1f}s")
+        return written
+    finally:
+        db.close()
+
+
+def run_job(dims, sample, batch_size, eval_rows, queries, top_k, rerank_factor, store_dim, name,
+            index_type, seed, json_path):
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        pca, held, rows = fit(db, sample, batch_size, eval_rows, seed)
+        if not pca.count:
+            print("No embedded shots to fit.")
+            return {}
+        print(f"Fitted {pca.count} of {rows} embeddings in {time.perf_counter() - start:.1f}s")
+
+        results = {"rows": rows, "fitted": pca.count, "dims": []}
+        if dims and len(held) > top_k:
+            results["dims"] = report(pca, held, dims, queries, top_k, rerank_factor, seed)
+
+        if store_dim:
+            name = name or free_name(db, f"{DEFAULT_MODEL}-pca{store_dim}")
+            start = time.perf_counter()
+            written = store(db, name, pca.projection(store_dim), batch_size, index_type)
+            results["stored"] = {"model": name, "dim": store_dim, "rows": written}
+            print(f"Stored {written} reduced embeddings as model {name} in {time.perf_counter() - start:.1f}s")
+
+        if json_path:
+            with open(json_path, "w") as f:
+                json.dump(results, f, indent=2)
+        return results
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dims", default="64,128,256",
+                        help="Comma-separated target dimensions to report on")
+    parser.add_argument("--sample", type=int, default=100000, help="Embeddings the projection is fitted on")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Shots read per chunk")
+    parser.add_argument("--eval-rows", type=int, default=20000,
+                        help="Sampled embeddings held out of the fit and searched in the recall report")
+    parser.add_argument("--queries", type=int, default=200, help="Query vectors in the recall report")
+    parser.add_argument("--top-k", type=int, default=50, help="Neighbours compared per query")
+    parser.add_argument("--rerank-factor", type=int, default=None,
+                        help="Candidates per result re-ranked at full precision (defaults to RERANK_FACTOR)")
+    parser.add_argument("--store", type=int, default=None, help="Store reduced vectors of this dimension")
+    parser.add_argument("--name", default=None,
+                        help="New model name for --store (default: default-pca<dim>, or -v2, -v3, ... if taken)")
+    parser.add_argument("--extend", default=None, metavar="NAME",
+                        help="Project shots embedded since the reduced model NAME was stored, then exit")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=None,
+                        help="ANN index type (defaults to VECTOR_INDEX_TYPE)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--json", dest="json_path", help="Write the report to this file")
+    args = parser.parse_args()
+
+    if args.extend:
+        run_extend(args.extend, args.batch_size, args.index_type)
+        sys.exit(0)
+    dims = [int(dim) for dim in args.dims.split(",") if dim]
+    run_job(dims, args.sample, args.batch_size, args.eval_rows, args.queries, args.top_k,
+            args.rerank_factor or settings.rerank_factor, args.store, args.name, args.index_type,
+            args.seed, args.json_path)
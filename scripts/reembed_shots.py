@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Background re-embedding job for CVLR backend.
+Fills shot_embeddings for a named embedding model side by side with the one
+in use: shots without an embedding under the model are embedded in id-ordered
+batches, each committed on its own, so the job can be throttled, stopped and
+resumed while the API keeps serving the current model. When every shot is
+covered it builds the model's partial ANN index and marks the model ready;
+GET /shots?model=<name> then searches it, and EMBEDDING_MODEL=<name> makes it
+the default.
+"""
+
+import argparse
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.core.db import SessionLocal
+from app.models.embedding import EmbeddingModel
+from app.search.ann import INDEX_TYPES, create_model_index
+from app.search.embedding_models import DEFAULT_MODEL, ModelInfo, embedder_for, fill_embeddings
+
+
+def get_or_create_model(db, name, dim):
+    """The model's row, created in the filling state when it does not exist yet."""
+    row = db.query(EmbeddingModel).filter(EmbeddingModel.name == name).first()
+    if row is None:
+        if dim is None:
+            raise SystemExit(f"Model {name} does not exist yet; pass --dim to create it")
+        row = EmbeddingModel(name=name, dim=dim, status="filling")
+        db.add(row)
+        db.commit()
+        print(f"Created model {name} ({dim} dimensions)")
+    elif dim is not None and dim != row.dim:
+        raise SystemExit(f"Model {name} already exists with {row.dim} dimensions")
+    return row
+
+
+def run_job(name, dim, batch_size, pause, index_type, build_index):
+    if name == DEFAULT_MODEL:
+        raise SystemExit(f"The {DEFAULT_MODEL} model lives in shots.embedding and is not re-embedded here")
+    db = SessionLocal()
+    try:
+        row = get_or_create_model(db, name, dim)
+        if row.projection is not None:
+            raise SystemExit(f"Model {name} is PCA-reduced; catch it up with scripts.reduce_embeddings --extend {name}")
+        model = ModelInfo(row.id, row.name, row.dim, row.status)
+        embedder = embedder_for(model)
+
+        start = time.perf_counter()
+        written = 0
+        for count in fill_embeddings(db, model, embedder, batch_size):
+            written += count
+            print(f"{written} shots embedded ({written / (time.perf_counter() - start):.0f}/s)")
+            # Leaves headroom for the API on the same database
+            if pause:
+                time.sleep(pause)
+
+        if build_index and db.get_bind().dialect.name == "postgresql":
+            ddl = create_model_index(db.connection(), model.id, model.dim, index_type)
+            print(f"Built: {ddl}")
+        row.status = "ready"
+        db.commit()
+        print(f"Model {name} ready: {written} shots embedded in {time.perf_counter() - start:.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", required=True, help="Embedding model name")
+    parser.add_argument("--dim", type=int, default=None,
+                        help="Vector dimension, required when the model is created")
+    parser.add_argument("--batch-size", type=int, default=256, help="Shots embedded per commit")
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=None,
+                        help="ANN index type (defaults to VECTOR_INDEX_TYPE)")
+    parser.add_argument("--no-index", action="store_true", help="Skip building the ANN index")
+    args = parser.parse_args()
+    run_job(args.model, args.dim, args.batch_size, args.pause, args.index_type, not args.no_index)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Shot segmentation job for CVLR backend.
+Decodes videos whose src_url is a local file, detects shot boundaries from
+colour histograms and frame differences, and bulk-inserts the shots. Videos
+are segmented in parallel, one worker process each. By default every video
+without shots is processed; videos that already have shots are skipped.
+"""
+
+import argparse
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import exists
+
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.ingest.segmentation import DECODERS, ingest_videos
+from app.models import Shot, Video
+
+
+def local_path(src_url):
+    return src_url[len("file://"):] if src_url.startswith("file://") else src_url
+
+
+def run_job(video_ids, decoder, workers, fps, threshold, min_shot_ms):
+    db = SessionLocal()
+    try:
+        query = db.query(Video.id, Video.src_url).filter(~exists().where(Shot.video_id == Video.id))
+        if video_ids:
+            query = query.filter(Video.id.in_(video_ids))
+        videos = [(video_id, local_path(src_url)) for video_id, src_url in query.order_by(Video.id)]
+        missing = [video_id for video_id, path in videos if not os.path.exists(path)]
+        videos = [(video_id, path) for video_id, path in videos if video_id not in missing]
+        if missing:
+            print(f"Skipping {len(missing)} videos whose source is not a local file: {missing}")
+        if not videos:
+            print("No videos to segment.")
+            return {}
+
+        start = time.perf_counter()
+        results = ingest_videos(
+            db, videos, decoder, workers, fps=fps, threshold=threshold, min_shot_ms=min_shot_ms
+        )
+        for video_id, result in sorted(results.items()):
+            if isinstance(result, Exception):
+                print(f"video {video_id}: failed ({type(result).__name__}: {result})")
+            else:
+                print(f"video {video_id}: {result} shots")
+        print(f"Segmented {len(videos)} videos in {time.perf_counter() - start:.1f}s")
+        return results
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--video-ids", default="", help="Comma-separated video ids (default: all without shots)")
+    parser.add_argument("--decoder", choices=sorted(DECODERS), default="ffmpeg", help="Frame decoder")
+    parser.add_argument("--workers", type=int, default=settings.segment_workers, help="Worker processes")
+    parser.add_argument("--fps", type=float, default=settings.segment_fps, help="Frames analysed per second")
+    parser.add_argument("--threshold", type=float, default=settings.segment_threshold, help="Cut score threshold")
+    parser.add_argument("--min-shot-ms", type=int, default=settings.segment_min_shot_ms, help="Shortest shot")
+    args = parser.parse_args()
+
+    video_ids = [int(video_id) for video_id in args.video_ids.split(",") if video_id]
+    run_job(video_ids, args.decoder, args.workers, args.fps, args.threshold, args.min_shot_ms)
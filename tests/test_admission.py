@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core.admission import AdmissionController, AdmissionRejected, SearchBudget, search_admission
+
+
+def _budget(priority="interactive", seconds=1.0):
+    return SearchBudget(priority, time.monotonic() + seconds)
+
+
+def test_waiters_are_admitted_interactive_first():
+    controller = AdmissionController(max_concurrency=1, max_queue=10, batch_max_concurrency=1)
+    order = []
+
+    async def run(name, priority):
+        async with controller.admit(_budget(priority)):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        first = asyncio.ensure_future(run("first", "interactive"))
+        await asyncio.sleep(0)
+        batch = asyncio.ensure_future(run("batch", "batch"))
+        await asyncio.sleep(0)
+        interactive = asyncio.ensure_future(run("interactive", "interactive"))
+        await asyncio.gather(first, batch, interactive)
+
+    asyncio.run(main())
+    assert order == ["first", "interactive", "batch"]
+    assert controller.stats()["admitted"] == 3
+    assert controller.stats()["active"] == {"interactive": 0, "batch": 0}
+
+
+def test_batch_class_has_its_own_cap():
+    controller = AdmissionController(max_concurrency=4, max_queue=10, batch_max_concurrency=1)
+    peak = {"batch": 0, "running": 0}
+
+    async def run(priority):
+        async with controller.admit(_budget(priority)):
+            peak["running"] += 1
+            peak["batch"] = max(peak["batch"], controller.stats()["active"]["batch"])
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*(run("batch") for _ in range(3)), run("interactive"))
+
+    asyncio.run(main())
+    assert peak == {"batch": 1, "running": 4}
+
+
+def test_full_queue_sheds_with_retry_after():
+    controller = AdmissionController(max_concurrency=1, max_queue=1, batch_max_concurrency=1)
+
+    async def hold():
+        async with controller.admit(_budget()):
+            await asyncio.sleep(0.05)
+
+    async def main():
+        running = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        queued = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        results = await asyncio.gather(
+            controller.admit(_budget("interactive")).__aenter__(),
+            controller.admit(_budget("batch")).__aenter__(),
+            return_exceptions=True
+        )
+        await asyncio.gather(running, queued)
+        return results
+
+    interactive, batch = asyncio.run(main())
+    assert isinstance(interactive, AdmissionRejected) and interactive.status_code == 503
+    assert isinstance(batch, AdmissionRejected) and batch.status_code == 429
+    assert "Retry-After" in interactive.headers
+    assert controller.stats()["shed"] == 2
+
+
+def test_queued_request_expires_at_its_deadline():
+    controller = AdmissionController(max_concurrency=1, max_queue=10, batch_max_concurrency=1)
+
+    async def hold():
+        async with controller.admit(_budget()):
+            await asyncio.sleep(0.1)
+
+    async def main():
+        running = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as exc:
+            async with controller.admit(_budget(seconds=0.01)):
+                pass
+        await running
+        return exc.value
+
+    rejected = asyncio.run(main())
+    assert rejected.status_code == 503
+    stats = controller.stats()
+    assert stats["expired"] == 1
+    assert stats["queued"] == {"interactive": 0, "batch": 0}
+    assert stats["active"] == {"interactive": 0, "batch": 0}
+
+
+def test_admission_stats_exposed_to_admins(monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    response = TestClient(app).get("/admin/stats", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json()["search_admission"]["active"] == search_admission.stats()["active"]
+
+
+def test_abandoned_waiters_leave_the_queue():
+    controller = AdmissionController(max_concurrency=1, max_queue=1, batch_max_concurrency=1)
+
+    async def hold():
+        async with controller.admit(_budget()):
+            await asyncio.sleep(0.05)
+
+    async def main():
+        running = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(controller.admit(_budget()).__aenter__())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        # The cancelled waiter's place in the queue is free again
+        assert controller.stats()["queued"]["interactive"] == 0
+        async with controller.admit(_budget()):
+            pass
+        await running
+
+    asyncio.run(main())
+    assert controller.stats()["shed"] == 0
+
+
+def test_negative_request_timeout_is_rejected():
+    response = TestClient(app).get("/shots/", params={"q": "storm"}, headers={"X-Request-Timeout-Ms": "-5"})
+    assert response.status_code == 422
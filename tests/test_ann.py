@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.search.ann import (
+    INDEX_NAME, QUANTIZED_INDEX_NAME, distance_sql, hnsw_params_for, index_ddl,
+    ivfflat_lists_for, quantized_index_ddl
+)
+from app.search.queries import nearest_shots_sql
+from app.search.vectors import parse_vector, to_pgvector
+
+
+def test_ivfflat_lists_scale_with_rows():
+    assert ivfflat_lists_for(0) == 1
+    assert ivfflat_lists_for(150_000) == 150
+    assert ivfflat_lists_for(1_000_000) == 1000
+    assert ivfflat_lists_for(4_000_000) == 2000
+
+
+def test_hnsw_params_grow_for_large_tables():
+    assert hnsw_params_for(10_000) == (16, 64)
+    assert hnsw_params_for(5_000_000) == (32, 128)
+
+
+def test_index_ddl_uses_settings_overrides(monkeypatch):
+    monkeypatch.setattr(settings, "ivfflat_lists", 42)
+    ddl = index_ddl("ivfflat", 1_000_000)
+    assert ddl.startswith(f"CREATE INDEX {INDEX_NAME} ON shots USING ivfflat")
+    assert "lists = 42" in ddl
+
+    monkeypatch.setattr(settings, "hnsw_m", 24)
+    ddl = index_ddl("hnsw", 1000)
+    assert "USING hnsw" in ddl
+    assert "m = 24, ef_construction = 64" in ddl
+
+
+def test_index_ddl_rejects_unknown_type():
+    with pytest.raises(ValueError):
+        index_ddl("flat", 10)
+
+
+@pytest.mark.parametrize("metric,operator,opclass", [
+    ("cosine", "<=>", "vector_cosine_ops"),
+    ("l2", "<->", "vector_l2_ops"),
+    ("ip", "<#>", "vector_ip_ops"),
+])
+def test_metric_drives_operator_and_opclass(monkeypatch, metric, operator, opclass):
+    monkeypatch.setattr(settings, "vector_metric", metric)
+    assert distance_sql("embedding", ":q") == f"embedding {operator} :q"
+    assert f"(embedding {opclass})" in index_ddl("hnsw", 1000)
+
+
+def test_to_pgvector_normalizes_when_configured(monkeypatch):
+    assert to_pgvector([3.0, 4.0]) == "[3.0,4.0]"
+    monkeypatch.setattr(settings, "normalize_embeddings", True)
+    vector = parse_vector(to_pgvector("[3,4]"))
+    assert np.allclose(vector, [0.6, 0.8])
+
+
+def test_quantized_index_matches_search_expression(monkeypatch):
+    monkeypatch.setattr(settings, "vector_quantization", "binary")
+    ddl = quantized_index_ddl("hnsw", 1000)
+    assert ddl.startswith(f"CREATE INDEX {QUANTIZED_INDEX_NAME}")
+    assert "bit_hamming_ops" in ddl
+
+    sql = nearest_shots_sql("s.id", ":query_vector")
+    indexed_expression = "CAST(binary_quantize(CAST(s.embedding AS vector)) AS bit(768))"
+    assert f"ORDER BY {indexed_expression} <~>" in sql
+    # Candidates are re-ranked on the full-precision column
+    assert "LIMIT :top_k * 4" in sql
+    assert sql.rstrip().endswith("ORDER BY s.embedding <=> :query_vector\n        LIMIT :top_k")
+
+
+def test_halfvec_uses_metric_opclass(monkeypatch):
+    monkeypatch.setattr(settings, "vector_quantization", "halfvec")
+    monkeypatch.setattr(settings, "vector_metric", "l2")
+    assert "((CAST(embedding AS halfvec(768))) halfvec_l2_ops)" in quantized_index_ddl("ivfflat", 1000)
+    assert "CAST(s.embedding AS halfvec(768)) <-> CAST(:q AS halfvec(768))" in nearest_shots_sql("s.id", ":q")
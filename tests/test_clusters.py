@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.main import app
+from app.core.db import get_db
+from app.models import Base, Video, Shot, Cluster, ShotCluster
+from app.search.clustering import MiniBatchKMeans, size_report
+
+
+# Test database
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        video = Video(title="Test Video", src_url="https://example.com/test.mp4")
+        db.add(video)
+        db.commit()
+        db.add_all([Shot(video_id=video.id, t_start_ms=i, t_end_ms=i + 1) for i in range(8)])
+        db.add_all([Cluster(size=5, centroid="[1,0]"), Cluster(size=3, centroid="[0,1]")])
+        db.commit()
+        # Shots 1-5 in cluster 1 (shot 4 most typical), shots 6-8 in cluster 2
+        distances = [0.3, 0.2, 0.5, 0.1, 0.4, 0.2, 0.1, 0.3]
+        db.add_all([
+            ShotCluster(shot_id=i + 1, cluster_id=1 if i < 5 else 2, distance=distance)
+            for i, distance in enumerate(distances)
+        ])
+        db.commit()
+    finally:
+        db.close()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def _blobs(seed=0):
+    rng = np.random.default_rng(seed)
+    centers = np.eye(4, 16, dtype=np.float32) * 10
+    labels = rng.integers(0, 4, size=2000)
+    return centers[labels] + rng.normal(scale=0.5, size=(2000, 16)).astype(np.float32), labels
+
+
+def test_minibatch_kmeans_recovers_blobs_from_chunks():
+    matrix, truth = _blobs()
+    model = MiniBatchKMeans(4, spherical=False, seed=1)
+    for _ in range(3):
+        for start in range(0, len(matrix), 250):
+            model.partial_fit(matrix[start:start + 250])
+    labels, distances = model.predict(matrix)
+    # Every true blob maps onto exactly one cluster
+    for blob in range(4):
+        assert len(np.unique(labels[truth == blob])) == 1
+    assert len(np.unique(labels)) == 4
+    assert distances.mean() < 3
+
+
+def test_size_report():
+    report = size_report(np.array([10, 0, 30, 20]))
+    assert report["rows"] == 60
+    assert report["empty"] == 1
+    assert report["max"] == 30
+    assert report["imbalance"] == 2.0
+
+
+def test_list_clusters_with_samples():
+    response = client.get("/clusters/", params={"samples": 2})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 2
+    assert [cluster["size"] for cluster in data["items"]] == [5, 3]
+    assert [shot["id"] for shot in data["items"][0]["sample_shots"]] == [4, 2]
+    assert [shot["id"] for shot in data["items"][1]["sample_shots"]] == [7, 6]
+
+
+def test_cluster_shots_most_typical_first():
+    response = client.get("/clusters/1/shots", params={"page_size": 3})
+    assert response.status_code == 200
+    data = response.json()
+    assert [shot["id"] for shot in data["items"]] == [4, 2, 1]
+    assert data["total"] == 5 and data["pages"] == 2
+    assert data["items"][0]["video_title"] == "Test Video"
+
+    assert client.get("/clusters/99/shots").status_code == 404
@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
@@ -6,7 +7,10 @@ from sqlalchemy.pool import StaticPool
 
 from app.main import app
 from app.core.db import get_db
-from app.models import Base, Video, Shot
+from app.models import Base, Video, Shot, Deck, DeckItem
+from app.search import recommend
+from app.search.recommend import deck_centroids
+from app.search.vectors import parse_vector
 
 
 # Test database
@@ -28,13 +32,12 @@ def override_get_db():
         db.close()
 
 
-app.dependency_overrides[get_db] = override_get_db
-
 client = TestClient(app)
 
 
 @pytest.fixture(autouse=True)
 def setup_database():
+    app.dependency_overrides[get_db] = override_get_db
     Base.metadata.create_all(bind=engine)
     
     # Create test data
@@ -133,3 +136,97 @@ def test_get_deck_detail():
     data = response.json()
     assert data["title"] == "Test Deck"
     assert len(data["items"]) == 1
+
+
+def test_membership_changes_bump_deck_version():
+    deck_id = client.post("/decks/", json={"user_id": 1, "title": "Test Deck"}).json()["id"]
+    db = TestingSessionLocal()
+    try:
+        version = lambda: db.query(Deck.version).filter(Deck.id == deck_id).scalar()
+        assert version() == 1
+        client.post(f"/decks/{deck_id}/items", json={"shot_id": 1})
+        assert version() == 2
+        client.delete(f"/decks/{deck_id}/items/1")
+        assert version() == 3
+    finally:
+        db.close()
+
+
+def test_deck_centroids_single_and_per_theme():
+    db = TestingSessionLocal()
+    try:
+        db.add(Deck(id=7, user_id=1, title="Themes"))
+        vectors = [[1.0, 0.0], [0.9, 0.1], [0.0, 1.0], [0.1, 0.9]]
+        for i, vector in enumerate(vectors):
+            shot = Shot(video_id=1, t_start_ms=i, t_end_ms=i + 1, embedding=vector)
+            db.add(shot)
+            db.flush()
+            db.add(DeckItem(deck_id=7, shot_id=shot.id, sort_order=i))
+        db.commit()
+
+        centroids, members = deck_centroids(db, 7)
+        assert members == 4
+        assert np.allclose(parse_vector(centroids[0]), [0.5, 0.5])
+
+        centroids, _ = deck_centroids(db, 7, 2)
+        themes = sorted(tuple(np.round(parse_vector(c), 1)) for c in centroids)
+        assert themes[0][0] < 0.2 < themes[1][0]
+    finally:
+        db.close()
+
+
+def test_recommendations_exclude_members_and_cache_centroids(monkeypatch):
+    deck_id = client.post("/decks/", json={"user_id": 1, "title": "Test Deck"}).json()["id"]
+    db = TestingSessionLocal()
+    try:
+        db.query(Shot).filter(Shot.id == 1).update({Shot.embedding: "[1,0]"})
+        db.add_all([Shot(video_id=1, t_start_ms=i, t_end_ms=i + 1, embedding="[0,1]") for i in range(3)])
+        db.commit()
+    finally:
+        db.close()
+    client.post(f"/decks/{deck_id}/items", json={"shot_id": 1})
+
+    searches = []
+
+    def fake_nearest(db, centroids, top_k):
+        # Stands in for the pgvector LATERAL query: shot 1 (a member) ranks first
+        searches.append((centroids, top_k))
+        return [[(1, 0.0), (3, 0.1), (2, 0.2), (4, 0.3)] for _ in centroids]
+
+    monkeypatch.setattr(recommend, "batch_nearest_shots", fake_nearest)
+    misses = recommend.centroid_cache.misses
+
+    response = client.get(f"/decks/{deck_id}/recommendations", params={"top_k": 2})
+    assert response.status_code == 200
+    assert [shot["id"] for shot in response.json()] == [3, 2]
+    assert searches[0][1] == 3
+
+    client.get(f"/decks/{deck_id}/recommendations", params={"top_k": 2})
+    assert recommend.centroid_cache.misses == misses + 1
+
+    # Changing the deck changes its version, so the centroid is recomputed
+    client.post(f"/decks/{deck_id}/items", json={"shot_id": 2})
+    client.get(f"/decks/{deck_id}/recommendations", params={"top_k": 2})
+    assert recommend.centroid_cache.misses == misses + 2
+
+    assert client.get("/decks/999/recommendations").status_code == 404
+
+
+def test_centroids_are_dropped_when_a_member_changes():
+    cache = recommend.CentroidCache(8)
+    cache.put((1, 1, 1), ["[1,0]"], 2, {10, 11})
+    cache.put((2, 1, 1), ["[0,1]"], 1, {20})
+
+    cache.invalidate([11, 99])
+    assert cache.get((1, 1, 1)) is None
+    assert cache.get((2, 1, 1)) == (["[0,1]"], 1)
+
+    # Centroids read before the invalidation are not stored
+    generation = cache.generation
+    cache.invalidate([20])
+    cache.put((1, 1, 1), ["[1,0]"], 2, {10, 11}, generation)
+    assert cache.get((1, 1, 1)) is None
+
+    cache.put((1, 1, 1), ["[1,0]"], 2, {10, 11})
+    cache.invalidate(None)
+    assert cache.stats()["decks"] == 0
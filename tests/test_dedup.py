@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.main import app
+from app.core.db import get_db
+from app.models import Base, Video, Shot, ShotDuplicate
+from app.search.dedup import (
+    candidate_pairs, collapse_duplicate_ids, find_duplicates, lsh_signatures, random_hyperplanes
+)
+
+
+# Test database
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        video = Video(title="Test Video", src_url="https://example.com/test.mp4")
+        db.add(video)
+        db.commit()
+        db.add_all([Shot(video_id=video.id, t_start_ms=i, t_end_ms=i + 1) for i in range(6)])
+        db.commit()
+        # Shots 2 and 5 are re-uploads of shot 1
+        db.add_all([
+            ShotDuplicate(shot_id=1, canonical_id=1, distance=0.0),
+            ShotDuplicate(shot_id=2, canonical_id=1, distance=0.01),
+            ShotDuplicate(shot_id=5, canonical_id=1, distance=0.02),
+        ])
+        db.commit()
+    finally:
+        db.close()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def _catalog(seed=0):
+    rng = np.random.default_rng(seed)
+    originals = rng.normal(size=(300, 64)).astype(np.float32)
+    # Three re-uploads of shot 10 and one of shot 20, slightly perturbed
+    copies = [originals[10] + rng.normal(scale=0.01, size=64) for _ in range(3)]
+    copies.append(originals[20] + rng.normal(scale=0.01, size=64))
+    matrix = np.vstack([originals, np.array(copies, dtype=np.float32)])
+    ids = np.arange(1, len(matrix) + 1)
+    return ids, matrix
+
+
+def test_lsh_finds_planted_duplicates_only():
+    ids, matrix = _catalog()
+    clusters = find_duplicates(ids, matrix, threshold=0.05)
+    assert clusters == {11: 11, 301: 11, 302: 11, 303: 11, 21: 21, 304: 21}
+
+
+def test_similar_vectors_share_buckets():
+    ids, matrix = _catalog()
+    planes = random_hyperplanes(matrix.shape[1], 16, 8)
+    signatures = lsh_signatures(matrix, planes)
+    assert (signatures[10] == signatures[300]).sum() >= 1
+    pairs = {tuple(pair) for pair in candidate_pairs(signatures)}
+    assert (10, 300) in pairs
+    # Buckets prune almost all of the ~46k possible pairs
+    assert len(pairs) < 2000
+
+
+def test_collapse_keeps_best_ranked_member():
+    db = TestingSessionLocal()
+    try:
+        assert collapse_duplicate_ids(db, [5, 3, 1, 2, 4]) == [5, 3, 4]
+        assert collapse_duplicate_ids(db, [2, 3, 5, 6], exclude_cluster_of=1) == [3, 6]
+    finally:
+        db.close()
+
+
+def test_listing_collapses_duplicates():
+    ids = [item["id"] for item in client.get("/shots/").json()["items"]]
+    assert ids == [1, 2, 3, 4, 5, 6]
+    response = client.get("/shots/", params={"collapse_duplicates": True})
+    assert [item["id"] for item in response.json()["items"]] == [1, 3, 4, 6]
+    assert response.json()["total"] == 4
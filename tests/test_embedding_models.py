@@ -0,0 +1,230 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.main import app
+from app.core.db import get_db
+from app.models import Base, Video, Shot, EmbeddingModel, ShotEmbedding
+from app.search.embedder import Embedder
+from app.search.embedding_models import (
+    DEFAULT_MODEL, EmbeddingModelRegistry, ModelInfo, fill_embeddings, fill_reduced_embeddings
+)
+from app.search.projection import PCAProjection, StreamingPCA, reduced_search_report
+from app.search.queries import nearest_shots_sql, reduced_vector_params
+
+
+# Test database
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+
+client = TestClient(app)
+
+
+class ThumbEmbedder(Embedder):
+    """Deterministic vectors; shots without a thumbnail are left unembedded"""
+
+    def __init__(self, dim):
+        self.dim = dim
+
+    def embed(self, text):
+        return [float(len(text))] * self.dim
+
+    def embed_shots(self, thumb_urls):
+        return [self.embed(url) if url else None for url in thumb_urls]
+
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        video = Video(title="Test Video", src_url="https://example.com/test.mp4")
+        db.add(video)
+        db.commit()
+        db.add_all([
+            Shot(video_id=video.id, t_start_ms=i, t_end_ms=i + 1, thumb_url=None if i == 3 else f"t{i}.jpg")
+            for i in range(7)
+        ])
+        db.add(EmbeddingModel(name="small", dim=4, status="filling"))
+        db.commit()
+    finally:
+        db.close()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def test_fill_embeddings_writes_missing_rows_and_resumes():
+    db = TestingSessionLocal()
+    try:
+        model = ModelInfo(1, "small", 4, "filling")
+        # A row written by an earlier, interrupted run is kept as is
+        db.add(ShotEmbedding(model_id=1, shot_id=2, embedding=[9.0] * 4))
+        db.commit()
+
+        embedder = ThumbEmbedder(4)
+        assert list(fill_embeddings(db, model, embedder, batch_size=2)) == [2, 1, 2]
+        rows = dict(db.query(ShotEmbedding.shot_id, ShotEmbedding.embedding).all())
+        # Shot 4 has no thumbnail and stays unembedded
+        assert sorted(rows) == [1, 2, 3, 5, 6, 7]
+        assert rows[2] == "[9.0,9.0,9.0,9.0]"
+
+        # A second run only retries the shot that still has nothing to embed
+        assert list(fill_embeddings(db, model, embedder, batch_size=2)) == [0]
+    finally:
+        db.close()
+
+
+def test_fill_embeddings_rejects_wrong_dimension():
+    db = TestingSessionLocal()
+    try:
+        with pytest.raises(ValueError):
+            list(fill_embeddings(db, ModelInfo(1, "small", 4, "filling"), ThumbEmbedder(8)))
+        assert db.query(ShotEmbedding).count() == 0
+    finally:
+        db.close()
+
+
+def test_registry_resolves_models_by_name():
+    registry = EmbeddingModelRegistry(ttl=60)
+    db = TestingSessionLocal()
+    try:
+        assert registry.get(db, DEFAULT_MODEL).in_shots_column
+        assert registry.get(db, "missing") is None
+        small = registry.get(db, "small")
+        assert (small.id, small.dim, small.in_shots_column) == (1, 4, False)
+        # Still filling, so not cached
+        assert registry.get(db, "small") == small
+        assert registry.stats()["hits"] == 0
+
+        db.query(EmbeddingModel).update({EmbeddingModel.status: "ready"})
+        db.commit()
+        assert registry.get(db, "small").status == "ready"
+        registry.get(db, "small")
+        assert registry.stats()["hits"] == 1
+    finally:
+        db.close()
+
+
+def test_model_search_uses_its_partial_index_form():
+    sql = nearest_shots_sql("s.id", ":query_vector", model=ModelInfo(1, "small", 4, "ready"))
+    assert "e.model_id = 1" in sql
+    assert "CAST(e.embedding AS vector(4))" in sql
+    assert "s.embedding" not in sql
+
+
+def test_list_shots_rejects_unknown_and_unfinished_models():
+    response = client.get("/shots/", params={"q": "sunset", "model": "missing"})
+    assert response.status_code == 400
+    assert "missing" in response.json()["detail"]
+    # Searching a model that is still filling would return partial results
+    assert client.get("/shots/", params={"q": "sunset", "model": "small"}).status_code == 409
+
+    db = TestingSessionLocal()
+    try:
+        db.query(EmbeddingModel).filter(EmbeddingModel.name == "small").update({EmbeddingModel.status: "ready"})
+        db.commit()
+    finally:
+        db.close()
+    assert client.get("/shots/", params={"q": "sunset", "model": "small"}).status_code == 200
+
+
+def test_streaming_pca_matches_full_decomposition():
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(size=(600, 5)) @ rng.normal(size=(5, 12)) + rng.normal(size=12)
+    pca = StreamingPCA()
+    for chunk in np.array_split(matrix, 7):
+        pca.partial_fit(chunk)
+    # Five latent directions hold all of the variance
+    assert pca.explained_variance(5) == pytest.approx(1.0, abs=1e-4)
+
+    centered = matrix - matrix.mean(axis=0)
+    _, singular, _ = np.linalg.svd(centered, full_matrices=False)
+    projected = pca.projection(2).transform(matrix)
+    assert np.allclose(projected.var(axis=0) * len(matrix), singular[:2] ** 2, rtol=1e-3)
+
+    restored = PCAProjection.from_bytes(pca.projection(3).to_bytes())
+    assert (restored.dim, restored.source_dim) == (3, 12)
+    assert np.allclose(restored.transform(matrix[:4]), pca.projection(3).transform(matrix[:4]), atol=1e-4)
+
+
+def test_reduced_search_recall_grows_with_dimension():
+    rng = np.random.default_rng(1)
+    matrix = rng.normal(size=(800, 8)) @ rng.normal(size=(8, 32)) + 0.05 * rng.normal(size=(800, 32))
+    pca = StreamingPCA().partial_fit(matrix)
+    low = reduced_search_report(pca.projection(2), matrix, matrix[:20], top_k=10)
+    full = reduced_search_report(pca.projection(8), matrix, matrix[:20], top_k=10)
+    assert low["recall"] < full["recall"]
+    assert full["recall"] > 0.95
+
+
+def test_reduced_model_reranks_on_full_embeddings():
+    projection = PCAProjection(np.zeros(4), np.eye(4)[:2])
+    model = ModelInfo(3, "default-pca2", 2, "ready", DEFAULT_MODEL, projection)
+    sql = nearest_shots_sql("s.id", ":query_vector", model=model)
+    assert "CAST(e.embedding AS vector(2))" in sql and ":reduced_vector" in sql
+    assert "ORDER BY s.embedding" in sql
+    assert reduced_vector_params([1.0, 2.0, 3.0, 4.0], model) == {"reduced_vector": "[1.0,2.0]"}
+
+
+def test_registry_loads_stored_projection():
+    db = TestingSessionLocal()
+    try:
+        projection = PCAProjection(np.ones(4), np.eye(4)[:2])
+        db.add(EmbeddingModel(
+            name="default-pca2", dim=2, status="ready", source=DEFAULT_MODEL, projection=projection.to_bytes()
+        ))
+        db.commit()
+        model = EmbeddingModelRegistry(ttl=60).get(db, "default-pca2")
+        assert model.reduced
+        assert model.projection.transform([2.0, 3.0, 0.0, 0.0]).tolist() == [1.0, 2.0]
+    finally:
+        db.close()
+
+
+def test_fill_reduced_embeddings_projects_new_shots_only():
+    db = TestingSessionLocal()
+    try:
+        for shot in db.query(Shot).filter(Shot.id <= 4):
+            shot.embedding = [float(shot.id), 1.0, 0.0, 0.0]
+        db.commit()
+        projection = PCAProjection(np.zeros(4), np.eye(4)[:2])
+        db.add(EmbeddingModel(
+            name="default-pca2", dim=2, status="ready", source=DEFAULT_MODEL, projection=projection.to_bytes()
+        ))
+        db.commit()
+        model = EmbeddingModelRegistry(ttl=60).get(db, "default-pca2")
+
+        assert list(fill_reduced_embeddings(db, model, batch_size=3)) == [3, 1]
+        # Shots embedded after the model was stored are picked up by the next run
+        db.query(Shot).filter(Shot.id == 6).update({Shot.embedding: "[6,1,0,0]"})
+        db.commit()
+        assert list(fill_reduced_embeddings(db, model)) == [1]
+        rows = dict(
+            db.query(ShotEmbedding.shot_id, ShotEmbedding.embedding).filter(ShotEmbedding.model_id == model.id)
+        )
+        assert sorted(rows) == [1, 2, 3, 4, 6]
+        assert rows[6] == "[6.0,1.0]"
+
+        with pytest.raises(ValueError):
+            list(fill_reduced_embeddings(db, ModelInfo(1, "small", 4, "filling")))
+    finally:
+        db.close()
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.invalidation import InvalidationRegistry
+from app.core.outbox import ChangeLogConsumer
+from app.models import Base, ChangeLog
+from app.search.timeline import TimelineCache
+
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def write_changes(*changes):
+    db = TestingSessionLocal()
+    try:
+        db.add_all([ChangeLog(op="insert", **change) for change in changes])
+        db.commit()
+    finally:
+        db.close()
+
+
+def recording_registry():
+    registry, published = InvalidationRegistry(), []
+    for topic in ("shots", "videos", "tags"):
+        registry.subscribe(topic, lambda ids, topic=topic: published.append((topic, ids)))
+    return registry, published
+
+
+def test_consumer_starts_at_the_current_end():
+    write_changes({"entity": "tag", "tag_id": 1})
+    registry, published = recording_registry()
+    consumer = ChangeLogConsumer(TestingSessionLocal, registry)
+    assert consumer.poll() == 0
+    assert consumer.poll() == 0
+    assert published == []
+
+
+def test_batch_is_published_once_per_topic():
+    registry, published = recording_registry()
+    consumer = ChangeLogConsumer(TestingSessionLocal, registry, batch_size=100)
+    consumer.poll()
+    write_changes(
+        {"entity": "shot", "shot_id": 1, "video_id": 7},
+        {"entity": "shot", "shot_id": 2, "video_id": 7},
+        {"entity": "shot_tag", "shot_id": 1, "tag_id": 3},
+        {"entity": "tag", "tag_id": 4},
+    )
+    assert consumer.poll() == 4
+    assert sorted(published) == [
+        ("shots", frozenset({1, 2})), ("tags", frozenset({3, 4})), ("videos", frozenset({7}))
+    ]
+    assert consumer.poll() == 0
+    assert consumer.stats()["applied"] == 4
+
+
+def test_backlog_is_read_in_batches_in_order():
+    registry, published = recording_registry()
+    consumer = ChangeLogConsumer(TestingSessionLocal, registry, batch_size=2)
+    consumer.poll()
+    write_changes(*[{"entity": "tag", "tag_id": tag_id} for tag_id in range(5)])
+    assert [consumer.poll() for _ in range(4)] == [2, 2, 1, 0]
+    assert [ids for _, ids in published] == [frozenset({0, 1}), frozenset({2, 3}), frozenset({4})]
+
+
+def test_timeline_cache_follows_video_changes():
+    registry = InvalidationRegistry()
+    cache = TimelineCache(capacity=4, hot_after=1, ttl=60)
+    registry.subscribe("videos", cache.invalidate)
+    cache._timelines.update({7: object(), 8: object()})
+
+    consumer = ChangeLogConsumer(TestingSessionLocal, registry)
+    consumer.poll()
+    write_changes({"entity": "shot", "shot_id": 1, "video_id": 7})
+    consumer.poll()
+    assert list(cache._timelines) == [8]
+
+
+def test_prune_drops_old_rows():
+    old = datetime.now(timezone.utc) - timedelta(days=2)
+    db = TestingSessionLocal()
+    try:
+        db.add(ChangeLog(entity="tag", op="delete", tag_id=1, created_at=old))
+        db.add(ChangeLog(entity="tag", op="insert", tag_id=2))
+        db.commit()
+        consumer = ChangeLogConsumer(TestingSessionLocal, retention_s=86400)
+        consumer._prune(db)
+        assert [row.tag_id for row in db.query(ChangeLog)] == [2]
+        assert consumer.stats()["pruned"] == 1
+    finally:
+        db.close()
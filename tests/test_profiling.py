@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.main import app
+from app.core.config import settings
+from app.core.db import get_db
+from app.core.profiling import SamplingProfiler
+from app.models import Base
+
+
+# Test database
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def setup_database(monkeypatch):
+    app.dependency_overrides[get_db] = override_get_db
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def _busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampler_collects_collapsed_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_loop, args=(stop,), name="busy")
+    worker.start()
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    time.sleep(0.1)
+    profiler.stop()
+    stop.set()
+    worker.join()
+
+    lines = profiler.collapsed().splitlines()
+    busy = [line for line in lines if line.startswith("busy;")]
+    assert busy
+    stack, count = busy[0].rsplit(" ", 1)
+    assert "_busy_loop" in stack
+    assert int(count) > 0
+
+
+def test_profile_endpoint_requires_token(monkeypatch):
+    response = client.post("/admin/profile?seconds=0.05")
+    assert response.status_code == 403
+
+    monkeypatch.setattr(settings, "admin_token", None)
+    response = client.post("/admin/profile?seconds=0.05", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 404
+
+
+def test_profile_endpoint_returns_collapsed_file():
+    response = client.post(
+        "/admin/profile?seconds=0.1&interval_ms=1", headers={"X-Admin-Token": "secret"}
+    )
+    assert response.status_code == 200
+    assert "attachment" in response.headers["content-disposition"]
+    assert response.text.strip()
+
+
+def test_profile_header_reports_phases():
+    headers = {"X-Profile": "1", "X-Admin-Token": "secret"}
+    response = client.get("/shots/999", headers=headers)
+    assert response.status_code == 404
+    timing = response.headers["server-timing"]
+    for phase in ("sql", "endpoint", "serialize", "total"):
+        assert f"{phase};dur=" in timing
+
+    # Without a valid token the header is ignored
+    response = client.get("/shots/999", headers={"X-Profile": "1"})
+    assert "server-timing" not in response.headers
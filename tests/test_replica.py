@@ -0,0 +1,96 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.main import app
+from app.core.config import settings
+from app.core.db import get_db
+from app.core.replica import STICKY_COOKIE, replica_router
+from app.models import Base, Tag
+
+
+# Separate in-memory databases stand in for the primary and a lagging replica
+def _engine():
+    return create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+
+
+primary_engine = _engine()
+replica_engine = _engine()
+PrimarySession = sessionmaker(autocommit=False, autoflush=False, bind=primary_engine)
+ReplicaSession = sessionmaker(
+    autocommit=False, autoflush=False, bind=replica_engine, info={"replica": True}
+)
+
+
+def override_get_db():
+    try:
+        db = PrimarySession()
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def setup_database(monkeypatch):
+    app.dependency_overrides[get_db] = override_get_db
+    monkeypatch.setattr(replica_router, "session_factory", ReplicaSession)
+    monkeypatch.setattr(replica_router, "_lag", None)
+    monkeypatch.setattr(replica_router, "_checked_at", float("-inf"))
+    for engine in (primary_engine, replica_engine):
+        Base.metadata.create_all(bind=engine)
+    yield
+    for engine in (primary_engine, replica_engine):
+        Base.metadata.drop_all(bind=engine)
+
+
+def _tag_names(client):
+    response = client.get("/tags/")
+    assert response.status_code == 200
+    return [tag["name"] for tag in response.json()["items"]]
+
+
+def test_reads_go_to_replica_until_client_writes():
+    # The replica has not seen the write yet
+    db = ReplicaSession()
+    db.add(Tag(slug="old", name="Old Tag"))
+    db.commit()
+    db.close()
+
+    client = TestClient(app)
+    assert _tag_names(client) == ["Old Tag"]
+
+    response = client.post("/tags/", json={"slug": "new", "name": "New Tag"})
+    assert response.status_code == 200
+    assert STICKY_COOKIE in response.cookies
+
+    # The writer reads its own write from the primary; other clients stay on the replica
+    assert _tag_names(client) == ["New Tag"]
+    assert _tag_names(TestClient(app)) == ["Old Tag"]
+
+
+def test_failed_write_does_not_pin_client():
+    client = TestClient(app)
+    response = client.put("/tags/999", json={"name": "Missing"})
+    assert response.status_code == 404
+    assert STICKY_COOKIE not in response.cookies
+
+
+def test_lagging_replica_is_bypassed(monkeypatch):
+    monkeypatch.setattr(replica_router, "_measure_lag", lambda: settings.replica_max_lag_s + 1)
+    db = PrimarySession()
+    db.add(Tag(slug="primary", name="Primary Tag"))
+    db.commit()
+    db.close()
+
+    assert _tag_names(TestClient(app)) == ["Primary Tag"]
+
+    # An unreachable replica is bypassed as well
+    monkeypatch.setattr(replica_router, "_checked_at", float("-inf"))
+    monkeypatch.setattr(replica_router, "_measure_lag", lambda: None)
+    assert _tag_names(TestClient(app)) == ["Primary Tag"]
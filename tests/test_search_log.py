@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.main import app
+from app.core.db import get_db
+from app.models import Base, Video, Shot, SearchLog
+from app.search.search_log import SearchLogBuffer, search_log
+
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def setup_database(monkeypatch):
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(search_log, "session_factory", TestingSessionLocal)
+    search_log._take()
+    db = TestingSessionLocal()
+    try:
+        video = Video(title="Test Video", src_url="https://example.com/test.mp4")
+        db.add(video)
+        db.commit()
+        db.add_all([Shot(video_id=video.id, t_start_ms=i * 1000, t_end_ms=(i + 1) * 1000) for i in range(3)])
+        db.commit()
+    finally:
+        db.close()
+    yield
+    search_log._take()
+    Base.metadata.drop_all(bind=engine)
+
+
+def entry(i):
+    return {"query": f"q{i}", "filters": {}, "latency_ms": 1.0, "result_count": 0, "result_ids": [], "stats": {}}
+
+
+def test_flush_writes_in_batches():
+    buffer = SearchLogBuffer(TestingSessionLocal, capacity=100, batch_size=4, high_water=1.0)
+    for i in range(10):
+        assert buffer.record(entry(i))
+    assert buffer.flush() == 10
+    assert buffer.stats()["flushes"] == 3
+    db = TestingSessionLocal()
+    try:
+        assert [row.query for row in db.query(SearchLog).order_by(SearchLog.id)] == [f"q{i}" for i in range(10)]
+    finally:
+        db.close()
+
+
+def test_overload_samples_then_overwrites_oldest():
+    buffer = SearchLogBuffer(TestingSessionLocal, capacity=10, high_water=0.5, sample_rate=0.5, seed=1)
+    for i in range(200):
+        buffer.record(entry(i))
+    stats = buffer.stats()
+    assert stats["buffered"] == 10
+    assert stats["sampled_out"] > 0
+    assert stats["overwritten"] == stats["recorded"] - 10
+    # The ring keeps the newest searches
+    assert buffer._entries[-1]["query"] == max(
+        buffer._entries, key=lambda e: int(e["query"][1:])
+    )["query"]
+
+
+def test_failed_batch_is_dropped_not_retried():
+    buffer = SearchLogBuffer(TestingSessionLocal, capacity=10, batch_size=10, high_water=1.0)
+    buffer.record({"query": "missing columns"})
+    assert buffer.flush() == 0
+    stats = buffer.stats()
+    assert stats["failed"] == 1 and stats["buffered"] == 0
+    assert stats["last_error"]
+    buffer.record(entry(1))
+    assert buffer.flush() == 1
+
+
+def test_stop_flushes_remaining_entries():
+    buffer = SearchLogBuffer(TestingSessionLocal, flush_interval_s=60)
+
+    async def run():
+        buffer.start()
+        buffer.record(entry(1))
+        await buffer.stop()
+
+    asyncio.run(run())
+    assert buffer.stats()["written"] == 1
+
+
+def test_listing_records_search():
+    response = client.get("/shots/?page_size=2&collapse_duplicates=true")
+    assert response.status_code == 200
+    assert search_log.flush() == 1
+
+    db = TestingSessionLocal()
+    try:
+        row = db.query(SearchLog).one()
+        assert row.query is None
+        assert row.filters["collapse_duplicates"] is True
+        assert row.filters["page_size"] == 2
+        assert "top_k" not in row.filters
+        assert row.result_count == response.json()["total"]
+        assert row.result_ids == [item["id"] for item in response.json()["items"]]
+        assert row.stats["priority"] == "interactive"
+        assert row.latency_ms >= 0
+    finally:
+        db.close()
+
+
+def test_text_search_records_timings(monkeypatch):
+    monkeypatch.delenv("EMBEDDER", raising=False)
+    response = client.get("/shots/?q=storm")
+    assert response.status_code == 200
+    search_log.flush()
+
+    db = TestingSessionLocal()
+    try:
+        row = db.query(SearchLog).one()
+        assert row.query == "storm"
+        assert row.filters["top_k"] == 200
+        assert row.stats["coalesced"] is False
+        assert "embed_ms" in row.stats and "queue_ms" in row.stats
+    finally:
+        db.close()
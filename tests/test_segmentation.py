@@ -0,0 +1,134 @@
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.ingest import segmentation
+from app.ingest.segmentation import (
+    colour_histograms, decode_ffmpeg, detect_segments, ingest_videos, segment_file
+)
+from app.models import Base, Shot, Video
+
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def synthetic_video(lengths, seed=0):
+    """Frames of noisy solid colours, one colour per shot, plus slow drift within shots"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for length in lengths:
+        colour = rng.integers(0, 256, size=3)
+        for i in range(length):
+            noise = rng.normal(0, 6, size=(36, 64, 3))
+            frames.append(np.clip(colour + i * 0.5 + noise, 0, 255).astype(np.uint8))
+    return np.stack(frames)
+
+
+def test_histograms_sum_to_one_per_channel():
+    frames = synthetic_video([3, 2])
+    histograms = colour_histograms(frames, bins=8)
+    assert histograms.shape == (5, 24)
+    np.testing.assert_allclose(histograms.reshape(5, 3, 8).sum(axis=2), 1.0, rtol=1e-6)
+    # Matches a per-frame numpy histogram of the red channel
+    expected, _ = np.histogram(frames[0, :, :, 0], bins=8, range=(0, 256))
+    np.testing.assert_allclose(histograms[0, :8], expected / (36 * 64), rtol=1e-6)
+
+
+def test_detects_cuts_between_shots():
+    frames = synthetic_video([20, 35, 12])
+    segments = detect_segments(iter(frames), fps=10, batch_size=16)
+    assert segments == [(0, 2000), (2000, 5500), (5500, 6700)]
+
+
+def test_minimum_shot_length_suppresses_flashes():
+    frames = synthetic_video([20, 2, 20], seed=3)
+    assert len(detect_segments(iter(frames), fps=10, min_shot_ms=500)) == 2
+    assert detect_segments(iter([]), fps=10) == []
+
+
+def test_ingests_videos_in_parallel(tmp_path):
+    db = TestingSessionLocal()
+    try:
+        videos = [Video(title=f"v{i}", src_url=f"v{i}.npy") for i in range(3)]
+        db.add_all(videos)
+        db.commit()
+        jobs = []
+        for i, video in enumerate(videos):
+            path = tmp_path / f"v{i}.npy"
+            np.save(path, synthetic_video([10] * (i + 2), seed=i))
+            jobs.append((video.id, str(path)))
+        jobs.append((999, str(tmp_path / "missing.npy")))
+
+        results = ingest_videos(db, jobs, decoder="numpy", workers=2, fps=10)
+        assert results[videos[0].id] == 2 and results[videos[2].id] == 4
+        assert isinstance(results[999], FileNotFoundError)
+
+        shots = db.query(Shot).filter(Shot.video_id == videos[1].id).order_by(Shot.t_start_ms).all()
+        assert [(shot.t_start_ms, shot.t_end_ms) for shot in shots] == [(0, 1000), (1000, 2000), (2000, 3000)]
+    finally:
+        db.close()
+
+
+def test_segment_file_uses_settings_defaults(tmp_path):
+    path = tmp_path / "video.npy"
+    np.save(path, synthetic_video([15, 15]))
+    assert segment_file(str(path), decoder="numpy") == [(0, 1500), (1500, 3000)]
+
+
+def test_failed_ffmpeg_decode_raises(monkeypatch):
+    real_popen = subprocess.Popen
+
+    def failing_ffmpeg(args, **kwargs):
+        script = "import sys; sys.stderr.write('Invalid data found when processing input'); sys.exit(1)"
+        return real_popen([sys.executable, "-c", script], **kwargs)
+
+    monkeypatch.setattr(segmentation.subprocess, "Popen", failing_ffmpeg)
+    with pytest.raises(RuntimeError, match="Invalid data found"):
+        list(decode_ffmpeg("corrupt.mp4", 10))
+
+
+def test_failed_insert_is_recorded_and_others_continue(tmp_path, monkeypatch):
+    db = TestingSessionLocal()
+    try:
+        videos = [Video(title=f"v{i}", src_url=f"v{i}.npy") for i in range(2)]
+        db.add_all(videos)
+        db.commit()
+        jobs = []
+        for i, video in enumerate(videos):
+            path = tmp_path / f"v{i}.npy"
+            np.save(path, synthetic_video([10, 10], seed=i))
+            jobs.append((video.id, str(path)))
+
+        real_insert = segmentation.insert_shots
+
+        def insert_shots(db, video_id, segments):
+            if video_id == videos[0].id:
+                raise RuntimeError("insert failed")
+            return real_insert(db, video_id, segments)
+
+        monkeypatch.setattr(segmentation, "insert_shots", insert_shots)
+        results = ingest_videos(db, jobs, decoder="numpy", workers=1, fps=10)
+        assert isinstance(results[videos[0].id], RuntimeError)
+        assert results[videos[1].id] == 2
+        assert db.query(Shot).filter(Shot.video_id == videos[1].id).count() == 2
+    finally:
+        db.close()
@@ -0,0 +1,184 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.main import app
+from app.core.db import get_db
+from app.models import Base, Video, Shot, Tag, ShotTag
+from app.search.embedder import MockEmbedder
+from app.search.queries import SHOT_ROWS, build_shot_query, cached_text
+
+
+# Test database
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    app.dependency_overrides[get_db] = override_get_db
+    Base.metadata.create_all(bind=engine)
+    
+    # Create test data
+    db = TestingSessionLocal()
+    try:
+        video = Video(title="Test Video", src_url="https://example.com/test.mp4")
+        tag = Tag(slug="wide", name="Wide Shot")
+        db.add_all([video, tag])
+        db.commit()
+        
+        for i in range(3):
+            shot = Shot(
+                video_id=video.id,
+                t_start_ms=i * 1000,
+                t_end_ms=(i + 1) * 1000,
+                embedding=[float(i)] * 768 if i else None
+            )
+            db.add(shot)
+            db.commit()
+            db.add(ShotTag(shot_id=shot.id, tag_id=tag.id))
+        db.commit()
+    finally:
+        db.close()
+    
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def statements():
+    captured = []
+    
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append(statement)
+    
+    event.listen(engine, "before_cursor_execute", capture)
+    yield captured
+    event.remove(engine, "before_cursor_execute", capture)
+
+
+def test_embedding_is_deferred():
+    db = TestingSessionLocal()
+    try:
+        shot = db.query(Shot).first()
+        assert "embedding" in inspect(shot).unloaded
+    finally:
+        db.close()
+
+
+def test_list_shots_never_selects_embeddings(statements):
+    response = client.get("/shots/")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 3
+    assert data["items"][0]["video_title"] == "Test Video"
+    assert data["items"][0]["tags"] == ["Wide Shot"]
+    assert statements
+    assert not any("shots.embedding" in statement for statement in statements)
+
+
+def test_get_shot_detail(statements):
+    # Shot 1 has no embedding, so no vector search runs against SQLite
+    response = client.get("/shots/1")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["video_src_url"] == "https://example.com/test.mp4"
+    assert data["tags"] == ["Wide Shot"]
+    assert data["similar_shots"] == []
+    # Only an IS NOT NULL check touches the embedding column
+    assert not any("shots.embedding," in statement for statement in statements)
+
+
+def test_mock_embedder_batches(monkeypatch):
+    monkeypatch.setenv("EMBEDDER", "mock")
+    vectors = MockEmbedder().embed_batch(["a", "b", "c"])
+    assert len(vectors) == 3
+    assert all(len(vector) == 768 for vector in vectors)
+
+
+def test_batch_search_without_embeddings_returns_empty_results(monkeypatch):
+    monkeypatch.delenv("EMBEDDER", raising=False)
+    response = client.post("/shots/search:batch", json={"queries": ["storm", "sunset"]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["query"] for r in results] == ["storm", "sunset"]
+    assert all(r["ids"] == [] and r["distances"] == [] for r in results)
+
+
+def test_batch_search_validates_queries():
+    response = client.post("/shots/search:batch", json={"queries": []})
+    assert response.status_code == 422
+
+
+def test_text_search_without_embedder_is_empty(monkeypatch):
+    monkeypatch.delenv("EMBEDDER", raising=False)
+    response = client.get("/shots/?q=storm")
+    assert response.status_code == 200
+    assert response.json()["total"] == 0
+
+
+def test_listing_statement_is_reused_across_values(statements):
+    db = TestingSessionLocal()
+    try:
+        counts = []
+        for slug in ("wide", "missing"):
+            query, total = build_shot_query(db, tag_slugs=[slug], page=1, page_size=2)
+            counts.append((len(db.execute(query).all()), total))
+        assert counts == [(2, 3), (0, 0)]
+        # Only the bound values differ, so both requests send the same SQL
+        listing = [statement for statement in statements if "LIMIT" in statement]
+        assert len(listing) == 2 and listing[0] == listing[1]
+
+        assert SHOT_ROWS(db) is SHOT_ROWS(db)
+        assert cached_text("SELECT 1") is cached_text("SELECT 1")
+    finally:
+        db.close()
+
+
+def test_shared_search_runs_on_its_own_session(monkeypatch):
+    request_sessions, searched = [], []
+    
+    def tracking_get_db():
+        db = TestingSessionLocal()
+        request_sessions.append(db)
+        try:
+            yield db
+        finally:
+            db.close()
+    
+    class RecordingEmbedder:
+        def embed(self, text):
+            searched.append(text)
+            return [1.0] * 768
+    
+    def fake_vector_query(db, query_vector, *args):
+        searched.append(db)
+        return []
+    
+    monkeypatch.setitem(app.dependency_overrides, get_db, tracking_get_db)
+    monkeypatch.setattr("app.api.shots.embedder_for", lambda model: RecordingEmbedder())
+    monkeypatch.setattr("app.api.shots.build_vector_query", fake_vector_query)
+    response = client.get("/shots/", params={"q": "  Storm   CLOUDS "})
+    assert response.status_code == 200
+    # The text is embedded as normalized for the flight key, not as the leader spelled it
+    assert searched[0] == "storm clouds"
+    assert searched[1] not in request_sessions
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from app.search.singleflight import SingleFlight, normalize_query, search_key
+
+
+def test_concurrent_identical_calls_share_one_computation():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return [1, 2, 3]
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", compute) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert results == [[1, 2, 3]] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"leaders": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("embedder down")
+
+    async def succeed():
+        return "ok"
+
+    async def main():
+        results = await asyncio.gather(
+            *(flight.do("key", fail) for _ in range(3)), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+        return await flight.do("key", succeed)
+
+    assert asyncio.run(main()) == "ok"
+
+
+def test_cancelled_waiter_does_not_cancel_shared_work():
+    flight = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == 42
+
+
+@pytest.mark.parametrize("a,b", [
+    ("Rainy  street", "rainy street"),
+    (" night city ", "Night City"),
+])
+def test_search_keys_normalize_query_text(a, b):
+    assert normalize_query(a) == normalize_query(b)
+    assert search_key(a, ["b", "a"], 10) == search_key(b, ["a", "b"], 10)
+    assert search_key(a, None, 10) != search_key(a, None, 20)
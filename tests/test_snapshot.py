@@ -0,0 +1,211 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import settings
+from app.models import Base, Video, Shot
+from app.search import queries
+from app.search.snapshot import EmbeddingSnapshot, SnapshotStore, write_snapshot
+
+
+# Test database
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+DIM = 8
+rng = np.random.default_rng(0)
+VECTORS = rng.normal(size=(50, DIM)).astype(np.float32)
+
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        video = Video(title="Test Video", src_url="https://example.com/test.mp4")
+        db.add(video)
+        db.commit()
+        db.add_all([
+            Shot(video_id=video.id, t_start_ms=i, t_end_ms=i + 1, embedding=VECTORS[i].tolist())
+            for i in range(40)
+        ])
+        db.commit()
+    finally:
+        db.close()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def _exact(query, ids, vectors, top_k):
+    distances = 1 - vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    return [ids[i] for i in np.argsort(distances)[:top_k]]
+
+
+def _write(path, count, watermark=None):
+    rows = [(i + 1, VECTORS[i]) for i in range(count)]
+    return write_snapshot(str(path), rows, count, DIM, watermark or count)
+
+
+def test_snapshot_round_trip_and_search(tmp_path):
+    path = tmp_path / "embeddings.snap"
+    assert _write(path, 40) == 40
+
+    snapshot = EmbeddingSnapshot(str(path))
+    assert snapshot.count == 40 and snapshot.dim == DIM and snapshot.watermark == 40
+    assert isinstance(snapshot.matrix, np.memmap)
+    np.testing.assert_allclose(snapshot.get(7), VECTORS[6])
+    assert snapshot.get(999) is None
+
+    query = VECTORS[3]
+    ids = [shot_id for shot_id, _ in snapshot.search(query, 5, metric="cosine")]
+    assert ids == _exact(query, list(range(1, 41)), VECTORS[:40], 5)
+    assert ids[0] == 4
+
+    allowed = [10, 20, 30]
+    assert {shot_id for shot_id, _ in snapshot.search(query, 5, "cosine", allowed)} == set(allowed)
+
+
+def test_write_rejects_unsorted_rows_and_leaves_old_snapshot(tmp_path):
+    path = tmp_path / "embeddings.snap"
+    _write(path, 10)
+    with pytest.raises(ValueError):
+        write_snapshot(str(path), [(2, VECTORS[0]), (1, VECTORS[1])], 2, DIM, 2)
+    assert EmbeddingSnapshot(str(path)).count == 10
+    assert os.listdir(tmp_path) == ["embeddings.snap"]
+
+
+def test_store_picks_up_swapped_snapshot(tmp_path):
+    path = tmp_path / "embeddings.snap"
+    store = SnapshotStore(str(path), check_interval=0)
+    assert store.current() is None
+
+    _write(path, 10)
+    first = store.current()
+    assert first.count == 10
+
+    _write(path, 30)
+    second = store.current()
+    assert second is not first and second.count == 30
+    # Readers still holding the old mapping keep working after the swap
+    assert first.get(5) is not None
+
+
+def test_delta_covers_shots_added_after_build(tmp_path, monkeypatch):
+    path = tmp_path / "embeddings.snap"
+    _write(path, 30)
+    store = SnapshotStore(str(path), check_interval=0, delta_interval=0)
+    monkeypatch.setattr(queries, "snapshot_store", store)
+    monkeypatch.setattr(settings, "vector_backend", "snapshot")
+    monkeypatch.setattr(settings, "vector_metric", "cosine")
+
+    db = TestingSessionLocal()
+    try:
+        # Shot 35 exists only in the database, past the snapshot watermark
+        ids = queries.build_vector_query(db, VECTORS[34].tolist(), 5, hybrid=False)
+        assert ids == _exact(VECTORS[34], list(range(1, 41)), VECTORS[:40], 5)
+        assert ids[0] == 35
+        assert store.stats()["delta_rows"] == 10
+
+        db.add(Shot(video_id=1, t_start_ms=0, t_end_ms=1, embedding=VECTORS[45].tolist()))
+        db.commit()
+        ids = queries.build_vector_query(db, VECTORS[45].tolist(), 3, hybrid=False)
+        assert ids[0] == 41
+        assert store.stats()["delta_rows"] == 11
+    finally:
+        db.close()
+
+
+def test_changed_shots_are_reread_after_invalidation(tmp_path):
+    path = tmp_path / "embeddings.snap"
+    _write(path, 30)
+    store = SnapshotStore(str(path), check_interval=0, delta_interval=0)
+
+    db = TestingSessionLocal()
+    try:
+        assert store.search(db, VECTORS[45], 1) != [5]
+        # Shot 5 (in the snapshot) takes a new embedding, shot 6 loses its own,
+        # and shot 35 (in the delta) changes too
+        db.query(Shot).filter(Shot.id == 5).update({Shot.embedding: "[" + ",".join(map(str, VECTORS[45])) + "]"})
+        db.query(Shot).filter(Shot.id == 6).update({Shot.embedding: None})
+        db.query(Shot).filter(Shot.id == 35).update({Shot.embedding: "[" + ",".join(map(str, VECTORS[46])) + "]"})
+        db.commit()
+        store.invalidate([5, 6, 35, 99])
+
+        assert store.search(db, VECTORS[45], 1) == [5]
+        assert store.search(db, VECTORS[46], 1) == [35]
+        assert 6 not in store.search(db, VECTORS[5], 40)
+        # Snapshot rows of shots 5 and 6 are masked; shot 35 lives in the delta
+        assert store.stats()["stale_rows"] == 2
+        # Shots 31-40 plus the re-read shot 5; shot 35 was replaced in place
+        assert store.stats()["delta_rows"] == 11
+    finally:
+        db.close()
+
+
+def test_concurrent_searches_refresh_the_delta_once(tmp_path):
+    path = tmp_path / "embeddings.snap"
+    _write(path, 30)
+    store = SnapshotStore(str(path), check_interval=0, delta_interval=60)
+    snapshot = store.current()
+    reads = []
+
+    class SlowSession:
+        def __init__(self):
+            self.db = TestingSessionLocal()
+
+        def execute(self, *args, **kwargs):
+            reads.append(args[0])
+            time.sleep(0.05)
+            return self.db.execute(*args, **kwargs)
+
+    sessions = [SlowSession() for _ in range(2)]
+    try:
+        threads = [threading.Thread(target=store._refresh_delta, args=(session, snapshot)) for session in sessions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        for session in sessions:
+            session.db.close()
+    # The second search waited for the first refresh instead of appending the same rows again
+    assert len(reads) == 1
+    assert store._delta_ids.tolist() == list(range(31, 41))
+
+
+def test_stale_rows_are_masked_without_over_fetching(tmp_path, monkeypatch):
+    path = tmp_path / "embeddings.snap"
+    _write(path, 30)
+    store = SnapshotStore(str(path), check_interval=0, delta_interval=0)
+    requested = []
+    search = EmbeddingSnapshot.search
+
+    def recording_search(self, query_vector, top_k, *args, **kwargs):
+        requested.append(top_k)
+        return search(self, query_vector, top_k, *args, **kwargs)
+
+    monkeypatch.setattr(EmbeddingSnapshot, "search", recording_search)
+    db = TestingSessionLocal()
+    try:
+        db.query(Shot).filter(Shot.id <= 20).update({Shot.embedding: None})
+        db.commit()
+        store.invalidate(range(1, 21))
+        ids = store.search(db, VECTORS[3], 5)
+        assert ids and all(shot_id > 20 for shot_id in ids)
+        # However many rows went stale, the snapshot is asked for top_k only
+        assert requested == [5]
+        assert store.stats()["stale_rows"] == 20
+    finally:
+        db.close()
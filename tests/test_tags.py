@@ -1,12 +1,14 @@
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from app.main import app
 from app.core.db import get_db
-from app.models import Base
+from app.core.invalidation import invalidation
+from app.models import Base, Video, Shot, ShotTag
+from app.search.tag_counts import tag_counts
 
 
 # Test database
@@ -28,14 +30,15 @@ def override_get_db():
         db.close()
 
 
-app.dependency_overrides[get_db] = override_get_db
-
 client = TestClient(app)
 
 
 @pytest.fixture(autouse=True)
 def setup_database():
+    app.dependency_overrides[get_db] = override_get_db
     Base.metadata.create_all(bind=engine)
+    # Ids are reused between tests, so counts cached by an earlier test are stale
+    tag_counts.invalidate()
     yield
     Base.metadata.drop_all(bind=engine)
 
@@ -83,3 +86,119 @@ def test_update_tag():
 def test_get_nonexistent_tag():
     response = client.get("/tags/999")
     assert response.status_code == 404
+
+
+def create_shots(count):
+    db = TestingSessionLocal()
+    try:
+        video = Video(title="Test Video", src_url="https://example.com/test.mp4")
+        db.add(video)
+        db.commit()
+        shots = [Shot(video_id=video.id, t_start_ms=i * 1000, t_end_ms=(i + 1) * 1000) for i in range(count)]
+        db.add_all(shots)
+        db.commit()
+        return [shot.id for shot in shots]
+    finally:
+        db.close()
+
+
+def shot_tag_pairs():
+    db = TestingSessionLocal()
+    try:
+        return sorted((row.shot_id, row.tag_id) for row in db.query(ShotTag))
+    finally:
+        db.close()
+
+
+def test_get_tag_with_shot_count():
+    tag_id = client.post("/tags/", json={"slug": "wide", "name": "Wide"}).json()["id"]
+    response = client.get(f"/tags/{tag_id}")
+    assert response.status_code == 200
+    assert response.json() == {"id": tag_id, "slug": "wide", "name": "Wide", "shot_count": 0}
+
+
+def test_bulk_tag_and_untag_shots():
+    shot_ids = create_shots(5)
+    tag_id = client.post("/tags/", json={"slug": "wide", "name": "Wide"}).json()["id"]
+    assert client.get(f"/tags/{tag_id}").json()["shot_count"] == 0
+
+    response = client.post(f"/tags/{tag_id}/shots:bulk", json={"shot_ids": shot_ids[:3] + [9999]})
+    assert response.status_code == 200
+    assert response.json() == {"tag_id": tag_id, "requested": 4, "changed": 3, "shot_count": 3}
+
+    # Already-tagged shots are skipped, not duplicated
+    response = client.post(f"/tags/{tag_id}/shots:bulk", json={"shot_ids": shot_ids})
+    assert response.json()["changed"] == 2
+    assert client.get(f"/tags/{tag_id}").json()["shot_count"] == 5
+
+    response = client.request("DELETE", f"/tags/{tag_id}/shots:bulk", json={"shot_ids": shot_ids[:2]})
+    assert response.status_code == 200
+    assert response.json()["changed"] == 2
+    assert response.json()["shot_count"] == 3
+    assert shot_tag_pairs() == [(shot_id, tag_id) for shot_id in shot_ids[2:]]
+
+
+def test_bulk_tag_unknown_tag():
+    response = client.post("/tags/999/shots:bulk", json={"shot_ids": [1]})
+    assert response.status_code == 404
+
+
+def test_bulk_invalidates_once(monkeypatch):
+    shot_ids = create_shots(50)
+    tag_id = client.post("/tags/", json={"slug": "wide", "name": "Wide"}).json()["id"]
+    calls = []
+    monkeypatch.setitem(invalidation._subscribers, "tags", [calls.append])
+    client.post(f"/tags/{tag_id}/shots:bulk", json={"shot_ids": shot_ids})
+    assert calls == [frozenset({tag_id})]
+
+
+def test_counts_read_before_an_invalidation_are_not_cached():
+    tag_id = client.post("/tags/", json={"slug": "wide", "name": "Wide"}).json()["id"]
+
+    def bulk_edit_lands(conn, cursor, statement, parameters, context, executemany):
+        if "GROUP BY" in statement:
+            tag_counts.invalidate(frozenset({tag_id}))
+
+    event.listen(engine, "before_cursor_execute", bulk_edit_lands)
+    db = TestingSessionLocal()
+    try:
+        assert tag_counts.counts(db, [tag_id]) == {tag_id: 0}
+    finally:
+        event.remove(engine, "before_cursor_execute", bulk_edit_lands)
+        db.close()
+    # The count may predate the edit, so the next read goes back to the database
+    assert tag_counts.stats()["tags"] == 0
+
+    replica = TestingSessionLocal(info={"replica": True})
+    try:
+        tag_counts.counts(replica, [tag_id])
+    finally:
+        replica.close()
+    assert tag_counts.stats()["tags"] == 0
+
+
+def test_merge_tags():
+    shot_ids = create_shots(4)
+    target = client.post("/tags/", json={"slug": "close-up", "name": "Close-up"}).json()["id"]
+    source = client.post("/tags/", json={"slug": "closeup", "name": "Closeup"}).json()["id"]
+    other = client.post("/tags/", json={"slug": "cu", "name": "CU"}).json()["id"]
+    client.post(f"/tags/{target}/shots:bulk", json={"shot_ids": shot_ids[:2]})
+    client.post(f"/tags/{source}/shots:bulk", json={"shot_ids": shot_ids[1:3]})
+    client.post(f"/tags/{other}/shots:bulk", json={"shot_ids": shot_ids[3:]})
+    assert client.get(f"/tags/{target}").json()["shot_count"] == 2
+
+    response = client.post(f"/tags/{target}/merge", json={"source_ids": [source, other]})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["moved"] == 2
+    assert data["merged_ids"] == [source, other]
+    assert data["tag"]["shot_count"] == 4
+    assert shot_tag_pairs() == [(shot_id, target) for shot_id in shot_ids]
+    assert client.get(f"/tags/{source}").status_code == 404
+
+
+def test_merge_rejects_self_and_unknown_tags():
+    tag_id = client.post("/tags/", json={"slug": "wide", "name": "Wide"}).json()["id"]
+    assert client.post(f"/tags/{tag_id}/merge", json={"source_ids": [tag_id]}).status_code == 400
+    assert client.post(f"/tags/{tag_id}/merge", json={"source_ids": [999]}).status_code == 404
+    assert client.post("/tags/999/merge", json={"source_ids": [tag_id]}).status_code == 404
@@ -0,0 +1,293 @@
+import importlib.util
+import os
+
+import numpy as np
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.invalidation import InvalidationRegistry
+from app.core.outbox import ChangeLogConsumer
+from app.models import Base, ChangeLog
+from app.search.ann import INDEX_NAME, QUANTIZED_INDEX_NAME, create_model_index, create_vector_index, model_index_name
+from app.search.embedding_models import DEFAULT_MODEL, ModelInfo
+from app.search.projection import StreamingPCA
+from app.search.vectors import parse_vectors
+from app.search.fulltext import TITLE_TS_CONFIG
+from app.search.queries import (
+    build_batch_vector_query, build_fusion_query, build_shot_query, build_vector_query, get_similar_shots
+)
+from app.search.recommend import recommend_shots
+
+
+# These checks need a real PostgreSQL with pgvector; SQLite cannot plan vector queries
+PGVECTOR_TEST_URL = os.getenv("PGVECTOR_TEST_URL")
+pytestmark = pytest.mark.skipif(
+    not PGVECTOR_TEST_URL, reason="set PGVECTOR_TEST_URL to a scratch pgvector database"
+)
+
+DIMENSIONS = 8
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = create_engine(PGVECTOR_TEST_URL)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    rng = np.random.default_rng(0)
+    with engine.begin() as connection:
+        connection.execute(text(
+            f"ALTER TABLE shots ALTER COLUMN embedding TYPE vector({DIMENSIONS}) USING embedding::vector"
+        ))
+        connection.execute(text("INSERT INTO videos (id, title, src_url) VALUES (1, 'v', 'u')"))
+        connection.execute(
+            text("INSERT INTO shots (video_id, t_start_ms, t_end_ms, embedding) VALUES (1, 0, 1, :e)"),
+            [{"e": str(v.tolist())} for v in rng.normal(size=(2000, DIMENSIONS))]
+        )
+        connection.execute(text("INSERT INTO tags (id, slug, name) VALUES (1, 'sunset', 'Sunset')"))
+        connection.execute(text("INSERT INTO shot_tags (shot_id, tag_id) SELECT id, 1 FROM shots WHERE id <= 5"))
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+def _plan_of_last_statement(db, action):
+    """Run a search, capture the SQL it sent and EXPLAIN that exact statement"""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        action()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    statement, parameters = captured[-1]
+    rows = db.connection().exec_driver_sql("EXPLAIN " + statement, parameters)
+    return "\n".join(row[0] for row in rows)
+
+
+@pytest.mark.parametrize("metric", ["cosine", "l2", "ip"])
+def test_searches_use_the_ann_index(engine, monkeypatch, metric):
+    monkeypatch.setattr(settings, "vector_metric", metric)
+    with engine.begin() as connection:
+        create_vector_index(connection, "hnsw")
+        connection.execute(text("ANALYZE shots"))
+
+    db = sessionmaker(bind=engine)()
+    try:
+        db.execute(text("SET enable_seqscan = off"))
+        query_vector = list(np.ones(DIMENSIONS))
+
+        plan = _plan_of_last_statement(
+            db, lambda: build_vector_query(db, query_vector, 10, hybrid=False)
+        )
+        assert INDEX_NAME in plan
+
+        plan = _plan_of_last_statement(db, lambda: get_similar_shots(db, 1, 5))
+        assert INDEX_NAME in plan
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("quantization", ["halfvec", "binary"])
+def test_quantized_search_uses_quantized_index(engine, monkeypatch, quantization):
+    monkeypatch.setattr(settings, "embedding_dim", DIMENSIONS)
+    monkeypatch.setattr(settings, "vector_quantization", quantization)
+    monkeypatch.setattr(settings, "vector_full_index", False)
+    with engine.begin() as connection:
+        create_vector_index(connection, "hnsw")
+        connection.execute(text("ANALYZE shots"))
+
+    db = sessionmaker(bind=engine)()
+    try:
+        db.execute(text("SET enable_seqscan = off"))
+        query_vector = list(np.ones(DIMENSIONS))
+        plan = _plan_of_last_statement(
+            db, lambda: build_vector_query(db, query_vector, 10, hybrid=False)
+        )
+        assert QUANTIZED_INDEX_NAME in plan
+        assert len(build_vector_query(db, query_vector, 10, hybrid=False)) == 10
+    finally:
+        db.close()
+
+
+def test_batch_search_matches_single_searches(engine):
+    db = sessionmaker(bind=engine)()
+    try:
+        rng = np.random.default_rng(1)
+        query_vectors = [list(v) for v in rng.normal(size=(3, DIMENSIONS))] + [None]
+        db.execute(text("SET LOCAL enable_indexscan = off"))
+        batched = build_batch_vector_query(db, query_vectors, 5, hybrid=False)
+
+        assert batched[-1] == []
+        for query_vector, ranked in zip(query_vectors[:-1], batched):
+            assert [shot_id for shot_id, _ in ranked] == build_vector_query(db, query_vector, 5, hybrid=False)
+            distances = [distance for _, distance in ranked]
+            assert distances == sorted(distances)
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("method", ["rrf", "weighted"])
+def test_fusion_merges_tag_and_vector_candidates(engine, method):
+    db = sessionmaker(bind=engine)()
+    try:
+        # Query with shot 100's own embedding: it tops the vector list but has no tags
+        embedding = db.execute(text("SELECT embedding::text FROM shots WHERE id = 100")).scalar()
+        query_vector = [float(x) for x in embedding.strip("[]").split(",")]
+        ids = build_fusion_query(db, query_vector, "sunset", top_k=20, method=method)
+
+        assert len(ids) == len(set(ids)) == 20
+        assert 100 in ids
+        assert set(range(1, 6)) & set(ids)
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("centroids", [1, 2])
+def test_deck_recommendations_exclude_members(engine, centroids):
+    db = sessionmaker(bind=engine)()
+    try:
+        db.execute(text("INSERT INTO decks (id, user_id, title) VALUES (1, 1, 'd') ON CONFLICT DO NOTHING"))
+        db.execute(text("""
+            INSERT INTO deck_items (deck_id, shot_id, sort_order)
+            SELECT 1, id, id FROM shots WHERE id IN (10, 11, 12) ON CONFLICT DO NOTHING
+        """))
+        db.flush()
+        ids = recommend_shots(db, 1, version=centroids, top_k=10, count=centroids)
+
+        assert len(ids) == len(set(ids)) == 10
+        assert not {10, 11, 12} & set(ids)
+    finally:
+        db.rollback()
+        db.close()
+
+
+def test_video_title_search_filters_shots(engine):
+    db = sessionmaker(bind=engine)()
+    try:
+        # The generated column comes from migration 0010, which create_all does not run
+        db.execute(text(f"""
+            ALTER TABLE videos ADD COLUMN IF NOT EXISTS title_tsv tsvector
+            GENERATED ALWAYS AS (to_tsvector('{TITLE_TS_CONFIG}', coalesce(title, ''))) STORED
+        """))
+        db.execute(text("INSERT INTO videos (id, title, src_url) VALUES (2, 'Storms at sea', 'u')"))
+        db.execute(text("UPDATE shots SET video_id = 2 WHERE id BETWEEN 50 AND 59"))
+        db.flush()
+
+        embedding = db.execute(text("SELECT embedding::text FROM shots WHERE id = 100")).scalar()
+        query_vector = [float(x) for x in embedding.strip("[]").split(",")]
+        # Stemming matches "storm" against "Storms"
+        ids = build_vector_query(db, query_vector, 20, hybrid=False, video_query="storm")
+        assert sorted(ids) == list(range(50, 60))
+
+        query, total = build_shot_query(db, video_query="sea -lake")
+        assert total == 10
+        assert {row.video_title for row in db.execute(query)} == {"Storms at sea"}
+    finally:
+        db.rollback()
+        db.close()
+
+
+def _run_migration(connection, filename, step):
+    """Run one revision's upgrade or downgrade on a connection, as alembic would"""
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "alembic", "versions", filename)
+    spec = importlib.util.spec_from_file_location(filename[:-3], path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    with Operations.context(MigrationContext.configure(connection)):
+        getattr(migration, step)()
+
+
+def test_change_log_triggers_feed_the_consumer(engine):
+    with engine.begin() as connection:
+        # The migration's own table, defaults and triggers replace the create_all table
+        ChangeLog.__table__.drop(connection)
+        _run_migration(connection, "0011_change_log.py", "upgrade")
+    try:
+        registry, published = InvalidationRegistry(), []
+        for topic in ("shots", "videos", "tags"):
+            registry.subscribe(topic, lambda ids, topic=topic: published.append((topic, ids)))
+        consumer = ChangeLogConsumer(sessionmaker(bind=engine), registry)
+        consumer.poll()
+
+        with engine.begin() as connection:
+            connection.execute(text("UPDATE shots SET thumb_url = 't' WHERE id IN (1, 2)"))
+            connection.execute(text("INSERT INTO shot_tags (shot_id, tag_id) VALUES (6, 1)"))
+        assert consumer.poll() == 3
+        assert sorted(published) == [
+            ("shots", frozenset({1, 2})), ("tags", frozenset({1})), ("videos", frozenset({1}))
+        ]
+    finally:
+        with engine.begin() as connection:
+            connection.execute(text("DELETE FROM shot_tags WHERE shot_id = 6"))
+            _run_migration(connection, "0011_change_log.py", "downgrade")
+            ChangeLog.__table__.create(connection)
+
+
+def test_model_search_uses_its_own_index(engine):
+    # A 4-dimensional model side by side with the 8-dimensional default one
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO embedding_models (id, name, dim, status) VALUES (7, 'small', 4, 'ready')"))
+        connection.execute(text("""
+            INSERT INTO shot_embeddings (model_id, shot_id, embedding)
+            SELECT 7, id, CAST(subvector(embedding, 1, 4) AS text) FROM shots
+        """))
+        create_model_index(connection, 7, 4, "hnsw")
+        connection.execute(text("ANALYZE shot_embeddings"))
+
+    model = ModelInfo(7, "small", 4, "ready")
+    db = sessionmaker(bind=engine)()
+    try:
+        query_vector = [1.0, 0.5, -0.5, 0.0]
+        exact = [row[0] for row in db.execute(text("""
+            SELECT shot_id FROM shot_embeddings WHERE model_id = 7
+            ORDER BY CAST(embedding AS vector(4)) <=> CAST(:q AS vector(4)) LIMIT 10
+        """), {"q": str(query_vector)})]
+
+        db.execute(text("SET enable_seqscan = off"))
+        plan = _plan_of_last_statement(
+            db, lambda: build_vector_query(db, query_vector, 10, hybrid=False, model=model)
+        )
+        assert model_index_name(7) in plan
+        db.execute(text("SELECT set_config('hnsw.ef_search', '200', false)"))
+        assert build_vector_query(db, query_vector, 10, hybrid=False, model=model) == exact
+    finally:
+        db.close()
+
+
+def test_reduced_model_candidates_are_reranked_exactly(engine, monkeypatch):
+    monkeypatch.setattr(settings, "rerank_factor", 20)
+    with engine.begin() as connection:
+        rows = connection.execute(text("SELECT id, CAST(embedding AS text) FROM shots ORDER BY id")).all()
+        matrix = parse_vectors([row[1] for row in rows])
+        projection = StreamingPCA().partial_fit(matrix).projection(6)
+        connection.execute(text("INSERT INTO embedding_models (id, name, dim, status) VALUES (8, 'pca6', 6, 'ready')"))
+        connection.execute(
+            text("INSERT INTO shot_embeddings (model_id, shot_id, embedding) VALUES (8, :shot_id, :e)"),
+            [{"shot_id": row[0], "e": str(v.tolist())} for row, v in zip(rows, projection.transform(matrix))]
+        )
+        create_model_index(connection, 8, 6, "hnsw")
+
+    model = ModelInfo(8, "pca6", 6, "ready", DEFAULT_MODEL, projection)
+    db = sessionmaker(bind=engine)()
+    try:
+        query_vector = matrix[0].tolist()
+        exact = build_vector_query(db, query_vector, 10, hybrid=False)
+        reduced = build_vector_query(db, query_vector, 10, hybrid=False, model=model)
+        # Candidates from 6 of 8 dimensions, ordered by the full distance
+        assert reduced[0] == exact[0] == rows[0][0]
+        assert len(set(reduced) & set(exact)) >= 8
+    finally:
+        db.close()
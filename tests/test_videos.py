@@ -0,0 +1,180 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.main import app
+from app.core.db import get_db
+from app.models import Base, Video, Shot
+from app.search.timeline import VideoTimeline, timeline_cache
+
+
+# Test database
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+
+client = TestClient(app)
+
+# Mostly short shots plus a few long ones that span many others
+random.seed(7)
+INTERVALS = []
+for _ in range(200):
+    start = random.randrange(0, 100_000)
+    length = random.choice([500, 1000, 2000, 30_000])
+    INTERVALS.append((start, start + length))
+
+
+@pytest.fixture(autouse=True)
+def setup_database(monkeypatch):
+    app.dependency_overrides[get_db] = override_get_db
+    monkeypatch.setattr(timeline_cache, "hot_after", 10**9)
+    timeline_cache.invalidate()
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        video = Video(title="Test Video", src_url="https://example.com/test.mp4")
+        other = Video(title="Other Video", src_url="https://example.com/other.mp4")
+        db.add_all([video, other])
+        db.commit()
+        db.add_all([
+            Shot(video_id=video.id, t_start_ms=start, t_end_ms=end)
+            for start, end in INTERVALS
+        ])
+        db.add(Shot(video_id=other.id, t_start_ms=0, t_end_ms=200_000))
+        db.commit()
+    finally:
+        db.close()
+    yield
+    timeline_cache.invalidate()
+    Base.metadata.drop_all(bind=engine)
+
+
+def _expected(from_ms, to_ms):
+    # Shot ids follow insertion order, starting at 1
+    matches = [
+        (start, i + 1) for i, (start, end) in enumerate(INTERVALS)
+        if start < to_ms and end > from_ms
+    ]
+    return [shot_id for _, shot_id in sorted(matches)]
+
+
+def _fetch_all(from_ms, to_ms, limit):
+    ids, cursor = [], None
+    while True:
+        params = {"from_ms": from_ms, "to_ms": to_ms, "limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/videos/1/shots", params=params)
+        assert response.status_code == 200
+        data = response.json()
+        ids.extend(item["id"] for item in data["items"])
+        cursor = data["next_cursor"]
+        if not cursor:
+            return ids
+
+
+def test_window_returns_overlapping_shots_in_time_order():
+    response = client.get("/videos/1/shots", params={"from_ms": 40_000, "to_ms": 45_000, "limit": 1000})
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["id"] for item in data["items"]] == _expected(40_000, 45_000)
+    assert data["next_cursor"] is None
+    starts = [item["t_start_ms"] for item in data["items"]]
+    assert starts == sorted(starts)
+
+
+def test_keyset_pages_cover_window_once():
+    assert _fetch_all(10_000, 60_000, 7) == _expected(10_000, 60_000)
+
+
+def test_hot_video_served_from_memory_matches_database(monkeypatch):
+    monkeypatch.setattr(timeline_cache, "hot_after", 1)
+    hits = timeline_cache.hits
+    for from_ms, to_ms in [(0, 5_000), (50_000, 52_000), (99_000, 140_000)]:
+        assert _fetch_all(from_ms, to_ms, 5) == _expected(from_ms, to_ms)
+    assert timeline_cache.hits > hits
+
+
+def test_timeline_arrays_handle_long_shots():
+    timeline = VideoTimeline([(1, 0, 100_000, None), (2, 10, 20, None), (3, 50, 60, None)])
+    assert [row[0] for row in timeline.overlapping(30, 40)] == [1]
+    assert [row[0] for row in timeline.overlapping(15, 55)] == [1, 2, 3]
+    assert [row[0] for row in timeline.overlapping(15, 55, after=(10, 2))] == [3]
+
+
+def test_zero_length_shots_overlap_nothing(monkeypatch):
+    db = TestingSessionLocal()
+    try:
+        db.add(Shot(video_id=2, t_start_ms=1000, t_end_ms=1000))
+        db.commit()
+    finally:
+        db.close()
+    # The database and the in-memory timeline follow the same rule as PostgreSQL's &&
+    for hot_after in (10**9, 1):
+        monkeypatch.setattr(timeline_cache, "hot_after", hot_after)
+        timeline_cache.invalidate()
+        response = client.get("/videos/2/shots", params={"from_ms": 500, "to_ms": 1500})
+        assert [item["id"] for item in response.json()["items"]] == [len(INTERVALS) + 1]
+    assert VideoTimeline([(1, 10, 10, None)]).overlapping(0, 20) == []
+
+
+def test_invalid_requests():
+    assert client.get("/videos/999/shots").status_code == 404
+    # Windows must fit int4, which the range index is built on
+    assert client.get("/videos/1/shots", params={"from_ms": 2**31 - 1}).status_code == 422
+    assert client.get("/videos/1/shots", params={"to_ms": 2**31}).status_code == 422
+    assert client.get("/videos/1/shots", params={"from_ms": 10, "to_ms": 5}).status_code == 400
+    assert client.get("/videos/1/shots", params={"cursor": "nope"}).status_code == 400
+
+
+def test_shots_cannot_end_before_they_start():
+    db = TestingSessionLocal()
+    try:
+        db.add(Shot(video_id=1, t_start_ms=2000, t_end_ms=1000))
+        with pytest.raises(IntegrityError):
+            db.commit()
+    finally:
+        db.rollback()
+        db.close()
+
+
+def test_list_videos_with_shot_counts():
+    response = client.get("/videos/")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 2
+    assert [(v["title"], v["shot_count"]) for v in data["items"]] == [
+        ("Test Video", len(INTERVALS)), ("Other Video", 1)
+    ]
+
+
+def test_search_videos_by_title():
+    data = client.get("/videos/", params={"query": "other video"}).json()
+    assert data["total"] == 1
+    assert data["items"][0]["title"] == "Other Video"
+    assert client.get("/videos/", params={"query": "missing"}).json()["items"] == []
+
+
+def test_shots_filtered_by_video_title():
+    data = client.get("/shots/", params={"video_query": "other"}).json()
+    assert data["total"] == 1
+    assert data["items"][0]["video_title"] == "Other Video"
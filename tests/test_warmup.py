@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core import warmup
+from app.core.warmup import WarmupState, run_warmup, warmup_state
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(warmup_state, "started", False)
+    monkeypatch.setattr(warmup_state, "finished", False)
+    monkeypatch.setattr(warmup_state, "phases", {})
+    monkeypatch.setattr(warmup_state, "errors", {})
+
+
+def test_phases_are_timed_and_failures_recorded():
+    calls = []
+
+    def slow():
+        calls.append("slow")
+        time.sleep(0.01)
+
+    def broken():
+        calls.append("broken")
+        raise RuntimeError("database unavailable")
+
+    phases = [("slow", slow), ("broken", broken), ("after", lambda: calls.append("after"))]
+    state = run_warmup(WarmupState(), phases)
+    assert calls == ["slow", "broken", "after"]
+    assert state.ready
+    assert state.phases["slow"] >= 10
+    assert set(state.phases) == {"slow", "broken", "after", "total"}
+    assert state.errors == {"broken": "RuntimeError: database unavailable"}
+
+
+def test_readiness_waits_for_background_warmup(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(warmup, "PHASES", [("embedder", lambda: release.wait(5))])
+
+    with TestClient(app) as client:
+        assert client.get("/health/live").status_code == 200
+        assert client.get("/health").status_code == 200
+        response = client.get("/health/ready")
+        assert response.status_code == 503
+        assert response.json()["ready"] is False
+
+        release.set()
+        for _ in range(100):
+            response = client.get("/health/ready")
+            if response.status_code == 200:
+                break
+            time.sleep(0.01)
+        assert response.status_code == 200
+        assert "embedder" in response.json()["phases_ms"]
+
+
+def test_failed_database_phases_keep_worker_not_ready(monkeypatch):
+    database_up = threading.Event()
+
+    def connect():
+        if not database_up.is_set():
+            raise RuntimeError("connection refused")
+
+    monkeypatch.setattr(warmup, "PHASES", [("embedder", lambda: None), ("pool", connect), ("queries", connect)])
+    state = run_warmup(warmup_state)
+    assert state.finished and not state.ready
+
+    client = TestClient(app)
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert set(response.json()["errors"]) == {"pool", "queries"}
+
+    # Readiness probes retry the failed phases once the database is reachable again
+    database_up.set()
+    response = client.get("/health/ready")
+    assert response.status_code == 200
+    assert response.json()["errors"] == {}